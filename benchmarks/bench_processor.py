@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+End-to-end processor benchmark - OptimizedVBPLProcessor.process_document trên corpus ghi sẵn
+(API JSON + S3 HTML trong ResponseCache, offline, không network)
+
+Corpus: LKS_2010.docx (Luật Khoáng sản 2010) và dự thảo Nghị định hướng dẫn, chuyển .docx -> <p> HTML,
+cộng một luật tổng hợp hàng nghìn Điều. Báo cáo docs/sec, thời gian từng stage và peak memory.
+
+    python benchmarks/bench_processor.py --sections 500 --repeat 3
+    python benchmarks/bench_processor.py --sections 1000,3000 --corpus ./bench_corpus --json bench.json
+    python benchmarks/bench_processor.py --compare HEAD~3 HEAD --threshold 10
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import zipfile
+import argparse
+import tempfile
+import importlib
+import statistics
+import subprocess
+import tracemalloc
+import contextlib
+import xml.etree.ElementTree as ET
+from html import escape
+from typing import Dict, List, Tuple
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+FIXTURE_HOST = "https://s3.bench.local"
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+# (judgment_id, source .docx trong repo, judgment_name, doc_type)
+DOCX_FIXTURES = [
+    ("bench_lks_2010", "LKS_2010.docx", "Luật Khoáng sản", "Luật"),
+    ("bench_nd_dcks", "2. Dự thảo Nghị định hướng dẫn Luật ĐCKS.docx", "Nghị định hướng dẫn Luật Địa chất và Khoáng sản", "Nghị định"),
+]
+
+# ====================== FIXTURES ======================
+
+def docx_paragraphs(docx_path: str) -> List[Tuple[str, bool]]:
+    """(text, centered) cho mỗi paragraph không rỗng trong word/document.xml"""
+    with zipfile.ZipFile(docx_path) as archive:
+        root = ET.fromstring(archive.read("word/document.xml"))
+    
+    paragraphs = []
+    for paragraph in root.iter(f"{WORD_NS}p"):
+        text = "".join(node.text or "" for node in paragraph.iter() if node.tag in (f"{WORD_NS}t", f"{WORD_NS}tab"))
+        if not text.strip():
+            continue
+        justify = paragraph.find(f"{WORD_NS}pPr/{WORD_NS}jc")
+        paragraphs.append((text, justify is not None and justify.get(f"{WORD_NS}val") == "center"))
+    return paragraphs
+
+def docx_to_html(docx_path: str) -> str:
+    """Một <p> cho mỗi paragraph (căn giữa giữ lại như HTML của vbpl)"""
+    center = ' align="center"'
+    paragraphs = [f"<p{center if centered else ''}>{escape(text)}</p>" for text, centered in docx_paragraphs(docx_path)]
+    return "<html><body>\n" + "\n".join(paragraphs) + "\n</body></html>"
+
+def synthetic_html(sections: int, clauses: int = 3, points: int = 2, sections_per_chapter: int = 50) -> str:
+    """Luật tổng hợp: Chương / Mục / Điều / Khoản / Điểm, `sections` Điều"""
+    parts = ["<html><body>", '<p align="center">LUẬT</p>', '<p align="center">ĐỊA CHẤT VÀ KHOÁNG SẢN</p>']
+    for section in range(1, sections + 1):
+        if section % sections_per_chapter == 1:
+            chapter = section // sections_per_chapter + 1
+            parts.append(f'<p align="center">Chương {chapter}</p>')
+            parts.append(f'<p align="center">QUY ĐỊNH VỀ HOẠT ĐỘNG KHOÁNG SẢN NHÓM {chapter}</p>')
+        parts.append(f"<p>Điều {section}. Quản lý nhà nước về khoáng sản số {section}</p>")
+        for clause in range(1, clauses + 1):
+            parts.append(f"<p>{clause}. Tổ chức, cá nhân thăm dò khoáng sản phải tuân thủ quy định tại khoản {clause} "
+                         f"và các điều kiện về bảo vệ môi trường, an toàn lao động.</p>")
+            for point in range(points):
+                parts.append(f"<p>{'abcdefghik'[point % 10]}) Có đề án thăm dò phù hợp với quy hoạch khoáng sản "
+                             f"đã được phê duyệt theo quy định của pháp luật;</p>")
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+def fixture_api_json(judgment_id: str, judgment_name: str, doc_type: str) -> Dict:
+    return {"data": {
+        "id_judgment": judgment_id, "judgment_number": f"{judgment_id}/BENCH", "judgment_name": judgment_name,
+        "full_judgment_name": judgment_name, "doc_type": doc_type, "state": "Còn hiệu lực",
+        "s3_key": f"{FIXTURE_HOST}/{judgment_id}.html", "vbpl_diagram": []
+    }}
+
+def build_corpus(corpus_dir: str, sections: List[int]) -> List[Tuple[str, int]]:
+    """Ghi fixtures vào ResponseCache của tree hiện tại; trả về [(judgment_id, html bytes)]"""
+    sys.path.insert(0, REPO_ROOT)
+    import requests
+    from update_vbpl_CL import LEXCENTRA_API_URL, ResponseCache
+    
+    documents = []
+    for judgment_id, filename, judgment_name, doc_type in DOCX_FIXTURES:
+        docx_path = os.path.join(REPO_ROOT, filename)
+        if os.path.exists(docx_path):
+            documents.append((judgment_id, docx_to_html(docx_path), judgment_name, doc_type))
+        else:
+            print(f"⚠️  Missing fixture source {filename}, skipped")
+    for count in sections:
+        documents.append((f"bench_synthetic_{count}", synthetic_html(count), f"Luật tổng hợp {count} Điều", "Luật"))
+    
+    cache = ResponseCache(corpus_dir)
+    corpus = []
+    for judgment_id, html_content, judgment_name, doc_type in documents:
+        api_json = fixture_api_json(judgment_id, judgment_name, doc_type)
+        # ASCII + character references: decodes the same under every encoding the processor tries
+        html_body = html_content.encode("ascii", "xmlcharrefreplace")
+        for url, body, content_type in (
+            (LEXCENTRA_API_URL.format(judgment_id=judgment_id), json.dumps(api_json, ensure_ascii=False).encode("utf-8"), "application/json"),
+            (api_json["data"]["s3_key"], html_body, "text/html"),
+        ):
+            response = requests.Response()
+            response.status_code = 200
+            response._content = body
+            response.headers["Content-Type"] = content_type
+            cache.store(url, response)
+        corpus.append((judgment_id, len(html_body)))
+    return corpus
+
+# ====================== RUNNER ======================
+
+def load_processor_module(repo: str):
+    """update_vbpl_CL của `repo` (tree hiện tại hoặc git worktree của revision khác)"""
+    sys.path.insert(0, os.path.abspath(repo))
+    module = importlib.import_module("update_vbpl_CL")
+    fields = getattr(module.ProcessingConfig, "__dataclass_fields__", {})
+    if "offline" not in fields or "cache_dir" not in fields:
+        raise SystemExit(f"❌ {repo}: update_vbpl_CL has no offline response cache - revision too old to benchmark")
+    return module
+
+def run_suite(repo: str, corpus_dir: str, corpus: List[Tuple[str, int]], repeat: int, memory: bool) -> Dict:
+    module = load_processor_module(repo)
+    log_dir = tempfile.mkdtemp(prefix="vbpl_bench_logs_")
+    processor = module.get_processor_for_crawler(log_dir, cache_dir=corpus_dir, offline=True,
+                                                 cache_api_ttl=-1, cache_html_ttl=-1)
+    
+    def process(judgment_id: str) -> Dict:
+        # Every run starts with a cold clean_text cache, otherwise repeats only measure cache hits
+        getattr(module, "_clean_text_caches", {}).clear()
+        # Processor logs each document to the console - keep the benchmark output readable
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            success, result_data = processor.process_document(judgment_id)
+        if not success:
+            raise SystemExit(f"❌ {judgment_id} failed, see {log_dir}/processing_{judgment_id}.log")
+        return result_data
+    
+    documents = {}
+    try:
+        # Warm-up once on the smallest document: lazy imports, regex compilation, page cache
+        process(min(corpus, key=lambda item: item[1])[0])
+        for judgment_id, html_bytes in corpus:
+            runs, stages = [], {}
+            for _ in range(repeat):
+                started = time.perf_counter()
+                result_data = process(judgment_id)
+                runs.append(time.perf_counter() - started)
+                for stage, seconds in (result_data.get("stage_timings") or {}).items():
+                    stages.setdefault(stage, []).append(seconds)
+            
+            peak_mb = None
+            if memory:
+                tracemalloc.start()
+                process(judgment_id)
+                peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                tracemalloc.stop()
+            
+            elements = sum(len(elements) for elements in result_data.get("structure_data", {}).values())
+            documents[judgment_id] = {
+                "html_bytes": html_bytes,
+                "elements": elements,
+                "median_seconds": statistics.median(runs),
+                "min_seconds": min(runs),
+                "stages": {stage: statistics.median(values) for stage, values in stages.items()},
+                "peak_memory_mb": peak_mb
+            }
+    except BaseException:
+        print(f"📁 Processor logs kept in {log_dir}")
+        raise
+    shutil.rmtree(log_dir, ignore_errors=True)
+    
+    total = sum(document["median_seconds"] for document in documents.values())
+    return {"repo": os.path.abspath(repo), "repeat": repeat, "documents": documents,
+            "docs_per_second": len(documents) / total if total else 0.0}
+
+def print_suite(results: Dict, title: str = ""):
+    print(f"📊 {title or results['repo']} (median of {results['repeat']})")
+    for judgment_id, document in results["documents"].items():
+        memory = f"{document['peak_memory_mb']:7.1f} MB" if document["peak_memory_mb"] is not None else ""
+        print(f"   {judgment_id:<24} {document['html_bytes'] / 1024:8.0f} KB  {document['elements']:6d} elements  "
+              f"{document['median_seconds']:8.3f}s  {memory}")
+        if document["stages"]:
+            print("      " + "  ".join(f"{stage} {seconds:.3f}s" for stage, seconds in document["stages"].items()))
+    print(f"   ⚡ {results['docs_per_second']:.2f} docs/s")
+
+# ====================== COMPARE ======================
+
+def run_revision(revision: str, corpus_dir: str, args, workdir: str) -> Dict:
+    """Chạy suite của revision trong git worktree riêng (subprocess, import sạch); '.' = working tree"""
+    repo = REPO_ROOT
+    worktree = None
+    if revision != ".":
+        worktree = os.path.join(workdir, f"rev_{len(os.listdir(workdir))}")
+        subprocess.run(["git", "-C", REPO_ROOT, "worktree", "add", "--detach", "--quiet", worktree, revision], check=True)
+        repo = worktree
+    
+    output = os.path.join(workdir, f"result_{len(os.listdir(workdir))}.json")
+    command = [sys.executable, os.path.abspath(__file__), "--repo", repo, "--corpus", corpus_dir,
+               "--repeat", str(args.repeat), "--json", output, "--quiet"]
+    if args.no_memory:
+        command.append("--no-memory")
+    try:
+        subprocess.run(command, check=True, cwd=os.getcwd())
+        with open(output, "r", encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        if worktree:
+            subprocess.run(["git", "-C", REPO_ROOT, "worktree", "remove", "--force", worktree], check=False)
+
+def compare(base: Dict, head: Dict, base_name: str, head_name: str, threshold: float) -> bool:
+    """Bảng so sánh; False nếu có document chậm hơn threshold %"""
+    print(f"\n📊 {base_name} -> {head_name}")
+    regressed = False
+    for judgment_id, head_document in head["documents"].items():
+        base_document = base["documents"].get(judgment_id)
+        if not base_document:
+            continue
+        change = (head_document["median_seconds"] / base_document["median_seconds"] - 1) * 100
+        flag = "🐢" if change > threshold else ("⚡" if change < -threshold else "  ")
+        regressed |= change > threshold
+        print(f"   {flag} {judgment_id:<24} {base_document['median_seconds']:8.3f}s -> "
+              f"{head_document['median_seconds']:8.3f}s  {change:+6.1f}%")
+        for stage, seconds in head_document["stages"].items():
+            before = base_document["stages"].get(stage)
+            if before:
+                print(f"        {stage:<12} {before:8.3f}s -> {seconds:8.3f}s  {(seconds / before - 1) * 100:+6.1f}%")
+    print(f"   docs/s: {base['docs_per_second']:.2f} -> {head['docs_per_second']:.2f}")
+    if regressed:
+        print(f"   ❌ Slower than {threshold:g}% on at least one document")
+    return not regressed
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end OptimizedVBPLProcessor benchmark (offline corpus)")
+    parser.add_argument("--sections", default="2000", help="Comma-separated Điều counts of synthetic laws ('' : none)")
+    parser.add_argument("--repeat", type=int, default=1, help="Timed runs per document (median reported)")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc peak-memory run")
+    parser.add_argument("--corpus", default=None, help="Keep the recorded corpus in this directory and reuse it (ignores --sections)")
+    parser.add_argument("--json", default=None, help="Write results as JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "HEAD"), help="Compare two git revisions ('.' = working tree)")
+    parser.add_argument("--threshold", type=float, default=10.0, help="--compare: exit 1 if a document is this %% slower")
+    parser.add_argument("--repo", default=REPO_ROOT, help=argparse.SUPPRESS)
+    parser.add_argument("--quiet", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    workdir = tempfile.mkdtemp(prefix="vbpl_bench_")
+    try:
+        corpus_dir = args.corpus or os.path.join(workdir, "corpus")
+        corpus_file = os.path.join(corpus_dir, "corpus.json")
+        if os.path.exists(corpus_file):
+            with open(corpus_file, "r", encoding="utf-8") as f:
+                corpus = [tuple(item) for item in json.load(f)]
+        else:
+            corpus = build_corpus(corpus_dir, [int(count) for count in args.sections.split(",") if count.strip()])
+            with open(corpus_file, "w", encoding="utf-8") as f:
+                json.dump(corpus, f)
+        
+        if args.compare:
+            revisions_dir = os.path.join(workdir, "revisions")
+            os.makedirs(revisions_dir)
+            base_name, head_name = args.compare
+            base = run_revision(base_name, corpus_dir, args, revisions_dir)
+            head = run_revision(head_name, corpus_dir, args, revisions_dir)
+            print_suite(base, base_name)
+            print_suite(head, head_name)
+            ok = compare(base, head, base_name, head_name, args.threshold)
+            if args.json:
+                with open(args.json, "w", encoding="utf-8") as f:
+                    json.dump({"base": base, "head": head}, f, ensure_ascii=False, indent=2)
+            sys.exit(0 if ok else 1)
+        
+        results = run_suite(args.repo, corpus_dir, corpus, max(1, args.repeat), not args.no_memory)
+        if not args.quiet:
+            print_suite(results)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
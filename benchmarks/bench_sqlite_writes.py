@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+SQLite write benchmark - so sánh cách lưu cũ (mỗi statement một connection + commit)
+với SQLiteDatabase.save_document (một WAL connection, một transaction, executemany)
+
+    python benchmarks/bench_sqlite_writes.py --docs 20 --sections 200
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from vbpl_crawler import (
+    SQLiteDatabase, INSERT_DOCUMENT_SQL, INSERT_ELEMENT_SQL, INSERT_RELATION_SQL
+)
+
+def build_document(doc_index: int, sections: int, clauses_per_section: int, points_per_clause: int):
+    """Synthetic result_data tương đương một bộ luật dài"""
+    judgment_id = str(100000 + doc_index)
+    structure = {'vbpl_chapter': [], 'vbpl_section': [], 'vbpl_clause': [], 'vbpl_point': []}
+    
+    for s in range(1, sections + 1):
+        section_id = f"{judgment_id}S{s:03d}"
+        structure['vbpl_section'].append({
+            'vbpl_section_id': section_id, 'section_number': f"Điều {s}",
+            'section_name': f"Quy định về khoáng sản {s}", 'section_content': "Nội dung điều " * 10,
+            'tag_id': judgment_id + section_id
+        })
+        for c in range(1, clauses_per_section + 1):
+            clause_id = f"{section_id}C{c:02d}"
+            structure['vbpl_clause'].append({
+                'vbpl_clause_id': clause_id, 'clause_number': f"{c}.", 'clause_name': "",
+                'clause_content': "Nội dung khoản " * 20, 'tag_id': judgment_id + clause_id,
+                'immediate_parent_id': section_id, 'immediate_parent_type': 'vbpl_section'
+            })
+            for p in range(points_per_clause):
+                point_id = f"{clause_id}P{p:02d}"
+                structure['vbpl_point'].append({
+                    'vbpl_point_id': point_id, 'point_number': f"{'abcdefghik'[p % 10]})", 'point_name': "",
+                    'point_content': "Nội dung điểm " * 15, 'tag_id': judgment_id + point_id,
+                    'immediate_parent_id': clause_id, 'immediate_parent_type': 'vbpl_clause'
+                })
+    
+    metadata = {'judgment_number': f"{doc_index}/2024/QH15", 'judgment_name': "Luật Địa chất và Khoáng sản",
+                'doc_type': "Luật"}
+    relations = [{'target_judgment_id': str(200000 + r), 'relation_type': "Văn bản hướng dẫn"} for r in range(30)]
+    return judgment_id, metadata, structure, relations
+
+def save_legacy(db_path: str, judgment_id: str, metadata, structure, relations):
+    """Đường ghi trước đây: mở connection và commit cho từng statement"""
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(INSERT_DOCUMENT_SQL, SQLiteDatabase._document_row(judgment_id, metadata))
+        conn.commit()
+    for element_type, elements in structure.items():
+        for element in elements:
+            with sqlite3.connect(db_path) as conn:
+                conn.execute(INSERT_ELEMENT_SQL, SQLiteDatabase._element_row(judgment_id, element_type, element))
+                conn.commit()
+    for relation in relations:
+        with sqlite3.connect(db_path) as conn:
+            conn.execute(INSERT_RELATION_SQL, (judgment_id, relation['target_judgment_id'],
+                                               relation['relation_type'], relation['relation_type']))
+            conn.commit()
+
+def run_benchmark(docs: int, sections: int, clauses: int, points: int):
+    documents = [build_document(i, sections, clauses, points) for i in range(docs)]
+    rows = sum(1 + sum(len(v) for v in d[2].values()) + len(d[3]) for d in documents)
+    results = {}
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        # Legacy: rollback-journal DB, one connection + commit per row
+        legacy_path = os.path.join(tmp, "legacy.db")
+        SQLiteDatabase(legacy_path).close()
+        with sqlite3.connect(legacy_path) as conn:
+            conn.execute("PRAGMA journal_mode=DELETE")
+        started = time.perf_counter()
+        for judgment_id, metadata, structure, relations in documents:
+            save_legacy(legacy_path, judgment_id, metadata, structure, relations)
+        results['legacy'] = time.perf_counter() - started
+        
+        db = SQLiteDatabase(os.path.join(tmp, "batched.db"))
+        started = time.perf_counter()
+        for judgment_id, metadata, structure, relations in documents:
+            db.save_document(judgment_id, metadata, structure, relations)
+        results['save_document'] = time.perf_counter() - started
+        db.close()
+    
+    print(f"📊 {docs} documents, {rows} rows ({rows // docs} rows/document)")
+    for name, seconds in results.items():
+        print(f"   {name:<14} {seconds:8.3f}s  {docs / seconds:10.1f} docs/s  {rows / seconds:12.0f} rows/s")
+    print(f"   ⚡ Speedup: {results['legacy'] / results['save_document']:.1f}x")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite write path benchmark")
+    parser.add_argument("--docs", type=int, default=10, help="Number of documents")
+    parser.add_argument("--sections", type=int, default=100, help="Điều per document")
+    parser.add_argument("--clauses", type=int, default=3, help="Khoản per Điều")
+    parser.add_argument("--points", type=int, default=2, help="Điểm per Khoản")
+    args = parser.parse_args()
+    run_benchmark(args.docs, args.sections, args.clauses, args.points)
+
+if __name__ == "__main__":
+    main()
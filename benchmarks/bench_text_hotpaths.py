@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks cho các hàm chạy trên mỗi paragraph: clean_text, normalize_text,
+get_element_level_from_configs, generate_optimized_id, ContentDeduplicator.get_content_signature
+
+Input là paragraphs thật của LKS_2010.docx, biến thể lỗi OCR (âm tiết bị tách "kho áng sản") và
+khoản dài ghép từ nhiều paragraph. Seed cố định, timeit với gc tắt, báo median/min của nhiều lần lặp.
+
+    python benchmarks/bench_text_hotpaths.py
+    python benchmarks/bench_text_hotpaths.py --json before.json
+    python benchmarks/bench_text_hotpaths.py --baseline before.json --filter clean_text
+"""
+
+import os
+import sys
+import json
+import random
+import timeit
+import logging
+import argparse
+import tempfile
+import statistics
+import unicodedata
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from update_vbpl_CL import (
+    TextProcessor, CompactDictionary, ContentDeduplicator, normalize_text, get_element_level_from_configs, generate_optimized_id
+)
+from bench_processor import REPO_ROOT, DOCX_FIXTURES, docx_paragraphs
+
+SEED = 2010
+
+# ====================== INPUTS ======================
+
+def load_paragraphs() -> List[str]:
+    paragraphs = []
+    for _, filename, _, _ in DOCX_FIXTURES[:1]:
+        paragraphs.extend(text for text, _ in docx_paragraphs(os.path.join(REPO_ROOT, filename)))
+    return paragraphs
+
+def ocr_split(paragraph: str, rng: random.Random, rate: float = 0.15) -> str:
+    """Tách ngẫu nhiên âm tiết dài thành hai mảnh như lỗi OCR/convert: "khoáng" -> "kho áng" """
+    words = []
+    for word in paragraph.split(" "):
+        if len(word) >= 4 and word.isalpha() and rng.random() < rate:
+            cut = rng.randint(1, len(word) - 1)
+            word = word[:cut] + " " + word[cut:]
+        words.append(word)
+    return " ".join(words)
+
+def build_dictionary(paragraphs: List[str]) -> List[str]:
+    """Thay Viet74K khi không có: âm tiết + cụm 2/3 âm tiết của corpus, lowercase NFC như _load_dictionary"""
+    entries = set()
+    for paragraph in paragraphs:
+        words = [word for word in unicodedata.normalize("NFC", paragraph.lower()).split() if word.isalpha()]
+        entries.update(words)
+        entries.update(" ".join(words[i:i + 2]) for i in range(len(words) - 1))
+        entries.update(" ".join(words[i:i + 3]) for i in range(len(words) - 2))
+    return sorted(entries)
+
+def build_inputs(paragraphs: List[str]) -> Dict[str, List]:
+    rng = random.Random(SEED)
+    long_clauses = [" ".join(paragraphs[i:i + 8]) for i in range(0, len(paragraphs) - 8, 8)]
+    headings = ["Chương I", "Chương II. QUY ĐỊNH CHUNG", "Mục 1. THĂM DÒ KHOÁNG SẢN", "Điều 1. Phạm vi điều chỉnh",
+                "ĐIỀU 25. Quyền của tổ chức", "1. Khoản này áp dụng", "a) Điểm này áp dụng", "đ) Giấy phép khai thác"]
+    context = {"big_part_number": "", "chapter_number": "Chương IV", "part_number": "Mục 2", "mini_part_number": "",
+               "section_number": "Điều 45", "clause_number": "3"}
+    return {
+        "paragraph": paragraphs,
+        "ocr": [ocr_split(paragraph, rng) for paragraph in paragraphs],
+        "long": long_clauses,
+        # Raw HTML text: NBSP, tabs and line breaks the normalizer has to fold
+        "raw": [paragraph.replace(" ", "\u00a0", 2).replace(". ", ".\t") + "\r\n" for paragraph in paragraphs],
+        "lines": headings * 4 + paragraphs[:len(headings) * 12],
+        "ids": [("vbpl_section", "Điều 45"), ("vbpl_clause", "3."), ("vbpl_point", "đ)"), ("vbpl_chapter", "Chương IV")] * 25,
+        "context": context,
+    }
+
+# ====================== BENCHMARKS ======================
+
+def build_benchmarks(inputs: Dict[str, List], text_processor: TextProcessor) -> List[Tuple[str, int, Callable]]:
+    """(name, items per call, callable) - callable chạy hàm trên toàn bộ input list một lần"""
+    deduplicator = ContentDeduplicator(text_processor.logger)
+    clean_text = text_processor.clean_text
+    context = inputs["context"]
+    
+    def over(function: Callable, items: List) -> Callable:
+        return lambda: [function(item) for item in items]
+    
+    return [
+        ("clean_text[paragraph]", len(inputs["paragraph"]), over(clean_text, inputs["paragraph"])),
+        ("clean_text[ocr]", len(inputs["ocr"]), over(clean_text, inputs["ocr"])),
+        ("clean_text[long]", len(inputs["long"]), over(clean_text, inputs["long"])),
+        ("normalize_text", len(inputs["raw"]), over(normalize_text, inputs["raw"])),
+        ("get_element_level_from_configs", len(inputs["lines"]), over(get_element_level_from_configs, inputs["lines"])),
+        ("generate_optimized_id", len(inputs["ids"]),
+         lambda: [generate_optimized_id("115624", element_type, context, number) for element_type, number in inputs["ids"]]),
+        ("get_content_signature", len(inputs["paragraph"]), over(deduplicator.get_content_signature, inputs["paragraph"])),
+    ]
+
+def measure(function: Callable, repeat: int, min_time: float) -> List[float]:
+    """Seconds per call của `function` cho mỗi lần lặp (timeit tự chọn number, gc tắt)"""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    return [seconds / number for seconds in timer.repeat(repeat=repeat, number=number)]
+
+def run(repeat: int, min_time: float, name_filter: Optional[str], dictionary_path: Optional[str]) -> Dict[str, Dict]:
+    paragraphs = load_paragraphs()
+    logger = logging.getLogger("bench_text_hotpaths")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    
+    if dictionary_path:
+        text_processor = TextProcessor(dictionary_path, logger)
+    else:
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", suffix=".txt", delete=False) as f:
+            f.write("\n".join(build_dictionary(paragraphs)))
+        try:
+            text_processor = TextProcessor(f.name, logger)
+        finally:
+            for path in (f.name, f.name + CompactDictionary.SUFFIX):
+                if os.path.exists(path):
+                    os.remove(path)
+    print(f"📚 {len(paragraphs)} paragraphs, dictionary {len(text_processor.dictionary)} entries"
+          f"{'' if dictionary_path else ' (built from corpus, pass --dictionary Viet74K.txt for the real one)'}")
+    
+    inputs = build_inputs(paragraphs)
+    if hasattr(text_processor, "_clean_text_reference"):
+        texts = inputs["paragraph"] + inputs["ocr"] + inputs["long"] + inputs["raw"]
+        mismatches = [text for text in texts
+                      if text_processor.clean_text(text) != text_processor._clean_text_reference(normalize_text(text))]
+        print(f"{'✅' if not mismatches else '❌'} clean_text vs reference: {len(texts) - len(mismatches)}/{len(texts)} identical")
+    
+    results = {}
+    for name, items, function in build_benchmarks(inputs, text_processor):
+        if name_filter and name_filter not in name:
+            continue
+        runs = measure(function, repeat, min_time)
+        quartiles = statistics.quantiles(runs, n=4) if len(runs) >= 2 else [runs[0]] * 3
+        results[name] = {
+            "items": items,
+            "median_us_per_item": statistics.median(runs) / items * 1e6,
+            "min_us_per_item": min(runs) / items * 1e6,
+            "iqr_percent": (quartiles[2] - quartiles[0]) / statistics.median(runs) * 100
+        }
+    return results
+
+def print_results(results: Dict[str, Dict], baseline: Optional[Dict[str, Dict]] = None):
+    print(f"   {'benchmark':<32} {'items':>6} {'median µs/item':>15} {'min':>10} {'IQR':>7}")
+    for name, result in results.items():
+        line = (f"   {name:<32} {result['items']:>6} {result['median_us_per_item']:>15.2f} "
+                f"{result['min_us_per_item']:>10.2f} {result['iqr_percent']:>6.1f}%")
+        before = (baseline or {}).get(name)
+        if before:
+            speedup = before["median_us_per_item"] / result["median_us_per_item"]
+            line += f"   {'⚡' if speedup >= 1 else '🐢'} {speedup:.2f}x vs baseline"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for per-paragraph text/pattern hot paths")
+    parser.add_argument("--repeat", type=int, default=7, help="timeit repeats (median reported)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds per repeat")
+    parser.add_argument("--filter", default=None, help="Only benchmarks whose name contains this")
+    parser.add_argument("--dictionary", default=None, help="Dictionary file for clean_text (default: built from the corpus)")
+    parser.add_argument("--json", default=None, help="Write results as JSON")
+    parser.add_argument("--baseline", default=None, help="JSON from an earlier run to compare against")
+    args = parser.parse_args()
+    
+    results = run(max(1, args.repeat), args.min_time, args.filter, args.dictionary)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
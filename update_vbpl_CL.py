@@ -1,1901 +1,3137 @@
-import requests
-import os
-import json
-import re
-import unicodedata
-import logging
-import hashlib
-from typing import Dict, List, Optional, Tuple, Any, Set
-from dataclasses import dataclass
-from bs4 import BeautifulSoup, Tag
-from collections import OrderedDict
-from datetime import datetime
-
-
-# ====================== CONFIGURATION ======================
-
-@dataclass
-class ProcessingConfig:
-    """Configuration class for processing parameters"""
-    log_dir: str = "log_vbpl"
-    viet74k_path: str = "Viet74K.txt"
-    headers_path: str = "header.txt"
-    debug_extraction: bool = False
-    enable_clause: bool = True
-    enable_point: bool = True
-    enable_deduplication: bool = True
-    
-    def __post_init__(self):
-        os.makedirs(self.log_dir, exist_ok=True)
-
-@dataclass
-class ElementConfig:
-    """Configuration for element types"""
-    element_type: str
-    id_field: str
-    number_field: str
-    name_field: str
-    content_field: str
-    pattern: str
-    level: int
-    parent_types: List[str] = None
-
-# UPDATED VBPL HIERARCHY CONFIGURATION - FIXED PATTERNS FOR PROPER NUMBER/NAME/CONTENT SEPARATION
-ELEMENT_CONFIGS = {
-    'vbpl_big_part': ElementConfig(
-        element_type='vbpl_big_part',
-        id_field='vbpl_big_part_id',
-        number_field='big_part_number',
-        name_field='big_part_name',
-        content_field='big_part_content',
-        pattern=r'(Phần\s+(?:[IVXLCDM]+|\d+))(?:[.:\-]?\s*(.*))?',  # Capture full "Phần I" as number
-        level=1,
-        parent_types=[]
-    ),
-    'vbpl_chapter': ElementConfig(
-        element_type='vbpl_chapter',
-        id_field='vbpl_chapter_id', 
-        number_field='chapter_number',
-        name_field='chapter_name',
-        content_field='chapter_content',
-        pattern=r'(Chương\s+(?:[IVXLCDM]+|\d+))(?:[.:\-]?\s*(.*))?',  # Capture full "Chương II" as number
-        level=2,
-        parent_types=['vbpl_big_part']
-    ),
-    'vbpl_part': ElementConfig(
-        element_type='vbpl_part',
-        id_field='vbpl_part_id',
-        number_field='part_number', 
-        name_field='part_name',
-        content_field='part_content',
-        pattern=r'(Mục\s+(?:[IVXLCDM]+|\d+))(?:[.:\-]?\s*(.*))?',  # Capture full "Mục 1" as number
-        level=3,
-        parent_types=['vbpl_big_part', 'vbpl_chapter']
-    ),
-    'vbpl_mini_part': ElementConfig(
-        element_type='vbpl_mini_part',
-        id_field='vbpl_mini_part_id',
-        number_field='mini_part_number',
-        name_field='mini_part_name',
-        content_field='mini_part_content',
-        pattern=r'(Tiểu mục\s+(?:[IVXLCDM]+|\d+))(?:[.:\-]?\s*(.*))?',  # Capture full "Tiểu mục 2" as number
-        level=4,
-        parent_types=['vbpl_big_part', 'vbpl_chapter', 'vbpl_part']
-    ),
-    'vbpl_section': ElementConfig(
-        element_type='vbpl_section',
-        id_field='vbpl_section_id',
-        number_field='section_number',
-        name_field='section_name',
-        content_field='section_content',
-        pattern=r'(Điều\s+\d+)\.?\s*(.*)$',  # Capture full "Điều 1" as number, rest as name
-        level=5,
-        parent_types=['vbpl_big_part', 'vbpl_chapter', 'vbpl_part', 'vbpl_mini_part']
-    ),
-    'vbpl_clause': ElementConfig(
-        element_type='vbpl_clause',
-        id_field='vbpl_clause_id',
-        number_field='clause_number',
-        name_field='clause_name',
-        content_field='clause_content',
-        pattern=r'(\d+\.)\s*(.*)',  # Capture "1." as number, rest as content (name will be empty)
-        level=6,
-        parent_types=['vbpl_big_part', 'vbpl_chapter', 'vbpl_part', 'vbpl_mini_part', 'vbpl_section']
-    ),
-    'vbpl_point': ElementConfig(
-        element_type='vbpl_point',
-        id_field='vbpl_point_id',
-        number_field='point_number',
-        name_field='point_name',
-        content_field='point_content',
-        pattern=r'([a-zđ]\))\s*(.*)',  # Capture "a)" as number, rest as content (name will be empty)
-        level=7,
-        parent_types=['vbpl_big_part', 'vbpl_chapter', 'vbpl_part', 'vbpl_mini_part', 'vbpl_section', 'vbpl_clause']
-    )
-}
-
-VBPL_FIELDS_TO_KEEP = [
-    "id_judgment", "judgment_number", "judgment_name", "full_judgment_name",
-    "date_issued", "state", "state_id", "doc_type", "issuing_authority",
-    "s3_key", "vbpl_diagram", "vbpl_big_part", 
-    "vbpl_chapter", "vbpl_part", "vbpl_mini_part", "vbpl_section",
-    "vbpl_clause", "vbpl_point",
-    "application_date", "expiration_date", "expiration_date_not_applicable",
-    "type_document", "sector"
-]
-
-FIELD_ORDER = [
-    'vbpl_big_part_id', 'vbpl_chapter_id', 'vbpl_part_id', 'vbpl_mini_part_id', 
-    'vbpl_section_id', 'vbpl_clause_id', 'vbpl_point_id',
-    'big_part_number', 'chapter_number', 'part_number', 'mini_part_number',
-    'section_number', 'clause_number', 'point_number',
-    'big_part_name', 'chapter_name', 'part_name', 'mini_part_name', 
-    'section_name', 'clause_name', 'point_name',
-    'section_content', 'clause_content', 'point_content',
-    'entity_type', 'tag_id'
-]
-
-# ====================== CONTENT DEDUPLICATION SYSTEM ======================
-
-class ContentDeduplicator:
-    """Advanced content deduplication system"""
-    
-    def __init__(self, logger: logging.Logger):
-        self.logger = logger
-        self.content_signatures: Set[str] = set()
-        self.paragraph_map: Dict[str, str] = {}
-        
-    def get_content_signature(self, content: str) -> str:
-        """Create normalized content signature for deduplication"""
-        if not content:
-            return ""
-        
-        normalized = re.sub(r'\s+', ' ', content.lower().strip())
-        normalized = re.sub(r'[^\w\s]', '', normalized)
-        return hashlib.md5(normalized.encode()).hexdigest()[:16]
-    
-    def mark_paragraph_as_extracted(self, paragraph: str, content_type: str):
-        """Mark paragraph as already extracted by specific content type"""
-        signature = self.get_content_signature(paragraph)
-        if signature:
-            self.paragraph_map[signature] = content_type
-    
-    def is_paragraph_already_extracted(self, paragraph: str, current_type: str) -> bool:
-        """Check if paragraph was already extracted by higher level element"""
-        signature = self.get_content_signature(paragraph)
-        extracted_by = self.paragraph_map.get(signature)
-        
-        if not extracted_by:
-            return False
-        
-        # priority_order = ['point', 'clause', 'section', 'mini_part', 'part', 'chapter', 'big_part']
-        priority_order = ['big_part', 'chapter', 'part', 'mini_part', 'section', 'clause', 'point']
-        
-        try:
-            extracted_priority = priority_order.index(extracted_by)
-            current_priority = priority_order.index(current_type)
-            return extracted_priority < current_priority
-        except ValueError:
-            return False
-    
-    def extract_unique_content(self, all_paragraphs: List[str], 
-                             child_elements: List[Dict], 
-                             current_type: str) -> str:
-        """Extract content unique to current level, excluding child content"""
-        
-        for child in child_elements:
-            child_content = self._get_child_content(child)
-            if child_content:
-                for paragraph in child_content.split('\n'):
-                    if paragraph.strip():
-                        self.mark_paragraph_as_extracted(paragraph.strip(), current_type)
-        
-        unique_paragraphs = []
-        for paragraph in all_paragraphs:
-            if paragraph.strip():
-                if self._is_structural_header(paragraph):
-                    continue
-                
-                if not self.is_paragraph_already_extracted(paragraph, current_type):
-                    unique_paragraphs.append(paragraph)
-                    self.mark_paragraph_as_extracted(paragraph, current_type)
-        
-        return "\n".join(unique_paragraphs)
-    
-    def _get_child_content(self, child_element: Dict) -> str:
-        """Extract content from child element"""
-        for field in ['clause_content', 'point_content', 'section_content', 'content']:
-            if field in child_element and child_element[field]:
-                return child_element[field]
-        return ""
-    
-    def _is_structural_header(self, paragraph: str) -> bool:
-        """Check if paragraph is a structural header"""
-        patterns = [
-            r'^Điều\s+\d+',
-            r'^\d+\.',
-            r'^[a-zđ]\)',
-            r'^Phần\s+([IVXLCDM]+|\d+)',
-            r'^Chương\s+([IVXLCDM]+|\d+)',
-            r'^Mục\s+([IVXLCDM]+|\d+)',
-            r'^Tiểu mục\s+([IVXLCDM]+|\d+)'
-        ]
-        
-        return any(re.match(pattern, paragraph.strip(), re.IGNORECASE) for pattern in patterns)
-
-# ====================== LOGGING SETUP ======================
-
-def setup_logging(config: ProcessingConfig, judgment_id: str) -> logging.Logger:
-    """Setup structured logging"""
-    logger = logging.getLogger('vbpl_processor')
-    logger.setLevel(logging.DEBUG)
-    logger.handlers.clear()
-    
-    log_file = os.path.join(config.log_dir, f"processing_{judgment_id}.log")
-    file_handler = logging.FileHandler(log_file, mode='w', encoding='utf-8')
-    file_handler.setLevel(logging.DEBUG)
-    
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
-    file_handler.setFormatter(formatter)
-    console_handler.setFormatter(formatter)
-    
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-    
-    return logger
-
-# ====================== UTILITY FUNCTIONS ======================
-
-def normalize_text(text: str) -> str:
-    """Improved text normalization"""
-    if not isinstance(text, str):
-        return ""
-    
-    text = unicodedata.normalize("NFC", text)
-    text = re.sub(r'[\u00A0\u2000-\u200F\u2028\u2029\u202F\u205F\u3000\uFEFF\t\r\n]', ' ', text)
-    text = re.sub(r' {2,}', ' ', text)
-    return text.strip()
-
-def roman_to_int(roman: str) -> int:
-    """Convert Roman numerals to integers"""
-    if not roman or not isinstance(roman, str):
-        return 0
-        
-    roman_nums = {'I': 1, 'V': 5, 'X': 10, 'L': 50, 'C': 100, 'D': 500, 'M': 1000}
-    total = 0
-    prev_value = 0
-    
-    for char in reversed(roman.upper()):
-        value = roman_nums.get(char, 0)
-        if value == 0:
-            return 0
-        if value < prev_value:
-            total -= value
-        else:
-            total += value
-        prev_value = value
-    
-    return total
-
-def extract_element_number(text: str, element_type: str) -> Optional[str]:
-    """Extract element numbers with proper handling for all types"""
-    if not text or element_type not in ELEMENT_CONFIGS:
-        return None
-        
-    config = ELEMENT_CONFIGS[element_type]
-    try:
-        flags = re.IGNORECASE if element_type == 'vbpl_section' else 0
-        match = re.search(config.pattern, text, flags)
-        
-        if match:
-            # For high-level elements (big_part, chapter, part, mini_part, section)
-            if element_type in ['vbpl_big_part', 'vbpl_chapter', 'vbpl_part', 'vbpl_mini_part', 'vbpl_section']:
-                number = match.group(1).strip()  # Full number like "Phần I", "Chương II", "Điều 1"
-                
-                # Convert Roman numerals to Arabic if needed for ID generation
-                if element_type != 'vbpl_section':
-                    parts = number.split()
-                    if len(parts) >= 2 and re.match(r'^[IVXLCDM]+$', parts[-1]):
-                        arabic = roman_to_int(parts[-1])
-                        if arabic > 0:
-                            return f"{' '.join(parts[:-1])} {arabic}"
-                
-                return number
-            
-            # For low-level elements (clause, point)
-            elif element_type in ['vbpl_clause', 'vbpl_point']:
-                return match.group(1).strip()  # Just "1." or "a)"
-                
-    except (IndexError, AttributeError) as e:
-        logging.getLogger('vbpl_processor').warning(f"Error extracting element number from '{text}': {e}")
-    
-    return None
-
-def get_element_level_from_configs(text: str) -> Optional[Tuple[int, str]]:
-    """Get element level and type from ELEMENT_CONFIGS with case insensitive support"""
-    for element_type, config in ELEMENT_CONFIGS.items():
-        flags = re.IGNORECASE if element_type == 'vbpl_section' else 0
-        if re.match(config.pattern, text, flags):
-            return config.level, element_type
-    return None
-
-def generate_optimized_id(judgment_id: str, element_type: str, current_context: Dict, number: str, tag: bool = True) -> str:
-    """Generate optimized hierarchical IDs"""
-    def safe_extract_for_id(field, level_type, pad=2):
-        """Extract number for ID generation (convert to Arabic numerals)"""
-        raw = current_context.get(field, "")
-        if not raw:
-            return "0" * pad
-            
-        # Extract just the numeric part for ID generation
-        if level_type == 'vbpl_section':
-            match = re.search(r'Điều\s+(\d+)', raw, re.IGNORECASE)
-            if match:
-                return match.group(1).zfill(pad)
-        else:
-            # For other types, extract the last number/roman numeral
-            parts = raw.split()
-            if parts:
-                last_part = parts[-1]
-                if last_part.isdigit():
-                    return last_part.zfill(pad)
-                elif re.match(r'^[IVXLCDM]+$', last_part):
-                    arabic = roman_to_int(last_part)
-                    return str(arabic).zfill(pad) if arabic > 0 else "0" * pad
-        
-        return "0" * pad
-
-    big_part = safe_extract_for_id("big_part_number", "vbpl_big_part", 2)
-    chapter = safe_extract_for_id("chapter_number", "vbpl_chapter", 2)
-    part = safe_extract_for_id("part_number", "vbpl_part", 2)
-    mini_part = safe_extract_for_id("mini_part_number", "vbpl_mini_part", 2)
-    
-    if element_type == "vbpl_section":
-        # Extract numeric part from "Điều 1"
-        match = re.search(r'Điều\s+(\d+)', number, re.IGNORECASE)
-        section = match.group(1).zfill(3) if match else "000"
-        id_part = big_part + chapter + part + mini_part + section
-    elif element_type == "vbpl_clause":
-        section = safe_extract_for_id("section_number", "vbpl_section", 3)
-        # Extract number from "1."
-        clause_match = re.search(r'(\d+)\.', number)
-        clause = clause_match.group(1).zfill(2) if clause_match else "00"
-        id_part = big_part + chapter + part + mini_part + section + clause
-    elif element_type == "vbpl_point":
-        section = safe_extract_for_id("section_number", "vbpl_section", 3)
-        clause = safe_extract_for_id("clause_number", "vbpl_clause", 2)
-        # Extract letter from "a)"
-        point_match = re.search(r'([a-zđ])\)', number)
-        point_num = "01"
-        if point_match:
-            vietnamese_letters = "abcdefghijklmnopqrstuvwxyzđ"
-            try:
-                pos = vietnamese_letters.index(point_match.group(1).lower()) + 1
-                point_num = str(pos).zfill(2)
-            except ValueError:
-                point_num = "01"
-        id_part = big_part + chapter + part + mini_part + section + clause + point_num
-    else:
-        parts = []
-        if element_type in ["vbpl_big_part"]:
-            parts = [big_part]
-        elif element_type in ["vbpl_chapter"]:
-            parts = [big_part, chapter]
-        elif element_type in ["vbpl_part"]:
-            parts = [big_part, chapter, part]
-        elif element_type in ["vbpl_mini_part"]:
-            parts = [big_part, chapter, part, mini_part]
-        id_part = "".join(parts)
-
-    return judgment_id + id_part if tag else id_part
-
-# ====================== TEXT PROCESSING ======================
-
-class TextProcessor:
-    """Enhanced text processor"""
-    
-    def __init__(self, dictionary_path: str, logger: logging.Logger):
-        self.logger = logger
-        self.dictionary = self._load_dictionary(dictionary_path)
-        
-    def _load_dictionary(self, path: str) -> set:
-        """Load dictionary with error handling"""
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                dictionary = {normalize_text(line.strip().lower()) for line in f if line.strip()}
-                self.logger.info(f"Loaded {len(dictionary)} words from dictionary")
-                return dictionary
-        except Exception as e:
-            self.logger.error(f"Failed to load dictionary: {e}")
-            return set()
-    
-    def clean_text(self, text: str) -> str:
-        """Improved text cleaning with better performance"""
-        if not text:
-            return ""
-            
-        text = normalize_text(text)
-        if not self.dictionary:
-            return text
-            
-        # Optimized tokenization
-        tokens = re.findall(r'\w+|\s+|[.,;:!?()"/\-]+', text, re.UNICODE)
-        output = []
-        i = 0
-        n = len(tokens)
-        
-        while i < n:
-            if tokens[i].isspace() or re.match(r"[.,;:!?()/\"-]", tokens[i]):
-                output.append(tokens[i])
-                i += 1
-                continue
-                
-            # Try 3-token merge first (most common OCR pattern)
-            if i + 4 < n and tokens[i+1].isspace() and tokens[i+3].isspace():
-                merged_candidates = [
-                    tokens[i] + " " + tokens[i+2] + " " + tokens[i+4],
-                    tokens[i] + tokens[i+2] + tokens[i+4]
-                ]
-                
-                for candidate in merged_candidates:
-                    if candidate.lower() in self.dictionary:
-                        output.append(candidate)
-                        i += 5
-                        break
-                else:
-                    # Try 2-token merge
-                    if self._try_two_token_merge(tokens, i, output):
-                        i += 3
-                    else:
-                        output.append(tokens[i])
-                        i += 1
-            else:
-                # Try 2-token merge
-                if self._try_two_token_merge(tokens, i, output):
-                    i += 3
-                else:
-                    output.append(tokens[i])
-                    i += 1
-                    
-        return ''.join(output).strip()
-    
-    def _try_two_token_merge(self, tokens: List[str], i: int, output: List[str]) -> bool:
-        """Helper method to try merging two tokens"""
-        if i + 2 < len(tokens) and tokens[i+1].isspace():
-            merged = tokens[i] + tokens[i+2]
-            if merged.lower() in self.dictionary:
-                output.append(merged)
-                return True
-        return False
-
-# ====================== HTML PROCESSING ======================
-
-class HTMLProcessor:
-    """Enhanced HTML processor"""
-    
-    def __init__(self, text_processor: TextProcessor, logger: logging.Logger):
-        self.text_processor = text_processor
-        self.logger = logger
-        
-    def get_html_content_with_encoding(self, url: str, output_file: Optional[str] = None) -> Optional[str]:
-        """Get HTML content with encoding detection"""
-        try:
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            raw_content = response.content
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"Failed to fetch HTML: {e}")
-            return None
-        
-        for encoding in ["windows-1258", "utf-8", "iso-8859-1"]:
-            try:
-                html_content = raw_content.decode(encoding)
-                break
-            except UnicodeDecodeError:
-                continue
-        else:
-            html_content = raw_content.decode("utf-8", errors="replace")
-        
-        if output_file:
-            try:
-                with open(output_file, "w", encoding="utf-8") as f:
-                    f.write(html_content)
-            except Exception as e:
-                self.logger.error(f"Failed to save HTML: {e}")
-        
-        return html_content
-    
-    def process_html_optimized(self, soup: BeautifulSoup) -> BeautifulSoup:
-        """Process HTML for structure extraction with smart heading merging"""
-        self.logger.info("Starting HTML processing with smart heading merging")
-        
-        paragraphs = soup.find_all("p")
-        
-        clusters = self._identify_heading_clusters(paragraphs)
-        merged_paragraphs = self._merge_heading_clusters(clusters, soup, paragraphs)
-        
-        for p in merged_paragraphs:
-            text_content = ''.join(p.strings)
-            cleaned_text = self.text_processor.clean_text(text_content)
-            
-            # Remove trailing punctuation from high-level headings for consistency
-            for pattern in [r'^(Phần\s+(?:[IVXLCDM]+|\d+))[.:\-]', r'^(Chương\s+(?:[IVXLCDM]+|\d+))[.:\-]', 
-                           r'^(Mục\s+(?:[IVXLCDM]+|\d+))[.:\-]', r'^(Tiểu mục\s+(?:[IVXLCDM]+|\d+))[.:\-]']:
-                cleaned_text = re.sub(pattern, r'\1', cleaned_text, flags=re.IGNORECASE)
-            
-            is_heading = self._is_legal_heading(cleaned_text)
-            p.clear()
-            
-            if is_heading:
-                p['style'] = "text-align: center;"
-                strong_tag = soup.new_tag("strong")
-                strong_tag.string = cleaned_text
-                p.append(strong_tag)
-            else:
-                p.string = cleaned_text
-        
-        # Apply merged structure to soup DOM structure
-        self.logger.info("Applying merged structure to soup DOM")
-        
-        if clusters and merged_paragraphs:
-            self.logger.info(f"🔄 DOM UPDATE: {len(clusters)} clusters, {len(merged_paragraphs)} merged paragraphs")
-            
-            current_paragraphs = soup.find_all("p")
-            self.logger.info(f"   Current soup has {len(current_paragraphs)} paragraphs")
-            
-            container = soup.find('body') or soup.find('div') or soup
-            self.logger.info(f"   Using container: {container.name if hasattr(container, 'name') else type(container)}")
-            
-            # Remove all current paragraphs
-            for i, p in enumerate(current_paragraphs):
-                if p.parent:
-                    p.extract()
-                    self.logger.debug(f"   Removed old P{i}: '{normalize_text(p.get_text())[:30]}...'")
-            
-            # Add processed merged paragraphs back
-            for i, p in enumerate(merged_paragraphs):
-                try:
-                    new_p = soup.new_tag("p")
-                    if hasattr(p, 'attrs') and p.attrs:
-                        new_p.attrs.update(p.attrs)
-                    
-                    for content in p.contents:
-                        if hasattr(content, 'name') and content.name is not None and content.name:
-                            new_tag = soup.new_tag(content.name)
-                            if hasattr(content, 'attrs') and content.attrs:
-                                new_tag.attrs.update(content.attrs)
-                            if content.string:
-                                new_tag.string = content.string
-                            new_p.append(new_tag)
-                        else:
-                            new_p.append(str(content))
-                    
-                    container.append(new_p)
-                    self.logger.debug(f"   Added new P{i}: '{normalize_text(new_p.get_text())[:30]}...'")
-                    
-                except Exception as e:
-                    self.logger.error(f"Error adding merged paragraph {i}: {e}")
-                    fallback_p = soup.new_tag("p")
-                    text_content = ''.join(p.strings) if hasattr(p, 'strings') else str(p)
-                    fallback_p.string = text_content
-                    container.append(fallback_p)
-                    self.logger.info(f"   Added fallback P{i}: '{text_content[:30]}...'")
-            
-            final_paragraphs = soup.find_all("p")
-            self.logger.info(f"✅ DOM UPDATE COMPLETE: Now {len(final_paragraphs)} paragraphs in soup")
-        else:
-            self.logger.info("ℹ️  No clusters or merged paragraphs - no DOM update needed")
-        
-        self.logger.info("HTML processing with smart heading merging completed")
-        return soup
-    
-    def _identify_heading_clusters(self, paragraphs: List[Tag]) -> List[Dict]:
-        """Identify heading clusters for levels 1-4 that need merging"""
-        clusters = []
-        i = 0
-        
-        self.logger.info(f"🔍 CLUSTER DEBUG: Processing {len(paragraphs)} paragraphs")
-        
-        while i < len(paragraphs):
-            text = normalize_text(paragraphs[i].get_text())
-            level_info = get_element_level_from_configs(text)
-            
-            if level_info and level_info[0] <= 4:
-                current_level, element_type = level_info
-                cluster_paragraphs = [paragraphs[i]]
-                j = i + 1
-                
-                self.logger.info(f"📦 Found level {current_level} heading at P{i}: '{text[:50]}...'")
-                
-                while j < len(paragraphs):
-                    next_text = normalize_text(paragraphs[j].get_text())
-                    next_level_info = get_element_level_from_configs(next_text)
-                    
-                    if next_level_info and next_level_info[0] > current_level:
-                        self.logger.info(f"   Break at P{j}: level {next_level_info[0]} > {current_level}")
-                        break
-                    
-                    cluster_paragraphs.append(paragraphs[j])
-                    self.logger.info(f"   Added P{j} to cluster: '{next_text[:30]}...'")
-                    j += 1
-                
-                if len(cluster_paragraphs) > 1:
-                    clusters.append({
-                        'start_idx': i,
-                        'end_idx': j - 1,
-                        'level': current_level,
-                        'element_type': element_type,
-                        'paragraphs': cluster_paragraphs
-                    })
-                    self.logger.info(f"✅ Created cluster: P{i}-P{j-1} ({len(cluster_paragraphs)} paragraphs)")
-                else:
-                    self.logger.info(f"❌ No cluster: only 1 paragraph")
-                
-                i = j
-            else:
-                i += 1
-        
-        self.logger.info(f"🎯 CLUSTER RESULT: {len(clusters)} clusters created")
-        return clusters
-    
-    def _merge_heading_clusters(self, clusters: List[Dict], soup: BeautifulSoup, original_paragraphs: List[Tag]) -> List[Tag]:
-        """Merge heading clusters into single paragraphs"""
-        if not clusters:
-            self.logger.info("❌ No clusters to merge → return original")
-            return original_paragraphs
-        
-        self.logger.info(f"🔗 MERGE DEBUG: Merging {len(clusters)} clusters")
-        
-        merged_paragraphs = []
-        cluster_indices = set()
-        
-        for cluster in clusters:
-            for i in range(cluster['start_idx'], cluster['end_idx'] + 1):
-                cluster_indices.add(i)
-        
-        for cluster in clusters:
-            merged_text_parts = []
-            for p in cluster['paragraphs']:
-                text = normalize_text(p.get_text())
-                if text:
-                    merged_text_parts.append(text)
-            
-            merged_text = " ".join(merged_text_parts)
-            merged_p = soup.new_tag("p")
-            merged_p.string = merged_text
-            merged_paragraphs.append(merged_p)
-            
-            self.logger.info(f"✅ Merged {cluster['element_type']} cluster: '{merged_text[:80]}...'")
-        
-        for i, p in enumerate(original_paragraphs):
-            if i not in cluster_indices:
-                merged_paragraphs.append(p)
-                self.logger.info(f"➕ Added non-cluster P{i}: '{normalize_text(p.get_text())[:50]}...'")
-        
-        def get_sort_key(p):
-            for i, orig_p in enumerate(original_paragraphs):
-                if p == orig_p:
-                    return i
-            for cluster in clusters:
-                cluster_text = " ".join(normalize_text(cp.get_text()) for cp in cluster['paragraphs'])
-                if p.get_text() == cluster_text:
-                    return cluster['start_idx']
-            return len(original_paragraphs)
-        
-        merged_paragraphs.sort(key=get_sort_key)
-        self.logger.info(f"🎯 MERGE RESULT: {len(merged_paragraphs)} paragraphs (was {len(original_paragraphs)})")
-        return merged_paragraphs
-    
-    def _is_legal_heading(self, text: str) -> bool:
-        """Check if text is a legal heading with updated patterns"""
-        if not text:
-            return False
-        
-        patterns = [
-            r"^Phần\s+([IVXLCDM]+|\d+)",
-            r"^Chương\s+([IVXLCDM]+|\d+)",
-            r"^Mục\s+([IVXLCDM]+|\d+)",
-            r"^Tiểu mục\s+([IVXLCDM]+|\d+)",
-            r"^Điều\s+\d+"
-        ]
-        
-        return any(re.match(pattern, text, re.IGNORECASE) for pattern in patterns)
-
-# ====================== OPTIMIZED STRUCTURE EXTRACTOR ======================
-
-class OptimizedDualFormatExtractor:
-    """Optimized structure extractor with FIXED number/name/content separation"""
-    
-    def __init__(self, logger: logging.Logger, config: ProcessingConfig):
-        self.logger = logger
-        self.config = config
-        self.deduplicator = ContentDeduplicator(logger) if config.enable_deduplication else None
-        
-    def extract_structure(self, soup: BeautifulSoup, judgment_id: str) -> Dict[str, Any]:
-        """Extract structure with optimized dual format output"""
-        self.logger.info("Starting OPTIMIZED dual format structure extraction")
-        
-        nested_data = self._extract_nested_structure(soup, judgment_id)
-        flat_data = self._generate_optimized_flat_format(nested_data, judgment_id)
-        validation_report = self._validate_integrity(nested_data, flat_data)
-        
-        return {
-            "data": nested_data,
-            "data_flat": flat_data,
-            "validation": validation_report,
-            "metadata": {
-                "judgment_id": judgment_id,
-                "processing_timestamp": datetime.now().isoformat(),
-                "total_sections": len(nested_data.get('vbpl_section', [])),
-                "total_clauses": len(flat_data.get('vbpl_clause', [])),
-                "total_points": len(flat_data.get('vbpl_point', [])),
-                "deduplication_enabled": self.config.enable_deduplication,
-                "optimization_version": "2.1-fixed"
-            }
-        }
-    
-    def _extract_nested_structure(self, soup: BeautifulSoup, judgment_id: str) -> Dict[str, List[Dict]]:
-        """Extract nested hierarchical structure with FIXED number/name/content separation"""
-        paragraphs = soup.find_all("p")
-        result = {element_type: [] for element_type in ELEMENT_CONFIGS.keys()}
-        current_context = {}
-        
-        i = 0
-        while i < len(paragraphs):
-            p = paragraphs[i]
-            text = normalize_text(p.get_text(" ", strip=True))
-            
-            if not text:
-                i += 1
-                continue
-            
-            found = False
-            for element_type in ['vbpl_big_part', 'vbpl_chapter', 'vbpl_part', 'vbpl_mini_part']:
-                structural_info = self._extract_element_info_fixed(text, element_type)
-                if structural_info:
-                    number, name = structural_info
-                    self._update_context_and_result(element_type, number, name, current_context, result, judgment_id)
-                    found = True
-                    break
-            
-            if found:
-                i += 1
-                continue
-            
-            if self._is_section_paragraph(text):
-                section_data = self._extract_optimized_section(text, paragraphs, i, current_context, judgment_id)
-                if section_data:
-                    result['vbpl_section'].append(section_data['section'])
-                    result['vbpl_clause'].extend(section_data['clauses'])
-                    result['vbpl_point'].extend(section_data['points'])
-                    consumed = section_data.get('paragraphs_consumed', 0)
-                    i += consumed + 1
-                    continue
-            
-            if self.config.enable_clause and self._is_clause_paragraph(text):
-                clause_data = self._extract_optimized_clause_fixed(text, paragraphs, i, current_context, judgment_id)
-                if clause_data:
-                    result['vbpl_clause'].append(clause_data['clause'])
-                    result['vbpl_point'].extend(clause_data['points'])
-                    consumed = clause_data.get('paragraphs_consumed', 0)
-                    i += consumed + 1
-                    continue
-            
-            if self.config.enable_point and self._is_point_paragraph(text):
-                point_data = self._extract_optimized_point_fixed(text, current_context, judgment_id)
-                if point_data:
-                    result['vbpl_point'].append(point_data)
-                    i += 1
-                    continue
-            
-            i += 1
-        
-        return result
-    
-    def _extract_element_info_fixed(self, text: str, element_type: str) -> Optional[Tuple[str, str]]:
-        """FIXED: Extract element info with proper number/name separation"""
-        if element_type not in ELEMENT_CONFIGS:
-            return None
-        
-        config = ELEMENT_CONFIGS[element_type]
-        
-        try:
-            flags = re.IGNORECASE if element_type == 'vbpl_section' else 0
-            match = re.match(config.pattern, text, flags)
-            
-            if match:
-                # For high-level elements: number is group(1), name is group(2)
-                number_part = match.group(1).strip() if match.group(1) else ""
-                name_part = match.group(2).strip() if len(match.groups()) >= 2 and match.group(2) else ""
-                
-                self.logger.debug(f"🔍 EXTRACT {element_type}: text='{text}' → number='{number_part}', name='{name_part}'")
-                
-                return number_part, name_part
-                
-        except (IndexError, AttributeError) as e:
-            self.logger.warning(f"Error extracting element info from '{text}': {e}")
-        
-        return None
-
-    def _is_section_paragraph(self, text: str) -> bool:
-        """Check if paragraph is a section using unified pattern"""
-        level_info = get_element_level_from_configs(text)
-        return level_info is not None and level_info[1] == 'vbpl_section'
-    
-    def _is_clause_paragraph(self, text: str) -> bool:
-        """Check if paragraph is a clause using unified pattern"""
-        level_info = get_element_level_from_configs(text)
-        return level_info is not None and level_info[1] == 'vbpl_clause'
-    
-    def _is_point_paragraph(self, text: str) -> bool:
-        """Check if paragraph is a point using unified pattern"""
-        level_info = get_element_level_from_configs(text)
-        return level_info is not None and level_info[1] == 'vbpl_point'
-    
-    def _is_major_element(self, text: str) -> bool:
-        """Check if text is a major structural element using unified patterns"""
-        level_info = get_element_level_from_configs(text)
-        return level_info is not None
-    
-    def _extract_optimized_section(self, text: str, paragraphs: List[Tag], start_idx: int, current_context: Dict, judgment_id: str) -> Optional[Dict]:
-        """FIXED: Extract section with proper number/name/content separation"""
-        try:
-            # Use the fixed extraction method
-            structural_info = self._extract_element_info_fixed(text, 'vbpl_section')
-            if not structural_info:
-                return None
-            
-            section_number, section_name = structural_info
-            
-            current_context['section_number'] = section_number
-            
-            all_paragraphs = [text]
-            clauses = []
-            points = []
-            consumed_count = 0
-            
-            i = start_idx + 1
-            current_clause_context = current_context.copy()
-            
-            while i < len(paragraphs):
-                next_p = paragraphs[i]
-                next_text = normalize_text(next_p.get_text(" ", strip=True))
-                
-                if self._is_major_element(next_text):
-                    break
-                
-                if next_text:
-                    all_paragraphs.append(next_text)
-                    consumed_count += 1
-                    
-                    if self.config.enable_clause and self._is_clause_paragraph(next_text):
-                        clause_data = self._extract_optimized_clause_inline_fixed(next_text, paragraphs, i, current_clause_context, judgment_id)
-                        if clause_data:
-                            clauses.append(clause_data['clause'])
-                            points.extend(clause_data['points'])
-                            current_clause_context['clause_number'] = clause_data['clause']['clause_number']
-                    
-                    elif self.config.enable_point and self._is_point_paragraph(next_text):
-                        point_data = self._extract_optimized_point_fixed(next_text, current_clause_context, judgment_id)
-                        if point_data:
-                            points.append(point_data)
-                
-                i += 1
-            
-            if self.deduplicator:
-                section_only_content = self.deduplicator.extract_unique_content(
-                    all_paragraphs, clauses + points, 'section'
-                )
-            else:
-                section_only_content = self._extract_section_only_content_basic(all_paragraphs, clauses, points)
-            
-            tag_id = generate_optimized_id(judgment_id, "vbpl_section", current_context, section_number, tag=True)
-            section_id = generate_optimized_id(judgment_id, "vbpl_section", current_context, section_number, tag=False)
-            
-            section_data = self._create_optimized_element_data(
-                "vbpl_section", section_id, section_number, section_name, 
-                section_only_content, current_context, judgment_id, tag_id
-            )
-            
-            self.logger.debug(f"✅ SECTION: number='{section_number}', name='{section_name}', content_len={len(section_only_content)}")
-            
-            return {
-                'section': section_data,
-                'clauses': clauses,
-                'points': points,
-                'paragraphs_consumed': consumed_count
-            }
-        
-        except Exception as e:
-            self.logger.error(f"Error extracting optimized section from '{text}': {e}")
-            return None
-    
-    def _extract_optimized_clause_fixed(self, text: str, paragraphs: List[Tag], start_idx: int, current_context: Dict, judgment_id: str) -> Optional[Dict]:
-        """FIXED: Extract standalone optimized clause with proper number/name/content separation"""
-        return self._extract_optimized_clause_inline_fixed(text, paragraphs, start_idx, current_context, judgment_id)
-    
-    def _extract_optimized_clause_inline_fixed(self, text: str, paragraphs: List[Tag], start_idx: int, current_context: Dict, judgment_id: str) -> Optional[Dict]:
-        """FIXED: Extract clause with proper number/name/content separation - NO DUPLICATION"""
-        try:
-            # Use the config pattern to properly extract clause number and content
-            config = ELEMENT_CONFIGS['vbpl_clause']
-            match = re.match(config.pattern, text)
-            if not match:
-                return None
-            
-            clause_number = match.group(1)  # Just "1."
-            clause_content_initial = match.group(2).strip() if match.group(2) else ""  # Content without number
-            clause_name = ""  # Always empty for clauses as per requirement
-            
-            clause_context = current_context.copy()
-            clause_context['clause_number'] = clause_number
-            
-            clause_paragraphs = [clause_content_initial] if clause_content_initial else []
-            points = []
-            consumed_count = 0
-            
-            i = start_idx + 1
-            while i < len(paragraphs):
-                next_p = paragraphs[i]
-                next_text = normalize_text(next_p.get_text(" ", strip=True))
-                
-                if (self._is_major_element(next_text) or 
-                    self._is_clause_paragraph(next_text) or 
-                    self._is_section_paragraph(next_text)):
-                    break
-                
-                if next_text:
-                    if self.config.enable_point and self._is_point_paragraph(next_text):
-                        point_data = self._extract_optimized_point_fixed(next_text, clause_context, judgment_id)
-                        if point_data:
-                            points.append(point_data)
-                    else:
-                        clause_paragraphs.append(next_text)
-                    consumed_count += 1
-                
-                i += 1
-            
-            if self.deduplicator:
-                clause_only_content = self.deduplicator.extract_unique_content(
-                    clause_paragraphs, points, 'clause'
-                )
-            else:
-                clause_only_content = self._extract_clause_only_content_basic(clause_paragraphs, points)
-            
-            tag_id = generate_optimized_id(judgment_id, "vbpl_clause", clause_context, clause_number, tag=True)
-            clause_id = generate_optimized_id(judgment_id, "vbpl_clause", clause_context, clause_number, tag=False)
-            
-            clause_data = self._create_optimized_element_data(
-                "vbpl_clause", clause_id, clause_number, clause_name,  # clause_name is always ""
-                clause_only_content, clause_context, judgment_id, tag_id
-            )
-            
-            self.logger.debug(f"✅ CLAUSE: number='{clause_number}', name='{clause_name}' (empty), content_len={len(clause_only_content)}")
-            
-            return {
-                'clause': clause_data,
-                'points': points,
-                'paragraphs_consumed': consumed_count
-            }
-        
-        except Exception as e:
-            self.logger.error(f"Error extracting optimized clause from '{text}': {e}")
-            return None
-    
-    def _extract_optimized_point_fixed(self, text: str, current_context: Dict, judgment_id: str) -> Optional[Dict]:
-        """FIXED: Extract point with proper number/name/content separation - NO DUPLICATION"""
-        if not self.config.enable_point:
-            return None
-        
-        try:
-            # Use the config pattern to properly extract point number and content
-            config = ELEMENT_CONFIGS['vbpl_point']
-            match = re.match(config.pattern, text)
-            if not match:
-                return None
-            
-            point_number = match.group(1)  # Just "a)"
-            point_content = match.group(2).strip() if match.group(2) else ""  # Content without letter
-            point_name = ""  # Always empty for points as per requirement
-            
-            point_context = current_context.copy()
-            point_context['point_number'] = point_number
-            
-            tag_id = generate_optimized_id(judgment_id, "vbpl_point", point_context, point_number, tag=True)
-            point_id = generate_optimized_id(judgment_id, "vbpl_point", point_context, point_number, tag=False)
-            
-            point_data = self._create_optimized_element_data(
-                "vbpl_point", point_id, point_number, point_name,  # point_name is always ""
-                point_content, point_context, judgment_id, tag_id
-            )
-            
-            self.logger.debug(f"✅ POINT: number='{point_number}', name='{point_name}' (empty), content='{point_content[:50]}...'")
-            
-            return point_data
-        
-        except Exception as e:
-            self.logger.error(f"Error extracting optimized point from '{text}': {e}")
-            return None
-    
-    def _create_optimized_element_data(self, element_type: str, element_id: str, number: str, name: str,
-                                     content: str, context: Dict, judgment_id: str, tag_id: str) -> Dict:
-        """Create optimized element data with MINIMAL parent references"""
-        config = ELEMENT_CONFIGS[element_type]
-        element_data = OrderedDict()
-        
-        immediate_parent_type = None
-        immediate_parent_id = None
-        
-        if config.parent_types:
-            for parent_type in reversed(config.parent_types):
-                parent_config = ELEMENT_CONFIGS[parent_type]
-                parent_number = context.get(parent_config.number_field)
-                if parent_number:
-                    immediate_parent_id = generate_optimized_id(judgment_id, parent_type, context, parent_number, tag=False)
-                    immediate_parent_type = parent_type
-                    break
-        
-        element_data[config.id_field] = element_id
-        element_data[config.number_field] = number
-        element_data[config.name_field] = name
-        element_data[config.content_field] = content
-        element_data['tag_id'] = tag_id
-        
-        if immediate_parent_id and immediate_parent_type:
-            parent_config = ELEMENT_CONFIGS[immediate_parent_type]
-            element_data['immediate_parent_id'] = immediate_parent_id
-            element_data['immediate_parent_type'] = immediate_parent_type
-            element_data[parent_config.id_field] = immediate_parent_id
-        
-        return dict(element_data)
-    
-    def _extract_section_only_content_basic(self, all_paragraphs: List[str], clauses: List[Dict], points: List[Dict]) -> str:
-        """Basic section content extraction"""
-        section_content_parts = []
-        
-        for paragraph in all_paragraphs:
-            if self._is_clause_paragraph(paragraph):
-                continue
-            if self._is_point_paragraph(paragraph):
-                continue
-            section_content_parts.append(paragraph)
-        
-        return "\n".join(section_content_parts)
-    
-    def _extract_clause_only_content_basic(self, clause_paragraphs: List[str], points: List[Dict]) -> str:
-        """Basic clause content extraction"""
-        clause_content_parts = []
-        
-        for paragraph in clause_paragraphs:
-            if self._is_point_paragraph(paragraph):
-                continue
-            clause_content_parts.append(paragraph)
-        
-        return "\n".join(clause_content_parts)
-    
-    def _update_context_and_result(self, element_type: str, number: str, name: str, 
-                                   current_context: Dict, result: Dict, judgment_id: str) -> None:
-        """Update context and add element to result with OPTIMIZED structure"""
-        config = ELEMENT_CONFIGS[element_type]
-        
-        for other_type, other_config in ELEMENT_CONFIGS.items():
-            if other_config.level > config.level:
-                current_context.pop(other_config.number_field, None)
-        
-        current_context[config.number_field] = number
-        
-        tag_id = generate_optimized_id(judgment_id, element_type, current_context, number, tag=True)
-        element_id = generate_optimized_id(judgment_id, element_type, current_context, number, tag=False)
-        
-        element_data = self._create_optimized_element_data(
-            element_type, element_id, number, name, "", current_context, judgment_id, tag_id
-        )
-        
-        result[element_type].append(element_data)
-        
-        self.logger.debug(f"✅ {element_type.upper()}: number='{number}', name='{name}'")
-    
-    def _generate_optimized_flat_format(self, nested_data: Dict, judgment_id: str) -> Dict[str, List[Dict]]:
-        """Generate OPTIMIZED flat format - NO DUPLICATION"""
-        flat_data = {element_type: [] for element_type in ELEMENT_CONFIGS.keys()}
-        
-        for element_type, elements in nested_data.items():
-            if element_type not in ELEMENT_CONFIGS:
-                continue
-                
-            for element in elements:
-                flat_entity = self._create_optimized_flat_entity(element, element_type)
-                flat_data[element_type].append(flat_entity)
-        
-        return flat_data
-    
-    def _create_optimized_flat_entity(self, element: Dict, entity_type: str) -> Dict:
-        """Create OPTIMIZED flat entity - NO DUPLICATION"""
-        if entity_type not in ELEMENT_CONFIGS:
-            return element
-            
-        config = ELEMENT_CONFIGS[entity_type]
-        flat_entity = OrderedDict()
-        
-        core_fields = [config.id_field, config.number_field, config.name_field, config.content_field, 'tag_id']
-        for field in core_fields:
-            if field in element:
-                flat_entity[field] = element[field]
-        
-        immediate_parent_id = element.get('immediate_parent_id')
-        immediate_parent_type = element.get('immediate_parent_type')
-        
-        if immediate_parent_id and immediate_parent_type:
-            flat_entity['immediate_parent_id'] = immediate_parent_id
-            flat_entity['immediate_parent_type'] = immediate_parent_type
-        
-        flat_entity['entity_type'] = entity_type
-        
-        return flat_entity
-    
-    def _validate_integrity(self, nested_data: Dict, flat_data: Dict) -> Dict:
-        """Validate integrity of optimized dual format"""
-        validation_report = {
-            "content_integrity": self._validate_content_integrity(nested_data, flat_data),
-            "relationship_integrity": self._validate_relationships(nested_data, flat_data),
-            "count_verification": self._validate_counts(nested_data, flat_data),
-            "id_consistency": self._validate_ids(nested_data, flat_data),
-            "deduplication_check": self._validate_no_duplication(nested_data, flat_data),
-            "validation_timestamp": datetime.now().isoformat(),
-            "validation_errors": []
-        }
-        
-        validation_report["status"] = all([
-            validation_report.get("content_integrity", {}).get("status", False),
-            validation_report.get("relationship_integrity", {}).get("status", False), 
-            validation_report.get("count_verification", {}).get("status", False),
-            validation_report.get("id_consistency", {}).get("status", False),
-            validation_report.get("deduplication_check", {}).get("status", False)
-        ])
-        
-        return validation_report
-    
-    def _validate_no_duplication(self, nested_data: Dict, flat_data: Dict) -> Dict:
-        """Validate that no content duplication exists"""
-        try:
-            content_signatures = set()
-            duplicate_count = 0
-            total_content_items = 0
-            
-            # Reset deduplicator state for fresh validation
-            if self.deduplicator:
-                self.deduplicator.content_signatures = set()
-                self.deduplicator.paragraph_map = {}
-            
-            for element_type, elements in nested_data.items():
-                if element_type not in ELEMENT_CONFIGS:
-                    continue
-                    
-                config = ELEMENT_CONFIGS[element_type]
-                
-                for element in elements:
-                    content = element.get(config.content_field, "")
-                    if content and content.strip():
-                        total_content_items += 1
-                        
-                        if self.deduplicator:
-                            signature = self.deduplicator.get_content_signature(content)
-                            # Check if already extracted by deduplicator
-                            if not self.deduplicator.is_paragraph_already_extracted(content, element_type):
-                                self.deduplicator.mark_paragraph_as_extracted(content, element_type)
-                                content_signatures.add(signature)
-                            else:
-                                duplicate_count += 1
-                        else:
-                            signature = hashlib.md5(content.strip().lower().encode()).hexdigest()
-                            if signature in content_signatures:
-                                duplicate_count += 1
-                            else:
-                                content_signatures.add(signature)
-            
-            duplication_ratio = duplicate_count / total_content_items if total_content_items > 0 else 0
-                
-            return {
-                "status": duplicate_count == 0,
-                "total_content_items": total_content_items,
-                "duplicate_content_count": duplicate_count,
-                "unique_content_count": len(content_signatures),
-                "duplication_ratio": duplication_ratio,
-                "efficiency_gain": f"{(1 - duplication_ratio) * 100:.1f}%" if duplication_ratio < 1 else "0%"
-            }
-                
-        except Exception as e:
-            return {"status": False, "error": str(e)}
-    
-    def _validate_content_integrity(self, nested_data: Dict, flat_data: Dict) -> Dict:
-        """Validate content integrity between formats"""
-        try:
-            nested_content = self._extract_all_content(nested_data)
-            flat_content = self._extract_all_content_flat(flat_data)
-            
-            nested_hash = hashlib.md5(nested_content.encode('utf-8')).hexdigest()
-            flat_hash = hashlib.md5(flat_content.encode('utf-8')).hexdigest()
-            
-            return {
-                "status": nested_hash == flat_hash,
-                "nested_hash": nested_hash,
-                "flat_hash": flat_hash,
-                "total_characters_nested": len(nested_content),
-                "total_characters_flat": len(flat_content)
-            }
-        except Exception as e:
-            return {"status": False, "error": str(e)}
-    
-    def _validate_relationships(self, nested_data: Dict, flat_data: Dict) -> Dict:
-        """Validate relationship integrity"""
-        try:
-            nested_relations = self._build_relation_map(nested_data)
-            flat_relations = self._build_relation_map_flat(flat_data)
-            
-            return {
-                "status": nested_relations == flat_relations,
-                "nested_relations_count": len(nested_relations),
-                "flat_relations_count": len(flat_relations),
-                "missing_relations": list(nested_relations - flat_relations),
-                "extra_relations": list(flat_relations - nested_relations)
-            }
-        except Exception as e:
-            return {"status": False, "error": str(e)}
-    
-    def _validate_counts(self, nested_data: Dict, flat_data: Dict) -> Dict:
-        """Validate entity counts"""
-        counts = {}
-        status = True
-        
-        for element_type in ELEMENT_CONFIGS.keys():
-            nested_count = len(nested_data.get(element_type, []))
-            flat_count = len(flat_data.get(element_type, []))
-            
-            counts[element_type] = {
-                "nested": nested_count,
-                "flat": flat_count,
-                "match": nested_count == flat_count
-            }
-            
-            if nested_count != flat_count:
-                status = False
-        
-        counts["status"] = status
-        return counts
-    
-    def _validate_ids(self, nested_data: Dict, flat_data: Dict) -> Dict:
-        """Validate ID consistency"""
-        try:
-            nested_ids = self._extract_all_ids(nested_data)
-            flat_ids = self._extract_all_ids(flat_data)
-            
-            return {
-                "status": nested_ids == flat_ids,
-                "nested_ids_count": len(nested_ids),
-                "flat_ids_count": len(flat_ids),
-                "missing_in_flat": list(nested_ids - flat_ids),
-                "extra_in_flat": list(flat_ids - nested_ids)
-            }
-        except Exception as e:
-            return {"status": False, "error": str(e)}
-    
-    def _extract_all_content(self, data: Dict) -> str:
-        """Extract all content from data"""
-        content_parts = []
-        
-        for element_type, elements in data.items():
-            if element_type not in ELEMENT_CONFIGS:
-                continue
-                
-            config = ELEMENT_CONFIGS[element_type]
-            
-            for element in elements:
-                content = ""
-                
-                if hasattr(config, 'content_field') and config.content_field in element:
-                    content = element.get(config.content_field, "")
-                
-                if not content:
-                    if element_type == 'vbpl_section':
-                        content = element.get('section_content', '')
-                    elif element_type == 'vbpl_clause':
-                        content = element.get('clause_content', '')
-                    elif element_type == 'vbpl_point':
-                        content = element.get('point_content', '')
-                    
-                    if not content:
-                        content = (element.get('content', '') or 
-                                 element.get(config.name_field, ''))
-                
-                if content:
-                    content_parts.append(str(content))
-        
-        return "".join(content_parts)
-    
-    def _extract_all_content_flat(self, data: Dict) -> str:
-        """Extract all content from flat data"""
-        return self._extract_all_content(data)
-    
-    def _build_relation_map(self, data: Dict) -> set:
-        """Build relationship map for data"""
-        relations = set()
-        
-        for element_type, elements in data.items():
-            if element_type not in ELEMENT_CONFIGS:
-                continue
-                
-            config = ELEMENT_CONFIGS[element_type]
-            
-            for element in elements:
-                element_id = element.get(config.id_field)
-                if not element_id:
-                    continue
-                
-                immediate_parent_id = element.get('immediate_parent_id')
-                if immediate_parent_id:
-                    relations.add((str(immediate_parent_id), str(element_id)))
-        
-        return relations
-    
-    def _build_relation_map_flat(self, data: Dict) -> set:
-        """Build relationship map for flat data"""
-        return self._build_relation_map(data)
-    
-    def _extract_all_ids(self, data: Dict) -> set:
-        """Extract all IDs from data"""
-        ids = set()
-        for element_type, elements in data.items():
-            config = ELEMENT_CONFIGS.get(element_type)
-            if config and hasattr(config, 'id_field'):
-                for element in elements:
-                    element_id = element.get(config.id_field)
-                    if element_id:
-                        ids.add(str(element_id))
-                    tag_id = element.get('tag_id')
-                    if tag_id:
-                        ids.add(str(tag_id))
-        return ids
-
-# ====================== MAIN PROCESSOR ======================
-
-class OptimizedVBPLProcessor:
-    """OPTIMIZED VBPL processor with FIXED number/name/content separation"""
-    
-    def __init__(self, config: ProcessingConfig):
-        self.config = config
-        self.logger = None
-    
-    def process_document(self, judgment_id: str) -> Tuple[bool, Optional[Dict]]:
-        """Process document with OPTIMIZED dual format output và return data"""
-        self.logger = setup_logging(self.config, judgment_id)
-        self.logger.info(f"Starting OPTIMIZED VBPL processing for document {judgment_id}")
-        
-        try:
-            text_processor = TextProcessor(self.config.viet74k_path, self.logger)
-            html_processor = HTMLProcessor(text_processor, self.logger)
-            structure_extractor = OptimizedDualFormatExtractor(self.logger, self.config)
-            
-            headers = self._load_headers()
-            json_data = self._fetch_json_data(judgment_id, headers)
-            json_data = self._normalize_json_data(json_data, text_processor, judgment_id)
-            
-            html_content = self._process_html(json_data, html_processor, judgment_id)
-            if not html_content:
-                return False, None
-            
-            soup = BeautifulSoup(html_content, "html.parser")
-            soup = html_processor.process_html_optimized(soup)
-            
-            normalized_html_file = os.path.join(self.config.log_dir, f"s3_{judgment_id}_normalized.html")
-            with open(normalized_html_file, "w", encoding="utf-8") as f:
-                f.write(str(soup))
-            
-            dual_format_result = structure_extractor.extract_structure(soup, judgment_id)
-            
-            # CREATE COMPLETE RESULT OBJECT - Direct access data
-            complete_result = {
-                "document_metadata": self._extract_document_metadata(json_data),
-                "structure_data": dual_format_result["data"],
-                "structure_data_flat": dual_format_result["data_flat"],
-                "validation": dual_format_result["validation"],
-                "metadata": dual_format_result["metadata"]
-            }
-            
-            # Save files như cũ để backup
-            self._save_results(dual_format_result, json_data, judgment_id)
-            self._log_enhanced_validation_results(dual_format_result["validation"])
-            
-            self.logger.info("✅ OPTIMIZED VBPL processing completed successfully")
-            return True, complete_result
-            
-        except Exception as e:
-            self.logger.error(f"❌ Processing failed: {e}", exc_info=True)
-            return False, None
-    
-    def _load_headers(self) -> Dict[str, str]:
-        """Load API headers"""
-        headers = {}
-        try:
-            with open(self.config.headers_path, "r", encoding="utf-8") as f:
-                for line in f:
-                    if ": " in line:
-                        key, value = line.strip().split(": ", 1)
-                        headers[key] = value
-            self.logger.info(f"Loaded {len(headers)} headers")
-            return headers
-        except Exception as e:
-            self.logger.error(f"Failed to load headers: {e}")
-            raise
-    
-    def _fetch_json_data(self, judgment_id: str, headers: Dict[str, str]) -> Dict:
-        """Fetch JSON data from API with improved error handling"""
-        url = f"https://lexcentra.ai/api/search/{judgment_id}?type_document=4&is_vbpl_diagram=1"
-        
-        try:
-            response = requests.get(url, headers=headers, timeout=30)
-            response.raise_for_status()
-            
-            # Parse JSON response
-            json_response = response.json()
-            
-            # Handle different response formats
-            if "data" in json_response:
-                data = json_response["data"]
-            elif isinstance(json_response, dict):
-                # Sometimes response is direct data without "data" wrapper
-                data = json_response
-            else:
-                self.logger.error(f"Unexpected API response format for {judgment_id}")
-                raise ValueError(f"Invalid API response format")
-            
-            # Validate data is not empty
-            if not data:
-                self.logger.error(f"Empty data received for {judgment_id}")
-                raise ValueError(f"Empty data received")
-            
-            # Save raw response for debugging
-            raw_file = os.path.join(self.config.log_dir, f"api_{judgment_id}_raw.json")
-            with open(raw_file, "w", encoding="utf-8") as f:
-                json.dump({"response": json_response}, f, ensure_ascii=False, indent=2)
-            
-            self.logger.info("JSON data fetched successfully")
-            return data
-            
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"HTTP request failed for {judgment_id}: {e}")
-            raise
-        except json.JSONDecodeError as e:
-            self.logger.error(f"JSON decode failed for {judgment_id}: {e}")
-            raise
-        except Exception as e:
-            self.logger.error(f"Failed to fetch JSON data for {judgment_id}: {e}")
-            raise
-
-    def _filter_vbpl_relevant_fields(self, data: Dict) -> Dict:
-        """Filter to keep only VBPL-relevant fields"""
-        filtered_data = {}
-    
-        for key, value in data.items():
-            if key in VBPL_FIELDS_TO_KEEP:
-                filtered_data[key] = value
-    
-        return filtered_data
-
-    def _normalize_json_data(self, data: Dict, text_processor: TextProcessor, judgment_id: str) -> Dict:
-        """Normalize JSON data structure and text"""
-        self.logger.info("Normalizing JSON data")
-        
-        # Normalize lists
-        for element_type in ELEMENT_CONFIGS.keys():
-            data[element_type] = self._normalize_json_list(data.get(element_type, []))
-        
-        # Normalize text fields
-        for element_type in ELEMENT_CONFIGS.keys():
-            for obj in data.get(element_type, []):
-                for field, value in obj.items():
-                    if isinstance(value, str):
-                        obj[field] = text_processor.clean_text(value)
-        
-        data = self._filter_vbpl_relevant_fields(data)
-        
-        # Save normalized data
-        normalized_file = os.path.join(self.config.log_dir, f"api_{judgment_id}_json_normalize.json")
-        with open(normalized_file, "w", encoding="utf-8") as f:
-            json.dump({"data": data}, f, ensure_ascii=False, indent=2)
-        
-        self.logger.info("JSON data normalization completed")
-        return data
-    
-    def _normalize_json_list(self, raw_data: Any) -> List[Dict]:
-        """Normalize various JSON list formats"""
-        if isinstance(raw_data, list):
-            return raw_data
-        if isinstance(raw_data, dict):
-            return [raw_data]
-        if isinstance(raw_data, str):
-            text = raw_data.strip()
-            if not text:
-                return []
-            
-            # Try parsing as JSON list
-            if text.startswith("[") and text.endswith("]"):
-                try:
-                    return json.loads(text)
-                except json.JSONDecodeError:
-                    pass
-            
-            # Try fixing malformed JSON
-            try:
-                fixed_text = "[" + text + "]"
-                fixed_text = fixed_text.replace(",]", "]")
-                return json.loads(fixed_text)
-            except json.JSONDecodeError:
-                pass
-            
-            # Try single object
-            try:
-                obj = json.loads(text)
-                return [obj]
-            except json.JSONDecodeError:
-                pass
-        
-        return []
-
-   
-
-    def _extract_document_metadata(self, json_data: Dict) -> Dict:
-        """Extract document metadata từ API response"""
-        document_metadata = {}
-        metadata_fields = [
-            "id_judgment", "judgment_number", "judgment_name", "full_judgment_name",
-            "date_issued", "state", "state_id", "doc_type", "issuing_authority",
-            "s3_key", "vbpl_diagram", "application_date", "expiration_date", 
-            "expiration_date_not_applicable", "type_document", "sector"
-        ]
-        
-        for field in metadata_fields:
-            if field in json_data:
-                document_metadata[field] = json_data[field]
-        
-        return document_metadata
-    
-    def _process_html(self, json_data: Dict, html_processor: HTMLProcessor, judgment_id: str) -> Optional[str]:
-        """Process HTML from S3"""
-        s3_url = json_data.get("s3_key")
-        if not s3_url:
-            self.logger.error("No s3_key found")
-            return None
-        
-        self.logger.info(f"Fetching HTML from: {s3_url}")
-        
-        raw_html_file = os.path.join(self.config.log_dir, f"s3_{judgment_id}_raw.html")
-        html_content = html_processor.get_html_content_with_encoding(s3_url, raw_html_file)
-        
-        if not html_content:
-            self.logger.error("Failed to fetch HTML content")
-            return None
-        
-        self.logger.info("HTML content processed successfully")
-        return html_content
-    
-    def _save_results(self, dual_format_result: Dict, json_metadata: Dict, judgment_id: str) -> None:
-        """Save all processing results with JSON serialization safety and metadata"""
-        try:
-            # Extract document metadata INCLUDING vbpl_diagram
-            document_metadata = {}
-            metadata_fields = [
-                "id_judgment", "judgment_number", "judgment_name", "full_judgment_name",
-                "date_issued", "state", "state_id", "doc_type", "issuing_authority",
-                "s3_key", "vbpl_diagram", "application_date", "expiration_date", 
-                "expiration_date_not_applicable", "type_document", "sector"
-            ]
-            
-            for field in metadata_fields:
-                if field in json_metadata:
-                    document_metadata[field] = json_metadata[field]
-            
-            # Create nested format with metadata
-            nested_with_metadata = {
-                "document_metadata": document_metadata,
-                "structure_data": dual_format_result["data"]
-            }
-            
-            # Create flat format with metadata  
-            flat_with_metadata = {
-                "document_metadata": document_metadata,
-                "structure_data": dual_format_result["data_flat"]
-            }
-            
-            nested_file = os.path.join(self.config.log_dir, f"optimized_nested_{judgment_id}.json")
-            with open(nested_file, "w", encoding="utf-8") as f:
-                json.dump(nested_with_metadata, f, ensure_ascii=False, indent=2)
-            
-            flat_file = os.path.join(self.config.log_dir, f"optimized_flat_{judgment_id}.json")
-            with open(flat_file, "w", encoding="utf-8") as f:
-                json.dump(flat_with_metadata, f, ensure_ascii=False, indent=2)
-            
-            validation_file = os.path.join(self.config.log_dir, f"optimized_validation_{judgment_id}.json")
-            with open(validation_file, "w", encoding="utf-8") as f:
-                json.dump(dual_format_result["validation"], f, ensure_ascii=False, indent=2)
-            
-            metadata_file = os.path.join(self.config.log_dir, f"optimized_metadata_{judgment_id}.json")
-            with open(metadata_file, "w", encoding="utf-8") as f:
-                json.dump(dual_format_result["metadata"], f, ensure_ascii=False, indent=2)
-            
-            complete_file = os.path.join(self.config.log_dir, f"optimized_complete_{judgment_id}.json")
-            try:
-                with open(complete_file, "w", encoding="utf-8") as f:
-                    json.dump(dual_format_result, f, ensure_ascii=False, indent=2)
-            except TypeError as e:
-                self.logger.warning(f"Could not save complete file due to JSON serialization issue: {e}")
-                sanitized_result = self._sanitize_for_json(dual_format_result)
-                with open(complete_file, "w", encoding="utf-8") as f:
-                    json.dump(sanitized_result, f, ensure_ascii=False, indent=2)
-            
-            self.logger.info("All OPTIMIZED results saved successfully")
-            
-        except Exception as e:
-            self.logger.error(f"Error saving results: {e}")
-            raise
-    
-    def _sanitize_for_json(self, data):
-        """Recursively sanitize data for JSON serialization"""
-        if isinstance(data, dict):
-            return {k: self._sanitize_for_json(v) for k, v in data.items()}
-        elif isinstance(data, list):
-            return [self._sanitize_for_json(item) for item in data]
-        elif isinstance(data, set):
-            return list(data)
-        elif isinstance(data, (str, int, float, bool)) or data is None:
-            return data
-        else:
-            return str(data)
-    
-    def _log_enhanced_validation_results(self, validation: Dict) -> None:
-        """Log ENHANCED validation results with deduplication metrics"""
-        self.logger.info("📊 ENHANCED VALIDATION RESULTS (FIXED VERSION):")
-        self.logger.info(f"   Overall Status: {'✅ PASS' if validation.get('status', False) else '❌ FAIL'}")
-        
-        content = validation.get('content_integrity', {})
-        self.logger.info(f"   Content Integrity: {'✅' if content.get('status', False) else '❌'}")
-        if not content.get('status', False):
-            self.logger.info(f"     Nested chars: {content.get('total_characters_nested', 0)}")
-            self.logger.info(f"     Flat chars: {content.get('total_characters_flat', 0)}")
-        
-        relations = validation.get('relationship_integrity', {})
-        self.logger.info(f"   Relationship Integrity: {'✅' if relations.get('status', False) else '❌'}")
-        
-        counts = validation.get('count_verification', {})
-        self.logger.info(f"   Count Verification: {'✅' if counts.get('status', False) else '❌'}")
-        for element_type in ELEMENT_CONFIGS.keys():
-            if element_type in counts:
-                element_counts = counts[element_type]
-                nested = element_counts.get('nested', 0)
-                flat = element_counts.get('flat', 0)
-                match = element_counts.get('match', False)
-                status_icon = '✅' if match else '❌'
-                self.logger.info(f"     {element_type}: {status_icon} N:{nested} F:{flat}")
-        
-        ids = validation.get('id_consistency', {})
-        self.logger.info(f"   ID Consistency: {'✅' if ids.get('status', False) else '❌'}")
-        if not ids.get('status', False):
-            missing = ids.get('missing_in_flat', [])
-            extra = ids.get('extra_in_flat', [])
-            if missing:
-                self.logger.info(f"     Missing in flat: {len(missing)} IDs")
-            if extra:
-                self.logger.info(f"     Extra in flat: {len(extra)} IDs")
-        
-        dedup = validation.get('deduplication_check', {})
-        self.logger.info(f"   🎯 DEDUPLICATION CHECK: {'✅ NO DUPLICATES' if dedup.get('status', False) else '❌ DUPLICATES FOUND'}")
-        if dedup:
-            self.logger.info(f"     Total content items: {dedup.get('total_content_items', 0)}")
-            self.logger.info(f"     Unique content: {dedup.get('unique_content_count', 0)}")
-            self.logger.info(f"     Duplicate content: {dedup.get('duplicate_content_count', 0)}")
-            self.logger.info(f"     💰 Efficiency gain: {dedup.get('efficiency_gain', '0%')}")
-
-# ====================== MAIN EXECUTION ======================
-
-def test_fixed_patterns():
-    """Test function to verify FIXED patterns work correctly"""
-    test_cases = [
-        # High-level elements (should extract number and name separately)
-        ("Phần I. NHỮNG QUY ĐỊNH CHUNG", "vbpl_big_part", ("Phần I", "NHỮNG QUY ĐỊNH CHUNG")),
-        ("Chương II. CHIẾN LƯỢC, QUY HOẠCH KHOÁNG SẢN", "vbpl_chapter", ("Chương II", "CHIẾN LƯỢC, QUY HOẠCH KHOÁNG SẢN")),
-        ("Mục 1. TÀI CHÍNH VỀ KHOÁNG SẢN", "vbpl_part", ("Mục 1", "TÀI CHÍNH VỀ KHOÁNG SẢN")),
-        ("Tiểu mục 2. ĐẤU GIÁ QUYỀN KHAI THÁC", "vbpl_mini_part", ("Tiểu mục 2", "ĐẤU GIÁ QUYỀN KHAI THÁC")),
-        ("Điều 1. Phạm vi điều chỉnh", "vbpl_section", ("Điều 1", "Phạm vi điều chỉnh")),
-        
-        # Low-level elements (should extract number only, content separate)
-        ("1. Khoáng sản là khoáng vật có ích", "vbpl_clause", ("1.", "Khoáng sản là khoáng vật có ích")),
-        ("a) Hỗ trợ chi phí đầu tư nâng cấp", "vbpl_point", ("a)", "Hỗ trợ chi phí đầu tư nâng cấp")),
-        
-        # Edge cases
-        ("Phần I", "vbpl_big_part", ("Phần I", "")),
-        ("Điều 25", "vbpl_section", ("Điều 25", "")),
-        ("đ) Quy định khác", "vbpl_point", ("đ)", "Quy định khác")),
-    ]
-    
-    print("🧪 Testing FIXED Regex Patterns:")
-    
-    for text, expected_type, expected_extraction in test_cases:
-        # Test level detection
-        level_info = get_element_level_from_configs(text)
-        actual_type = level_info[1] if level_info else None
-        type_status = "✅" if actual_type == expected_type else "❌"
-        
-        # Test extraction
-        if expected_type in ELEMENT_CONFIGS:
-            config = ELEMENT_CONFIGS[expected_type]
-            flags = re.IGNORECASE if expected_type == 'vbpl_section' else 0
-            match = re.match(config.pattern, text, flags)
-            
-            if match:
-                actual_number = match.group(1).strip() if match.group(1) else ""
-                actual_content = match.group(2).strip() if len(match.groups()) >= 2 and match.group(2) else ""
-                actual_extraction = (actual_number, actual_content)
-                extraction_status = "✅" if actual_extraction == expected_extraction else "❌"
-            else:
-                actual_extraction = (None, None)
-                extraction_status = "❌"
-        else:
-            actual_extraction = (None, None)
-            extraction_status = "❌"
-        
-        print(f"   {type_status}{extraction_status} '{text}'")
-        print(f"      Type: {actual_type} (expected: {expected_type})")
-        print(f"      Extract: {actual_extraction} (expected: {expected_extraction})")
-
-# ====================== UTILITY FUNCTIONS FOR CLI CRAWLER ======================
-
-def extract_judgment_ids_from_vbpl_diagram(vbpl_diagram_data) -> List[str]:
-    """Extract judgment IDs từ vbpl_diagram field - API format"""
-    judgment_ids = []
-    
-    if not vbpl_diagram_data:
-        return judgment_ids
-    
-    # Handle different input types  
-    if isinstance(vbpl_diagram_data, str):
-        try:
-            data = json.loads(vbpl_diagram_data)
-        except json.JSONDecodeError:
-            return judgment_ids
-    elif isinstance(vbpl_diagram_data, list):
-        data = vbpl_diagram_data
-    else:
-        return judgment_ids
-    
-    # Process vbpl_diagram array: [{"vbpl_diagram_name": "...", "id_judgments": "12561, 27504", "count": 2}]
-    for item in data:
-        if isinstance(item, dict) and 'id_judgments' in item:
-            id_judgments_str = str(item['id_judgments']).strip()
-            
-            if id_judgments_str:
-                # Parse comma-separated judgment IDs
-                ids = [id.strip() for id in id_judgments_str.split(',')]
-                
-                # Validate and add numeric IDs
-                for jid in ids:
-                    jid = jid.strip()
-                    if jid and jid.isdigit():
-                        judgment_ids.append(jid)
-    
-    # Remove duplicates while preserving order
-    unique_ids = []
-    for jid in judgment_ids:
-        if jid not in unique_ids:
-            unique_ids.append(jid)
-    
-    return unique_ids
-
-def extract_vbpl_relations_with_types(vbpl_diagram_data) -> List[Dict[str, str]]:
-    """Extract relations với types cho database storage"""
-    relations = []
-    
-    if not vbpl_diagram_data:
-        return relations
-    
-    # Parse input
-    if isinstance(vbpl_diagram_data, str):
-        try:
-            data = json.loads(vbpl_diagram_data)
-        except json.JSONDecodeError:
-            return relations
-    elif isinstance(vbpl_diagram_data, list):
-        data = vbpl_diagram_data
-    else:
-        return relations
-    
-    # Extract relationships
-    for item in data:
-        if isinstance(item, dict) and 'id_judgments' in item:
-            relation_name = item.get('vbpl_diagram_name', 'unknown')
-            id_judgments_str = str(item['id_judgments']).strip()
-            
-            if id_judgments_str:
-                ids = [id.strip() for id in id_judgments_str.split(',')]
-                
-                for jid in ids:
-                    jid = jid.strip()
-                    if jid and jid.isdigit():
-                        relations.append({
-                            'target_judgment_id': jid,
-                            'relation_type': relation_name
-                        })
-    
-    return relations
-
-def extract_judgment_ids_from_result(result_data: Dict) -> List[str]:
-    """Extract judgment IDs directly từ result data"""
-    if not result_data or 'document_metadata' not in result_data:
-        return []
-    
-    vbpl_diagram = result_data['document_metadata'].get('vbpl_diagram')
-    return extract_judgment_ids_from_vbpl_diagram(vbpl_diagram)
-
-def extract_relations_from_result(result_data: Dict) -> List[Dict[str, str]]:
-    """Extract relations directly từ result data"""
-    if not result_data or 'document_metadata' not in result_data:
-        return []
-    
-    vbpl_diagram = result_data['document_metadata'].get('vbpl_diagram')
-    return extract_vbpl_relations_with_types(vbpl_diagram)
-
-def get_processor_for_crawler(log_dir: str = "log_vbpl") -> OptimizedVBPLProcessor:
-    """Factory function cho CLI crawler"""
-    config = ProcessingConfig(
-        debug_extraction=False,
-        enable_clause=True,
-        enable_point=True,
-        enable_deduplication=True,
-        log_dir=log_dir
-    )
-    return OptimizedVBPLProcessor(config)
-
-def main(judgment_id: str = None, return_data: bool = False):
-    """Main execution với support cho CLI crawler"""
-    print("🚀 Starting FIXED VBPL Processor")
-    
-    config = ProcessingConfig(
-        debug_extraction=True,
-        enable_clause=True,
-        enable_point=True,
-        enable_deduplication=True
-    )
-    
-    processor = OptimizedVBPLProcessor(config)
-    
-    judgment_id = judgment_id or "115624"
-    
-    if return_data:
-        # Mode cho CLI crawler - return data
-        success, result_data = processor.process_document(judgment_id)
-        if success:
-            print(f"✅ Document {judgment_id} processed successfully!")
-            print(f"📁 Check results in: {config.log_dir}/")
-            return True, result_data
-        else:
-            print(f"❌ Document {judgment_id} processing failed!")
-            return False, None
-    else:
-        # Mode cũ - chỉ return boolean
-        success, _ = processor.process_document(judgment_id)
-        if success:
-            print(f"✅ Document {judgment_id} processed successfully!")
-            print(f"📁 Check results in: {config.log_dir}/")
-            print("🎯 FIXED Features:")
-            print("   • ✅ Proper Number/Name/Content Separation")
-            print("   • ✅ NO Content Duplication")
-            print("   • ✅ Smart Heading Merging")
-            print("💰 Benefits: 77% Storage Reduction, 70% Faster RAG")
-        else:
-            print(f"❌ Document {judgment_id} processing failed!")
-            print(f"📁 Check logs in: {config.log_dir}/")
-
-
-if __name__ == "__main__":
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+import os
+import sys
+import json
+import asyncio
+import re
+import unicodedata
+import logging
+import hashlib
+import threading
+import struct
+import bisect
+import time
+import random
+import cProfile
+import pstats
+import multiprocessing
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple, Any, Set
+from array import array
+from dataclasses import dataclass
+from bs4 import BeautifulSoup, NavigableString, Tag
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.managers import BaseManager
+from datetime import datetime
+from urllib.parse import urlparse
+
+
+# ====================== CONFIGURATION ======================
+
+@dataclass
+class ProcessingConfig:
+    """Configuration class for processing parameters"""
+    log_dir: str = "log_vbpl"
+    viet74k_path: str = "Viet74K.txt"
+    headers_path: str = "header.txt"
+    debug_extraction: bool = False
+    enable_clause: bool = True
+    enable_point: bool = True
+    enable_deduplication: bool = True
+    connect_timeout: float = 10.0
+    read_timeout: float = 30.0
+    http_pool_size: int = 16
+    cache_dir: Optional[str] = None  # on-disk HTTP response cache, None = disabled
+    cache_api_ttl: float = 86400.0  # seconds before lexcentra API responses are revalidated
+    cache_html_ttl: float = 30 * 86400.0  # seconds before S3 HTML is revalidated
+    offline: bool = False  # serve everything from cache_dir, never touch the network
+    retry_attempts: int = 3  # attempts per request on timeout / connection error / 429 / 5xx
+    retry_backoff: float = 1.0  # base seconds for full-jitter exponential backoff
+    retry_backoff_max: float = 60.0
+    adaptive_concurrency: bool = False  # AIMD in-flight limit per host
+    max_host_concurrency: int = 16
+    api_base_url: str = "https://lexcentra.ai"  # e.g. http://127.0.0.1:8780 for vbpl_mock_server.py
+    profile_docs: Tuple[str, ...] = ()  # judgment IDs whose extraction always runs under cProfile
+    profile_sample_rate: float = 0.0  # fraction of other documents to profile (stable per judgment_id)
+    clean_text_cache_size: int = 32768  # LRU entries of clean_text output per process, 0 = disabled
+    clean_text_cache_shared: bool = False  # pipeline mode: long strings also go through an LRU shared by extraction workers
+    
+    def __post_init__(self):
+        os.makedirs(self.log_dir, exist_ok=True)
+
+@dataclass
+class ElementConfig:
+    """Configuration for element types"""
+    element_type: str
+    id_field: str
+    number_field: str
+    name_field: str
+    content_field: str
+    pattern: str
+    level: int
+    parent_types: List[str] = None
+
+# UPDATED VBPL HIERARCHY CONFIGURATION - FIXED PATTERNS FOR PROPER NUMBER/NAME/CONTENT SEPARATION
+ELEMENT_CONFIGS = {
+    'vbpl_big_part': ElementConfig(
+        element_type='vbpl_big_part',
+        id_field='vbpl_big_part_id',
+        number_field='big_part_number',
+        name_field='big_part_name',
+        content_field='big_part_content',
+        pattern=r'(Phần\s+(?:[IVXLCDM]+|\d+))(?:[.:\-]?\s*(.*))?',  # Capture full "Phần I" as number
+        level=1,
+        parent_types=[]
+    ),
+    'vbpl_chapter': ElementConfig(
+        element_type='vbpl_chapter',
+        id_field='vbpl_chapter_id', 
+        number_field='chapter_number',
+        name_field='chapter_name',
+        content_field='chapter_content',
+        pattern=r'(Chương\s+(?:[IVXLCDM]+|\d+))(?:[.:\-]?\s*(.*))?',  # Capture full "Chương II" as number
+        level=2,
+        parent_types=['vbpl_big_part']
+    ),
+    'vbpl_part': ElementConfig(
+        element_type='vbpl_part',
+        id_field='vbpl_part_id',
+        number_field='part_number', 
+        name_field='part_name',
+        content_field='part_content',
+        pattern=r'(Mục\s+(?:[IVXLCDM]+|\d+))(?:[.:\-]?\s*(.*))?',  # Capture full "Mục 1" as number
+        level=3,
+        parent_types=['vbpl_big_part', 'vbpl_chapter']
+    ),
+    'vbpl_mini_part': ElementConfig(
+        element_type='vbpl_mini_part',
+        id_field='vbpl_mini_part_id',
+        number_field='mini_part_number',
+        name_field='mini_part_name',
+        content_field='mini_part_content',
+        pattern=r'(Tiểu mục\s+(?:[IVXLCDM]+|\d+))(?:[.:\-]?\s*(.*))?',  # Capture full "Tiểu mục 2" as number
+        level=4,
+        parent_types=['vbpl_big_part', 'vbpl_chapter', 'vbpl_part']
+    ),
+    'vbpl_section': ElementConfig(
+        element_type='vbpl_section',
+        id_field='vbpl_section_id',
+        number_field='section_number',
+        name_field='section_name',
+        content_field='section_content',
+        pattern=r'(Điều\s+\d+)\.?\s*(.*)$',  # Capture full "Điều 1" as number, rest as name
+        level=5,
+        parent_types=['vbpl_big_part', 'vbpl_chapter', 'vbpl_part', 'vbpl_mini_part']
+    ),
+    'vbpl_clause': ElementConfig(
+        element_type='vbpl_clause',
+        id_field='vbpl_clause_id',
+        number_field='clause_number',
+        name_field='clause_name',
+        content_field='clause_content',
+        pattern=r'(\d+\.)\s*(.*)',  # Capture "1." as number, rest as content (name will be empty)
+        level=6,
+        parent_types=['vbpl_big_part', 'vbpl_chapter', 'vbpl_part', 'vbpl_mini_part', 'vbpl_section']
+    ),
+    'vbpl_point': ElementConfig(
+        element_type='vbpl_point',
+        id_field='vbpl_point_id',
+        number_field='point_number',
+        name_field='point_name',
+        content_field='point_content',
+        pattern=r'([a-zđ]\))\s*(.*)',  # Capture "a)" as number, rest as content (name will be empty)
+        level=7,
+        parent_types=['vbpl_big_part', 'vbpl_chapter', 'vbpl_part', 'vbpl_mini_part', 'vbpl_section', 'vbpl_clause']
+    )
+}
+
+LEXCENTRA_BASE_URL = "https://lexcentra.ai"
+LEXCENTRA_API_PATH = "/api/search/{judgment_id}?type_document=4&is_vbpl_diagram=1"
+LEXCENTRA_API_URL = LEXCENTRA_BASE_URL + LEXCENTRA_API_PATH
+LEXCENTRA_HOST = "lexcentra.ai"
+
+def api_url(base_url: str, judgment_id: str) -> str:
+    """Search API URL của judgment_id trên `base_url` (production hoặc mock server)"""
+    return base_url.rstrip("/") + LEXCENTRA_API_PATH.format(judgment_id=judgment_id)
+
+def api_host(base_url: str) -> str:
+    """Host key của API cho rate limiter / cache TTL"""
+    return urlparse(base_url).netloc.lower()
+
+VBPL_FIELDS_TO_KEEP = [
+    "id_judgment", "judgment_number", "judgment_name", "full_judgment_name",
+    "date_issued", "state", "state_id", "doc_type", "issuing_authority",
+    "s3_key", "vbpl_diagram", "vbpl_big_part", 
+    "vbpl_chapter", "vbpl_part", "vbpl_mini_part", "vbpl_section",
+    "vbpl_clause", "vbpl_point",
+    "application_date", "expiration_date", "expiration_date_not_applicable",
+    "type_document", "sector"
+]
+
+FIELD_ORDER = [
+    'vbpl_big_part_id', 'vbpl_chapter_id', 'vbpl_part_id', 'vbpl_mini_part_id', 
+    'vbpl_section_id', 'vbpl_clause_id', 'vbpl_point_id',
+    'big_part_number', 'chapter_number', 'part_number', 'mini_part_number',
+    'section_number', 'clause_number', 'point_number',
+    'big_part_name', 'chapter_name', 'part_name', 'mini_part_name', 
+    'section_name', 'clause_name', 'point_name',
+    'section_content', 'clause_content', 'point_content',
+    'entity_type', 'tag_id'
+]
+
+# ====================== CONTENT DEDUPLICATION SYSTEM ======================
+
+class ContentDeduplicator:
+    """Advanced content deduplication system"""
+    
+    def __init__(self, logger: logging.Logger):
+        self.logger = logger
+        self.content_signatures: Set[str] = set()
+        self.paragraph_map: Dict[str, str] = {}
+        
+    def get_content_signature(self, content: str) -> str:
+        """Create normalized content signature for deduplication"""
+        if not content:
+            return ""
+        
+        normalized = re.sub(r'\s+', ' ', content.lower().strip())
+        normalized = re.sub(r'[^\w\s]', '', normalized)
+        return hashlib.md5(normalized.encode()).hexdigest()[:16]
+    
+    def mark_paragraph_as_extracted(self, paragraph: str, content_type: str):
+        """Mark paragraph as already extracted by specific content type"""
+        signature = self.get_content_signature(paragraph)
+        if signature:
+            self.paragraph_map[signature] = content_type
+    
+    def is_paragraph_already_extracted(self, paragraph: str, current_type: str) -> bool:
+        """Check if paragraph was already extracted by higher level element"""
+        signature = self.get_content_signature(paragraph)
+        extracted_by = self.paragraph_map.get(signature)
+        
+        if not extracted_by:
+            return False
+        
+        # priority_order = ['point', 'clause', 'section', 'mini_part', 'part', 'chapter', 'big_part']
+        priority_order = ['big_part', 'chapter', 'part', 'mini_part', 'section', 'clause', 'point']
+        
+        try:
+            extracted_priority = priority_order.index(extracted_by)
+            current_priority = priority_order.index(current_type)
+            return extracted_priority < current_priority
+        except ValueError:
+            return False
+    
+    def extract_unique_content(self, all_paragraphs: List[str], 
+                             child_elements: List[Dict], 
+                             current_type: str) -> str:
+        """Extract content unique to current level, excluding child content"""
+        
+        for child in child_elements:
+            child_content = self._get_child_content(child)
+            if child_content:
+                for paragraph in child_content.split('\n'):
+                    if paragraph.strip():
+                        self.mark_paragraph_as_extracted(paragraph.strip(), current_type)
+        
+        unique_paragraphs = []
+        for paragraph in all_paragraphs:
+            if paragraph.strip():
+                if self._is_structural_header(paragraph):
+                    continue
+                
+                if not self.is_paragraph_already_extracted(paragraph, current_type):
+                    unique_paragraphs.append(paragraph)
+                    self.mark_paragraph_as_extracted(paragraph, current_type)
+        
+        return "\n".join(unique_paragraphs)
+    
+    def _get_child_content(self, child_element: Dict) -> str:
+        """Extract content from child element"""
+        for field in ['clause_content', 'point_content', 'section_content', 'content']:
+            if field in child_element and child_element[field]:
+                return child_element[field]
+        return ""
+    
+    def _is_structural_header(self, paragraph: str) -> bool:
+        """Check if paragraph is a structural header"""
+        return STRUCTURAL_HEADER_CLASSIFIER.matches(paragraph.strip())
+
+# ====================== RATE LIMITING ======================
+
+class TokenBucket:
+    """Thread-safe token bucket - `rate` tokens per second, up to `capacity` burst"""
+    
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> float:
+        """Block until one token is available, return seconds spent waiting"""
+        if self.rate <= 0:
+            return 0.0
+        
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return waited
+                
+                wait_time = (1.0 - self.tokens) / self.rate
+            
+            time.sleep(wait_time)
+            waited += wait_time
+
+class HostRateLimiter:
+    """Per-host token buckets: lexcentra API và S3 HTML host được giới hạn riêng"""
+    
+    def __init__(self, default_rate: float, host_rates: Optional[Dict[str, float]] = None, burst: float = 1.0):
+        self.default_rate = default_rate
+        self.host_rates = host_rates or {}
+        self.burst = burst
+        self.buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+    
+    def get_bucket(self, host: str) -> TokenBucket:
+        with self._lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                rate = self.host_rates.get(host, self.default_rate)
+                bucket = TokenBucket(rate, self.burst)
+                self.buckets[host] = bucket
+            return bucket
+    
+    def acquire(self, url: str) -> float:
+        """Wait for a request slot on the host of `url`"""
+        host = urlparse(url).netloc.lower()
+        return self.get_bucket(host).acquire()
+
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+# Truncated/aborted bodies surface as ChunkedEncodingError, not ConnectionError
+RETRY_EXCEPTIONS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                    requests.exceptions.ChunkedEncodingError)
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD in-flight limit per host.
+    
+    Mỗi response tốt tăng limit thêm 1/limit (≈ +1 mỗi vòng), 429/5xx/timeout hoặc latency
+    vượt `latency_tolerance` lần baseline thì nhân limit với `decrease_factor` - tối đa một lần
+    mỗi round-trip (latency trung bình của host), để một loạt lỗi cùng lúc không kéo limit về sàn.
+    """
+    
+    def __init__(self, initial_limit: float = 2.0, min_limit: float = 1.0, max_limit: float = 16.0,
+                 decrease_factor: float = 0.5, latency_tolerance: float = 2.0):
+        self.initial_limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, min_limit)
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.hosts: Dict[str, Dict] = {}
+        self._cond = threading.Condition()
+    
+    def _host_state(self, host: str) -> Dict:
+        state = self.hosts.get(host)
+        if state is None:
+            state = {
+                "limit": min(max(self.initial_limit, self.min_limit), self.max_limit),
+                "in_flight": 0, "latency": None, "baseline": None, "last_decrease": 0.0,
+                "responses": 0, "throttled": 0, "server_errors": 0, "network_errors": 0,
+                "slow": 0, "decreases": 0, "wait_seconds": 0.0
+            }
+            self.hosts[host] = state
+        return state
+    
+    def acquire(self, url: str) -> float:
+        """Block until the host has a free in-flight slot, return seconds spent waiting"""
+        host = urlparse(url).netloc.lower()
+        started = time.monotonic()
+        with self._cond:
+            state = self._host_state(host)
+            while state["in_flight"] >= int(state["limit"]):
+                self._cond.wait()
+            state["in_flight"] += 1
+            waited = time.monotonic() - started
+            state["wait_seconds"] += waited
+        return waited
+    
+    def release(self, url: str, latency: float, status: Optional[int]) -> None:
+        """Feed back one request outcome - `status` None means timeout/connection error"""
+        host = urlparse(url).netloc.lower()
+        with self._cond:
+            state = self._host_state(host)
+            state["in_flight"] -= 1
+            state["responses"] += 1
+            
+            if status is None:
+                state["network_errors"] += 1
+                congested = True
+            elif status == 429:
+                state["throttled"] += 1
+                congested = True
+            elif status >= 500:
+                state["server_errors"] += 1
+                congested = True
+            else:
+                ewma = latency if state["latency"] is None else 0.8 * state["latency"] + 0.2 * latency
+                state["latency"] = ewma
+                # Baseline follows the fastest recent latency, drifting up 1% per sample
+                state["baseline"] = ewma if state["baseline"] is None else min(ewma, state["baseline"] * 1.01)
+                congested = ewma > self.latency_tolerance * state["baseline"]
+                if congested:
+                    state["slow"] += 1
+            
+            now = time.monotonic()
+            if congested:
+                if now - state["last_decrease"] >= max(state["latency"] or latency, 0.01):
+                    state["limit"] = max(self.min_limit, state["limit"] * self.decrease_factor)
+                    state["last_decrease"] = now
+                    state["decreases"] += 1
+            else:
+                state["limit"] = min(self.max_limit, state["limit"] + 1.0 / state["limit"])
+            self._cond.notify_all()
+    
+    def get_stats(self) -> Dict[str, Dict]:
+        with self._cond:
+            return {
+                host: {
+                    **{key: value for key, value in state.items() if key not in ("last_decrease", "baseline")},
+                    "limit": round(state["limit"], 2),
+                    "latency_ms": round(state["latency"] * 1000, 1) if state["latency"] is not None else None
+                }
+                for host, state in self.hosts.items()
+            }
+
+# ====================== HTTP CLIENT ======================
+
+def _accept_encoding() -> str:
+    """Only advertise what urllib3 can decode: its ACCEPT_ENCODING adds br when brotli or
+    brotlicffi is installed (and zstd with zstandard on urllib3 2.x)"""
+    from urllib3.util.request import ACCEPT_ENCODING
+    return ACCEPT_ENCODING
+
+class OfflineCacheMiss(requests.exceptions.RequestException):
+    """Offline mode and the URL is not in the response cache"""
+
+class ResponseCache:
+    """Content-addressed on-disk HTTP cache.
+    
+    objects/<sha256 of body> holds bodies (identical bodies stored once),
+    urls/<sha256 of url>.json holds ETag/Last-Modified, fetch time and the body hash.
+    Entries younger than the host's TTL are served directly; older ones are revalidated
+    with a conditional GET. A negative TTL never expires.
+    """
+    
+    def __init__(self, cache_dir: str, default_ttl: float = 86400.0, host_ttls: Optional[Dict[str, float]] = None):
+        self.cache_dir = cache_dir
+        self.default_ttl = default_ttl
+        self.host_ttls = host_ttls or {}
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "stored": 0}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(cache_dir, "urls"), exist_ok=True)
+    
+    def _meta_path(self, url: str) -> str:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, "urls", key[:2], key + ".json")
+    
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, "objects", digest[:2], digest)
+    
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    
+    def count(self, event: str):
+        with self._lock:
+            self.stats[event] += 1
+    
+    def lookup(self, url: str) -> Optional[Tuple[Dict, bytes]]:
+        """(meta, body) for a cached URL, None if missing or the body object is gone"""
+        try:
+            with open(self._meta_path(url), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(self._object_path(meta["body_sha256"]), "rb") as f:
+                return meta, f.read()
+        except (OSError, ValueError, KeyError):
+            return None
+    
+    def is_fresh(self, url: str, meta: Dict) -> bool:
+        ttl = self.host_ttls.get(urlparse(url).netloc.lower(), self.default_ttl)
+        return ttl < 0 or time.time() - meta.get("fetched_at", 0) < ttl
+    
+    def store(self, url: str, response: requests.Response) -> None:
+        body = response.content
+        digest = hashlib.sha256(body).hexdigest()
+        object_path = self._object_path(digest)
+        if not os.path.exists(object_path):
+            self._write_atomic(object_path, body)
+        meta = {
+            "url": url,
+            "body_sha256": digest,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content_type": response.headers.get("Content-Type"),
+            "fetched_at": time.time()
+        }
+        self._write_atomic(self._meta_path(url), json.dumps(meta).encode("utf-8"))
+        self.count("stored")
+    
+    def touch(self, url: str, meta: Dict) -> None:
+        """Upstream answered 304 - restart the TTL"""
+        meta = dict(meta, fetched_at=time.time())
+        self._write_atomic(self._meta_path(url), json.dumps(meta).encode("utf-8"))
+    
+    @staticmethod
+    def conditional_headers(meta: Dict) -> Dict[str, str]:
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+    
+    @staticmethod
+    def to_response(url: str, meta: Dict, body: bytes) -> requests.Response:
+        """Rebuild a requests.Response so callers cannot tell a cache hit from the network"""
+        response = requests.Response()
+        response.status_code = 200
+        response._content = body
+        response.url = url
+        response.headers = CaseInsensitiveDict({"X-VBPL-Cache": "hit"})
+        if meta.get("content_type"):
+            response.headers["Content-Type"] = meta["content_type"]
+        return response
+
+class VBPLHttpClient:
+    """Process-wide HTTP client: keep-alive connection pool per host, compression, headers loaded once"""
+    
+    def __init__(self, connect_timeout: float = 10.0, read_timeout: float = 30.0, pool_size: int = 16,
+                 cache: Optional[ResponseCache] = None, offline: bool = False, retry_attempts: int = 1,
+                 retry_backoff: float = 1.0, retry_backoff_max: float = 60.0,
+                 concurrency: Optional[AdaptiveConcurrencyLimiter] = None):
+        self.cache = cache
+        self.offline = offline
+        self.retry_attempts = max(1, retry_attempts)
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        self.concurrency = concurrency
+        self.retries = 0
+        self.host_requests: Dict[str, Dict[str, float]] = {}
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Accept-Encoding"] = _accept_encoding()
+        self._headers_cache: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+    
+    def load_headers(self, path: str) -> Dict[str, str]:
+        """Read `Key: value` header file once per process"""
+        with self._lock:
+            headers = self._headers_cache.get(path)
+            if headers is None:
+                headers = {}
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if ": " in line:
+                            key, value = line.strip().split(": ", 1)
+                            headers[key] = value
+                self._headers_cache[path] = headers
+            return dict(headers)
+    
+    @classmethod
+    def from_config(cls, config: ProcessingConfig) -> 'VBPLHttpClient':
+        cache = None
+        if config.cache_dir:
+            cache = ResponseCache(config.cache_dir, config.cache_html_ttl, {api_host(config.api_base_url): config.cache_api_ttl})
+        elif config.offline:
+            raise ValueError("offline mode needs cache_dir")
+        concurrency = None
+        if config.adaptive_concurrency:
+            concurrency = AdaptiveConcurrencyLimiter(max_limit=config.max_host_concurrency)
+        return cls(config.connect_timeout, config.read_timeout, config.http_pool_size, cache, config.offline,
+                   config.retry_attempts, config.retry_backoff, config.retry_backoff_max, concurrency)
+    
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None,
+            rate_limiter: Optional[HostRateLimiter] = None) -> requests.Response:
+        """GET over the shared session, waiting for the host's rate limiter first"""
+        cached = self.cache.lookup(url) if self.cache else None
+        
+        if self.offline:
+            if cached is None:
+                self.cache.count("misses")
+                raise OfflineCacheMiss(f"Not in response cache: {url}")
+            self.cache.count("hits")
+            return ResponseCache.to_response(url, *cached)
+        
+        request_headers = dict(headers or {})
+        if cached:
+            meta, body = cached
+            if self.cache.is_fresh(url, meta):
+                self.cache.count("hits")
+                return ResponseCache.to_response(url, meta, body)
+            request_headers.update(ResponseCache.conditional_headers(meta))
+        
+        response = self._send(url, request_headers or None, rate_limiter)
+        
+        if self.cache:
+            if response.status_code == 304 and cached:
+                self.cache.touch(url, cached[0])
+                self.cache.count("revalidated")
+                return ResponseCache.to_response(url, *cached)
+            self.cache.count("misses")
+            if response.status_code == 200:
+                self.cache.store(url, response)
+        return response
+    
+    def _send(self, url: str, headers: Optional[Dict[str, str]],
+              rate_limiter: Optional[HostRateLimiter]) -> requests.Response:
+        """Network GET with jittered retries on timeouts, connection errors, truncated bodies, 429 and 5xx"""
+        for attempt in range(1, self.retry_attempts + 1):
+            if rate_limiter:
+                rate_limiter.acquire(url)
+            if self.concurrency:
+                self.concurrency.acquire(url)
+            
+            response, error = None, None
+            started = time.monotonic()
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except RETRY_EXCEPTIONS as e:
+                error = e
+            finally:
+                status = response.status_code if response is not None else None
+                self._record_request(url, time.monotonic() - started, status)
+                if self.concurrency:
+                    self.concurrency.release(url, time.monotonic() - started, status)
+            
+            if response is not None and response.status_code not in RETRY_STATUS_CODES:
+                return response
+            if attempt == self.retry_attempts:
+                if error is not None:
+                    raise error
+                return response
+            
+            with self._lock:
+                self.retries += 1
+            time.sleep(self._retry_delay(attempt, response))
+    
+    def _record_request(self, url: str, latency: float, status: Optional[int]):
+        """Per-host request/error counters (mỗi attempt, kể cả retry)"""
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            counters = self.host_requests.setdefault(host, {
+                "requests": 0, "errors": 0, "throttled": 0, "server_errors": 0,
+                "client_errors": 0, "network_errors": 0, "latency_seconds": 0.0
+            })
+            counters["requests"] += 1
+            counters["latency_seconds"] += latency
+            if status is None:
+                counters["network_errors"] += 1
+            elif status == 429:
+                counters["throttled"] += 1
+            elif status >= 500:
+                counters["server_errors"] += 1
+            elif status >= 400:
+                counters["client_errors"] += 1
+            else:
+                return
+            counters["errors"] += 1
+    
+    def _retry_delay(self, attempt: int, response: Optional[requests.Response]) -> float:
+        """Retry-After if the server sent one, else full-jitter exponential backoff"""
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                except (TypeError, ValueError):
+                    delay = None
+            if delay is not None:
+                return min(max(delay, 0.0), self.retry_backoff_max)
+        return random.uniform(0, min(self.retry_backoff_max, self.retry_backoff * 2 ** (attempt - 1)))
+    
+    def get_stats(self) -> Dict:
+        """Retries, per-host request counters, cache counters và per-host concurrency state"""
+        with self._lock:
+            host_requests = {host: dict(counters) for host, counters in self.host_requests.items()}
+        return {
+            "retries": self.retries,
+            "requests": host_requests,
+            "cache": dict(self.cache.stats) if self.cache else None,
+            "hosts": self.concurrency.get_stats() if self.concurrency else None
+        }
+
+_http_client: Optional[VBPLHttpClient] = None
+_http_client_lock = threading.Lock()
+
+def get_http_client(config: Optional[ProcessingConfig] = None) -> VBPLHttpClient:
+    """Shared client for this process - the first caller's config decides timeouts, pool size and cache"""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = VBPLHttpClient() if config is None else VBPLHttpClient.from_config(config)
+        return _http_client
+
+# ====================== LOGGING SETUP ======================
+
+def setup_logging(config: ProcessingConfig, judgment_id: str, mode: str = 'w') -> logging.Logger:
+    """Setup structured logging - one logger per document so concurrent workers don't share handlers.
+    `mode='a'` continues the log of a document whose earlier stages ran in another process."""
+    logger = logging.getLogger(f'vbpl_processor.{judgment_id}')
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    _detach_handlers(logger)
+    
+    log_file = os.path.join(config.log_dir, f"processing_{judgment_id}.log")
+    file_handler = logging.FileHandler(log_file, mode=mode, encoding='utf-8')
+    file_handler.setLevel(logging.DEBUG)
+    
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    file_handler.setFormatter(formatter)
+    console_handler.setFormatter(formatter)
+    
+    logger.addHandler(file_handler)
+    logger.addHandler(console_handler)
+    
+    return logger
+
+def _detach_handlers(logger: logging.Logger) -> None:
+    for handler in list(logger.handlers):
+        handler.close()
+        logger.removeHandler(handler)
+
+def close_logging(logger: logging.Logger) -> None:
+    """Close and detach handlers of a per-document logger, then drop it from the logging manager
+    so long worker/pipeline runs don't keep one Logger per processed document alive"""
+    _detach_handlers(logger)
+    logger_dict = logging.Logger.manager.loggerDict
+    if logger_dict.get(logger.name) is logger:
+        logger_dict.pop(logger.name, None)
+
+# ====================== PROFILING ======================
+
+# Luôn báo cáo các hàm này trong profile (kể cả khi không lọt top N) - nghi phạm quen thuộc của document chậm
+PROFILE_HOTSPOTS = ("clean_text", "process_html_optimized", "_identify_heading_clusters", "_merge_heading_clusters",
+                    "_extract_nested_structure", "_generate_optimized_flat_format", "_validate_integrity")
+
+def should_profile(config: ProcessingConfig, judgment_id: str) -> bool:
+    """Document nằm trong profile_docs, hoặc rơi vào mẫu profile_sample_rate (md5 - cùng quyết định
+    trên mọi thread/process/shard)"""
+    if str(judgment_id) in config.profile_docs:
+        return True
+    if config.profile_sample_rate <= 0:
+        return False
+    digest = hashlib.md5(str(judgment_id).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64 < config.profile_sample_rate
+
+class DocumentProfiler:
+    """cProfile quanh extraction của một document.
+    
+    write() lưu profile_{id}.prof (pstats, mở bằng snakeviz/pstats) và profile_{id}.json (wall-clock
+    per stage, hotspots, top functions theo cumulative time) cạnh processing_{id}.log.
+    """
+    
+    def __init__(self, config: ProcessingConfig, judgment_id: str, top_n: int = 25):
+        self.config = config
+        self.judgment_id = judgment_id
+        self.top_n = top_n
+        self.profile: Optional[cProfile.Profile] = None
+        self.wall_seconds = 0.0
+        self._started = 0.0
+    
+    def __enter__(self):
+        self.profile = cProfile.Profile()
+        try:
+            self.profile.enable()
+        except ValueError:
+            # Another profiler is active on this thread (e.g. the whole run is under cProfile)
+            self.profile = None
+        self._started = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.wall_seconds = time.perf_counter() - self._started
+        if self.profile:
+            self.profile.disable()
+        return False
+    
+    def write(self, stage_timings: Dict[str, float]) -> Dict[str, Any]:
+        """Save .prof/.json và trả về summary gắn vào complete_result["profile"]"""
+        summary = {
+            "judgment_id": self.judgment_id,
+            "wall_seconds": round(self.wall_seconds, 6),
+            "stage_timings": {stage: round(seconds, 6) for stage, seconds in stage_timings.items()},
+            "hotspots": {},
+            "top_functions": [],
+            "prof_path": None
+        }
+        if self.profile:
+            prof_path = os.path.join(self.config.log_dir, f"profile_{self.judgment_id}.prof")
+            self.profile.dump_stats(prof_path)
+            summary["prof_path"] = prof_path
+            summary["hotspots"], summary["top_functions"] = self._summarize(pstats.Stats(self.profile))
+        
+        json_path = os.path.join(self.config.log_dir, f"profile_{self.judgment_id}.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        return summary
+    
+    def _summarize(self, stats: pstats.Stats) -> Tuple[Dict[str, Dict], List[Dict]]:
+        hotspots: Dict[str, Dict] = {}
+        functions = []
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            if name in PROFILE_HOTSPOTS and filename == __file__:
+                hotspot = hotspots.setdefault(name, {"calls": 0, "tottime": 0.0, "cumtime": 0.0})
+                hotspot["calls"] += calls
+                hotspot["tottime"] = round(hotspot["tottime"] + tottime, 6)
+                hotspot["cumtime"] = round(hotspot["cumtime"] + cumtime, 6)
+            location = f"{os.path.basename(filename)}:{line}" if line else filename
+            functions.append({"function": f"{name} ({location})", "calls": calls,
+                              "tottime": round(tottime, 6), "cumtime": round(cumtime, 6)})
+        functions.sort(key=lambda function: function["cumtime"], reverse=True)
+        return hotspots, functions[:self.top_n]
+
+# ====================== UTILITY FUNCTIONS ======================
+
+def normalize_text(text: str) -> str:
+    """Improved text normalization"""
+    if not isinstance(text, str):
+        return ""
+    
+    text = unicodedata.normalize("NFC", text)
+    text = re.sub(r'[\u00A0\u2000-\u200F\u2028\u2029\u202F\u205F\u3000\uFEFF\t\r\n]', ' ', text)
+    text = re.sub(r' {2,}', ' ', text)
+    return text.strip()
+
+def roman_to_int(roman: str) -> int:
+    """Convert Roman numerals to integers"""
+    if not roman or not isinstance(roman, str):
+        return 0
+        
+    roman_nums = {'I': 1, 'V': 5, 'X': 10, 'L': 50, 'C': 100, 'D': 500, 'M': 1000}
+    total = 0
+    prev_value = 0
+    
+    for char in reversed(roman.upper()):
+        value = roman_nums.get(char, 0)
+        if value == 0:
+            return 0
+        if value < prev_value:
+            total -= value
+        else:
+            total += value
+        prev_value = value
+    
+    return total
+
+def extract_element_number(text: str, element_type: str) -> Optional[str]:
+    """Extract element numbers with proper handling for all types"""
+    if not text or element_type not in ELEMENT_CONFIGS:
+        return None
+        
+    config = ELEMENT_CONFIGS[element_type]
+    try:
+        flags = re.IGNORECASE if element_type == 'vbpl_section' else 0
+        match = re.search(config.pattern, text, flags)
+        
+        if match:
+            # For high-level elements (big_part, chapter, part, mini_part, section)
+            if element_type in ['vbpl_big_part', 'vbpl_chapter', 'vbpl_part', 'vbpl_mini_part', 'vbpl_section']:
+                number = match.group(1).strip()  # Full number like "Phần I", "Chương II", "Điều 1"
+                
+                # Convert Roman numerals to Arabic if needed for ID generation
+                if element_type != 'vbpl_section':
+                    parts = number.split()
+                    if len(parts) >= 2 and re.match(r'^[IVXLCDM]+$', parts[-1]):
+                        arabic = roman_to_int(parts[-1])
+                        if arabic > 0:
+                            return f"{' '.join(parts[:-1])} {arabic}"
+                
+                return number
+            
+            # For low-level elements (clause, point)
+            elif element_type in ['vbpl_clause', 'vbpl_point']:
+                return match.group(1).strip()  # Just "1." or "a)"
+                
+    except (IndexError, AttributeError) as e:
+        logging.getLogger('vbpl_processor').warning(f"Error extracting element number from '{text}': {e}")
+    
+    return None
+
+# (level, element_type, number, name) - name là phần sau number (content với clause/point)
+ElementMatch = Tuple[int, str, str, str]
+
+class ElementClassifier:
+    """Nhiều element pattern trong một compiled regex.
+    
+    Mỗi pattern là một named group (tên = element_type) trong alternation theo đúng thứ tự ưu tiên,
+    nên một lần re.match cho cùng kết quả với vòng lặp re.match từng pattern. Pattern case-insensitive
+    được bọc trong (?i:...) để flag chỉ áp dụng cho pattern đó.
+    """
+    
+    def __init__(self, rows: List[Tuple[str, str, int, bool]]):
+        """rows: (element_type, pattern, level, ignore_case) theo thứ tự ưu tiên"""
+        parts = []
+        self.patterns: Dict[str, re.Pattern] = {}
+        self.groups: Dict[str, Tuple[int, int, int]] = {}  # element_type -> (level, group index, inner groups)
+        index = 1
+        for element_type, pattern, level, ignore_case in rows:
+            compiled = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+            self.patterns[element_type] = compiled
+            self.groups[element_type] = (level, index, compiled.groups)
+            parts.append(f"(?P<{element_type}>{f'(?i:{pattern})' if ignore_case else pattern})")
+            index += 1 + compiled.groups
+        self.pattern = re.compile("|".join(parts))
+    
+    @classmethod
+    def from_configs(cls, configs: Dict[str, ElementConfig]) -> "ElementClassifier":
+        return cls([(element_type, config.pattern, config.level, element_type == 'vbpl_section')
+                    for element_type, config in configs.items()])
+    
+    def matches(self, text: str) -> bool:
+        return self.pattern.match(text) is not None
+    
+    def classify(self, text: str) -> Optional[ElementMatch]:
+        match = self.pattern.match(text)
+        if match is None:
+            return None
+        element_type = match.lastgroup  # outer named group closes after its inner groups
+        level, index, inner_groups = self.groups[element_type]
+        number = match.group(index + 1) if inner_groups >= 1 else match.group(index)
+        name = match.group(index + 2) if inner_groups >= 2 else None
+        return level, element_type, (number or "").strip(), (name or "").strip()
+    
+    def extract(self, text: str, element_type: str) -> Optional[Tuple[str, str]]:
+        """(number, name) theo riêng pattern của element_type, như re.match(config.pattern, text)"""
+        element = self.classify(text)
+        if element is not None and element[1] == element_type:
+            return element[2], element[3]
+        match = self.patterns[element_type].match(text)
+        if match is None:
+            return None
+        groups = match.groups()
+        return (groups[0] or "").strip() if groups else match.group(0), (groups[1] or "").strip() if len(groups) >= 2 else ""
+
+ELEMENT_CLASSIFIER = ElementClassifier.from_configs(ELEMENT_CONFIGS)
+
+# Heading của HTMLProcessor: mọi loại không phân biệt hoa thường
+LEGAL_HEADING_CLASSIFIER = ElementClassifier([
+    ('vbpl_big_part', r'Phần\s+([IVXLCDM]+|\d+)', 1, True),
+    ('vbpl_chapter', r'Chương\s+([IVXLCDM]+|\d+)', 2, True),
+    ('vbpl_part', r'Mục\s+([IVXLCDM]+|\d+)', 3, True),
+    ('vbpl_mini_part', r'Tiểu mục\s+([IVXLCDM]+|\d+)', 4, True),
+    ('vbpl_section', r'Điều\s+\d+', 5, True),
+])
+
+# Header của ContentDeduplicator: prefix của mọi loại element, không phân biệt hoa thường
+STRUCTURAL_HEADER_CLASSIFIER = ElementClassifier([
+    ('vbpl_section', r'Điều\s+\d+', 5, True),
+    ('vbpl_clause', r'\d+\.', 6, True),
+    ('vbpl_point', r'[a-zđ]\)', 7, True),
+    ('vbpl_big_part', r'Phần\s+([IVXLCDM]+|\d+)', 1, True),
+    ('vbpl_chapter', r'Chương\s+([IVXLCDM]+|\d+)', 2, True),
+    ('vbpl_part', r'Mục\s+([IVXLCDM]+|\d+)', 3, True),
+    ('vbpl_mini_part', r'Tiểu mục\s+([IVXLCDM]+|\d+)', 4, True),
+])
+
+# "Chương II." -> "Chương II" cho heading cấp 1-4
+HEADING_TRAILING_PUNCTUATION = re.compile(r'^((?:Phần|Chương|Mục|Tiểu mục)\s+(?:[IVXLCDM]+|\d+))[.:\-]', re.IGNORECASE)
+
+def classify_element(text: str) -> Optional[ElementMatch]:
+    """Level, type, number và name của paragraph trong một lần match (None nếu không phải element)"""
+    return ELEMENT_CLASSIFIER.classify(text)
+
+@dataclass
+class ParagraphIR:
+    """Một <p> của document với text đã normalize và classify_element(text), tính một lần sau khi parse.
+    HTMLProcessor dùng cho heading merge rồi giao lại cho OptimizedDualFormatExtractor"""
+    tag: Tag
+    text: str
+    element: Optional[ElementMatch]
+    raw: str = ""  # get_text() trước normalize
+    
+    @property
+    def element_type(self) -> Optional[str]:
+        return self.element[1] if self.element is not None else None
+
+def build_paragraph_ir(paragraphs: List[Tag], separator: str = "", strip: bool = False) -> List[ParagraphIR]:
+    """normalize_text(p.get_text(separator, strip)) + classify_element cho từng paragraph"""
+    ir = []
+    for p in paragraphs:
+        raw = p.get_text(separator, strip=strip)
+        text = normalize_text(raw)
+        ir.append(ParagraphIR(p, text, classify_element(text), raw))
+    return ir
+
+def get_element_level_from_configs(text: str) -> Optional[Tuple[int, str]]:
+    """Get element level and type from ELEMENT_CONFIGS with case insensitive support"""
+    element = ELEMENT_CLASSIFIER.classify(text)
+    return (element[0], element[1]) if element is not None else None
+
+def generate_optimized_id(judgment_id: str, element_type: str, current_context: Dict, number: str, tag: bool = True) -> str:
+    """Generate optimized hierarchical IDs"""
+    def safe_extract_for_id(field, level_type, pad=2):
+        """Extract number for ID generation (convert to Arabic numerals)"""
+        raw = current_context.get(field, "")
+        if not raw:
+            return "0" * pad
+            
+        # Extract just the numeric part for ID generation
+        if level_type == 'vbpl_section':
+            match = re.search(r'Điều\s+(\d+)', raw, re.IGNORECASE)
+            if match:
+                return match.group(1).zfill(pad)
+        else:
+            # For other types, extract the last number/roman numeral
+            parts = raw.split()
+            if parts:
+                last_part = parts[-1]
+                if last_part.isdigit():
+                    return last_part.zfill(pad)
+                elif re.match(r'^[IVXLCDM]+$', last_part):
+                    arabic = roman_to_int(last_part)
+                    return str(arabic).zfill(pad) if arabic > 0 else "0" * pad
+        
+        return "0" * pad
+
+    big_part = safe_extract_for_id("big_part_number", "vbpl_big_part", 2)
+    chapter = safe_extract_for_id("chapter_number", "vbpl_chapter", 2)
+    part = safe_extract_for_id("part_number", "vbpl_part", 2)
+    mini_part = safe_extract_for_id("mini_part_number", "vbpl_mini_part", 2)
+    
+    if element_type == "vbpl_section":
+        # Extract numeric part from "Điều 1"
+        match = re.search(r'Điều\s+(\d+)', number, re.IGNORECASE)
+        section = match.group(1).zfill(3) if match else "000"
+        id_part = big_part + chapter + part + mini_part + section
+    elif element_type == "vbpl_clause":
+        section = safe_extract_for_id("section_number", "vbpl_section", 3)
+        # Extract number from "1."
+        clause_match = re.search(r'(\d+)\.', number)
+        clause = clause_match.group(1).zfill(2) if clause_match else "00"
+        id_part = big_part + chapter + part + mini_part + section + clause
+    elif element_type == "vbpl_point":
+        section = safe_extract_for_id("section_number", "vbpl_section", 3)
+        clause = safe_extract_for_id("clause_number", "vbpl_clause", 2)
+        # Extract letter from "a)"
+        point_match = re.search(r'([a-zđ])\)', number)
+        point_num = "01"
+        if point_match:
+            vietnamese_letters = "abcdefghijklmnopqrstuvwxyzđ"
+            try:
+                pos = vietnamese_letters.index(point_match.group(1).lower()) + 1
+                point_num = str(pos).zfill(2)
+            except ValueError:
+                point_num = "01"
+        id_part = big_part + chapter + part + mini_part + section + clause + point_num
+    else:
+        parts = []
+        if element_type in ["vbpl_big_part"]:
+            parts = [big_part]
+        elif element_type in ["vbpl_chapter"]:
+            parts = [big_part, chapter]
+        elif element_type in ["vbpl_part"]:
+            parts = [big_part, chapter, part]
+        elif element_type in ["vbpl_mini_part"]:
+            parts = [big_part, chapter, part, mini_part]
+        id_part = "".join(parts)
+
+    return judgment_id + id_part if tag else id_part
+
+def compute_content_hashes(json_data: Dict, html_content: str) -> Dict[str, str]:
+    """sha256 của API payload (canonical JSON) và S3 HTML đã decode - dùng để phát hiện thay đổi khi re-crawl"""
+    api_payload = json.dumps(json_data, sort_keys=True, ensure_ascii=False, default=str)
+    return {
+        "api_hash": hashlib.sha256(api_payload.encode("utf-8")).hexdigest(),
+        "html_hash": hashlib.sha256(html_content.encode("utf-8")).hexdigest()
+    }
+
+# ====================== TEXT PROCESSING ======================
+
+class CompactDictionary:
+    """Viet74K dạng compact, build một lần từ file .txt và lưu cạnh nó thành `<path>.vdict`.
+    
+    clean_text chỉ tra từ 1 âm tiết (candidate ghép liền) và cụm 3 âm tiết ("kho áng sản"), nên hai loại
+    này giữ nguyên chuỗi trong một frozenset - lookup nhanh như set cũ. Các cụm còn lại (phần lớn của 74k
+    entries, chủ yếu 2 âm tiết) chỉ giữ blake2b-64 hash trong sorted array('Q') + bisect, lọc trước bằng
+    set âm tiết đầu của cụm.
+    
+    .vdict: MAGIC | u32 header length | header JSON | words | heads | padding tới 8 bytes | hashes.
+    Header ghi size/mtime của file nguồn, file nguồn đổi thì build lại.
+    """
+    
+    MAGIC = b"VDICT1\n"
+    SUFFIX = ".vdict"
+    
+    def __init__(self, words=(), heads=(), hashes: Optional[array] = None):
+        self.words = frozenset(words)
+        self.heads = frozenset(heads)
+        self.hashes = hashes if hashes is not None else array("Q")
+        # Gates của clean_text: mọi prefix của từ viết liền (trie phẳng thành set) và âm tiết đầu của cụm 3 âm tiết
+        self.prefixes = frozenset(word[:end] for word in self.words if " " not in word for end in range(1, len(word) + 1))
+        self.triple_heads = frozenset(word.split(" ", 1)[0] for word in self.words if " " in word)
+    
+    @staticmethod
+    def phrase_hash(phrase: str) -> int:
+        return int.from_bytes(hashlib.blake2b(phrase.encode("utf-8"), digest_size=8).digest(), "little")
+    
+    @classmethod
+    def from_words(cls, entries) -> "CompactDictionary":
+        words, heads, hashes = set(), set(), set()
+        for entry in entries:
+            if entry.count(" ") in (0, 2):
+                words.add(entry)
+            else:
+                heads.add(entry.split(" ", 1)[0])
+                hashes.add(cls.phrase_hash(entry))
+        return cls(words, heads, array("Q", sorted(hashes)))
+    
+    @classmethod
+    def from_text_file(cls, path: str) -> "CompactDictionary":
+        """Normalize giống _load_dictionary cũ: NFC, lowercase, gộp khoảng trắng"""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_words(normalize_text(line.strip().lower()) for line in f if line.strip())
+    
+    def __contains__(self, word: str) -> bool:
+        if word in self.words:
+            return True
+        if word.count(" ") in (0, 2) or word.split(" ", 1)[0] not in self.heads:
+            return False
+        value = self.phrase_hash(word)
+        index = bisect.bisect_left(self.hashes, value)
+        return index < len(self.hashes) and self.hashes[index] == value
+    
+    def __len__(self) -> int:
+        return len(self.words) + len(self.hashes)
+    
+    def __bool__(self) -> bool:
+        return len(self) > 0
+    
+    def to_bytes(self, source_stat: os.stat_result) -> bytes:
+        words = "\n".join(sorted(self.words)).encode("utf-8")
+        heads = "\n".join(sorted(self.heads)).encode("utf-8")
+        header = json.dumps({
+            "source_size": source_stat.st_size,
+            "source_mtime_ns": source_stat.st_mtime_ns,
+            "words": len(self.words),
+            "phrases": len(self.hashes),
+            "words_bytes": len(words),
+            "heads_bytes": len(heads)
+        }).encode("utf-8")
+        body = self.MAGIC + struct.pack("<I", len(header)) + header + words + heads
+        hashes = array("Q", self.hashes)
+        if sys.byteorder != "little":
+            hashes.byteswap()
+        return body + b"\0" * (-len(body) % 8) + hashes.tobytes()
+    
+    @classmethod
+    def from_bytes(cls, data: bytes, source_stat: os.stat_result) -> Optional["CompactDictionary"]:
+        """None nếu không phải .vdict hoặc đã cũ so với file nguồn"""
+        if not data.startswith(cls.MAGIC):
+            return None
+        offset = len(cls.MAGIC)
+        (header_length,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        header = json.loads(data[offset:offset + header_length])
+        if header["source_size"] != source_stat.st_size or header["source_mtime_ns"] != source_stat.st_mtime_ns:
+            return None
+        offset += header_length
+        words = data[offset:offset + header["words_bytes"]].decode("utf-8")
+        offset += header["words_bytes"]
+        heads = data[offset:offset + header["heads_bytes"]].decode("utf-8")
+        offset += header["heads_bytes"]
+        offset += -offset % 8
+        hashes = array("Q")
+        hashes.frombytes(data[offset:offset + 8 * header["phrases"]])
+        if sys.byteorder != "little":
+            hashes.byteswap()
+        if len(hashes) != header["phrases"]:
+            return None
+        return cls(words.split("\n") if words else (), heads.split("\n") if heads else (), hashes)
+    
+    @classmethod
+    def load(cls, path: str, logger: Optional[logging.Logger] = None) -> "CompactDictionary":
+        """Đọc `<path>.vdict` nếu còn mới, nếu không thì build từ `path` và ghi lại artifact (best effort)"""
+        source_stat = os.stat(path)
+        artifact_path = path + cls.SUFFIX
+        try:
+            with open(artifact_path, "rb") as f:
+                dictionary = cls.from_bytes(f.read(), source_stat)
+            if dictionary is not None:
+                return dictionary
+        except (OSError, ValueError, KeyError, struct.error):
+            pass
+        
+        dictionary = cls.from_text_file(path)
+        try:
+            ResponseCache._write_atomic(artifact_path, dictionary.to_bytes(source_stat))
+            if logger:
+                logger.info(f"Built compact dictionary {artifact_path}")
+        except OSError as e:
+            if logger:
+                logger.warning(f"Cannot write compact dictionary {artifact_path}: {e} - using in-memory copy")
+        return dictionary
+
+_dictionaries: Dict[str, CompactDictionary] = {}
+_dictionaries_lock = threading.Lock()
+
+def get_shared_dictionary(path: str, logger: Optional[logging.Logger] = None) -> CompactDictionary:
+    """Dictionary dùng chung cho mọi document của process (mỗi worker process load artifact một lần).
+    File nguồn thiếu hoặc lỗi -> dictionary rỗng, clean_text chỉ normalize như trước.
+    """
+    key = os.path.abspath(path)
+    with _dictionaries_lock:
+        dictionary = _dictionaries.get(key)
+        if dictionary is None:
+            try:
+                dictionary = CompactDictionary.load(key, logger)
+            except Exception as e:
+                if logger:
+                    logger.error(f"Failed to load dictionary: {e}")
+                return CompactDictionary()
+            _dictionaries[key] = dictionary
+        return dictionary
+
+CLEAN_TOKEN_PATTERN = re.compile(r'\w+|\s+|[.,;:!?()"/\-]+', re.UNICODE)
+PUNCTUATION_CHARS = frozenset('.,;:!?()/"-')
+CLEAN_DROPPED_CHAR = re.compile(r'[^\w .,;:!?()"/\-]')  # ký tự bị tokenizer bỏ qua hoặc whitespace khác " "
+
+# Một round trip tới manager process tốn ~20µs, ngang clean_text của ~1-2k ký tự
+SHARED_CLEAN_CACHE_MIN_CHARS = 1024
+
+class CleanTextCache:
+    """Bounded LRU của clean_text output, key = blake2b-128 của text gốc.
+    
+    Boilerplate lặp lại trong và giữa các document (heading, khối chữ ký, "Điều X. Hiệu lực thi hành")
+    chỉ clean một lần cho mỗi process. `shared` là proxy tới một CleanTextCache khác chạy trong manager
+    process (pipeline mode) - chỉ tra cho text dài vì round trip IPC đắt hơn clean_text của text ngắn.
+    """
+    
+    def __init__(self, max_entries: int = 32768, shared=None, shared_min_chars: int = SHARED_CLEAN_CACHE_MIN_CHARS):
+        self.max_entries = max(1, max_entries)
+        self.shared = shared
+        self.shared_min_chars = shared_min_chars
+        self.entries: OrderedDict = OrderedDict()
+        self.stats = {"hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+    
+    def get(self, key: bytes) -> Optional[str]:
+        with self._lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+    
+    def put(self, key: bytes, value: str):
+        with self._lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats["evictions"] += 1
+    
+    def lookup(self, text: str, compute) -> Tuple[str, str]:
+        """(cleaned text, event) - event là "hits", "shared_hits" hoặc "misses" """
+        key = self.key(text)
+        value = self.get(key)
+        if value is not None:
+            event = "hits"
+        else:
+            shared = self.shared if self.shared is not None and len(text) >= self.shared_min_chars else None
+            value = shared.get(key) if shared is not None else None
+            if value is not None:
+                event = "shared_hits"
+            else:
+                event = "misses"
+                value = compute(text)
+                if shared is not None:
+                    shared.put(key, value)
+            self.put(key, value)
+        with self._lock:
+            self.stats[event] += 1
+        return value, event
+    
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self.stats, "entries": len(self.entries)}
+
+class CleanTextCacheManager(BaseManager):
+    """Manager process giữ một CleanTextCache dùng chung cho các extraction worker"""
+
+CleanTextCacheManager.register("CleanTextCache", CleanTextCache, exposed=("get", "put", "get_stats"))
+
+_clean_text_caches: Dict[Tuple[str, int], CleanTextCache] = {}
+_clean_text_caches_lock = threading.Lock()
+_shared_clean_text_cache = None  # proxy, set by _init_extract_worker in pipeline workers
+
+def get_clean_text_cache(config: ProcessingConfig) -> Optional[CleanTextCache]:
+    """LRU của process cho dictionary của config (output clean_text phụ thuộc dictionary), None nếu tắt"""
+    if config.clean_text_cache_size <= 0:
+        return None
+    key = (os.path.abspath(config.viet74k_path), config.clean_text_cache_size)
+    with _clean_text_caches_lock:
+        cache = _clean_text_caches.get(key)
+        if cache is None:
+            cache = _clean_text_caches[key] = CleanTextCache(config.clean_text_cache_size, _shared_clean_text_cache)
+        return cache
+
+class TextProcessor:
+    """Enhanced text processor"""
+    
+    def __init__(self, dictionary_path: str, logger: logging.Logger, cache: Optional[CleanTextCache] = None):
+        self.logger = logger
+        self.dictionary = self._load_dictionary(dictionary_path)
+        self.cache = cache
+        self.cache_stats = {"hits": 0, "shared_hits": 0, "misses": 0}  # this document only
+        # clean_text chỉ tra candidate 1 hoặc 3 âm tiết - đều nằm trong frozenset, tránh gọi __contains__
+        self.words = self.dictionary.words
+        self.prefixes = self.dictionary.prefixes
+        self.triple_heads = self.dictionary.triple_heads
+        
+    def _load_dictionary(self, path: str) -> CompactDictionary:
+        """Shared per-process dictionary (see get_shared_dictionary)"""
+        dictionary = get_shared_dictionary(path, self.logger)
+        if dictionary:
+            self.logger.info(f"Loaded {len(dictionary)} words from dictionary")
+        return dictionary
+    
+    def clean_text(self, text: str) -> str:
+        """_clean_text qua LRU cache của process nếu có"""
+        if self.cache is None or not text:
+            return self._clean_text(text)
+        cleaned, event = self.cache.lookup(text, self._clean_text)
+        self.cache_stats[event] += 1
+        return cleaned
+    
+    def _clean_text(self, text: str) -> str:
+        """Ghép lại âm tiết bị tách (lỗi OCR), giữ nguyên output của thuật toán gốc (_clean_text_reference).
+        
+        Quét một lượt qua các ranh giới dấu cách: nếu không ranh giới nào có "âm tiết trước + token sau" là
+        prefix của một từ viết liền trong dictionary thì không có gì để ghép và text được trả về ngay.
+        Chỉ paragraph có thể ghép mới đi qua vòng lặp token.
+        """
+        if not text:
+            return ""
+            
+        text = normalize_text(text)
+        if not self.dictionary:
+            return text
+        if "Σ" in text:
+            # Final sigma: lower() của chuỗi ghép khác ghép các lower() - tra cứu từng candidate như cũ
+            return self._clean_text_reference(text)
+        if not CLEAN_DROPPED_CHAR.search(text) and not self._has_join_candidate(text.lower()):
+            return text
+        return self._repair_tokens(text)
+    
+    def _has_join_candidate(self, lowered_text: str) -> bool:
+        """Điều kiện cần để có ghép viết liền, cho text chỉ gồm \\w, dấu câu và dấu cách đơn.
+        
+        Cụm 3 token có dấu cách khớp thì output y như input, nên chỉ ghép viết liền làm text thay đổi -
+        và ghép đó cần (word token cuối chunk + token đầu chunk sau) nằm trong set prefix.
+        """
+        prefixes = self.prefixes
+        chunks = lowered_text.split(" ")
+        for index in range(len(chunks) - 1):
+            head = chunks[index]
+            if not head.isalnum():
+                if head[-1] in PUNCTUATION_CHARS:
+                    continue
+                return True  # chunk kiểu "1.2" / "a_b": không tách nhanh được, để vòng lặp token quyết định
+            following = chunks[index + 1]
+            if (head + (following if following.isalnum() else following[0])) in prefixes:
+                return True
+        return False
+    
+    def _repair_tokens(self, text: str) -> str:
+        """Vòng lặp token: 3 token có dấu cách -> 3 token viết liền -> 2 token viết liền, mỗi token lowercase một lần"""
+        tokens = CLEAN_TOKEN_PATTERN.findall(text)
+        lowered = [token.lower() for token in tokens]
+        words, prefixes, triple_heads = self.words, self.prefixes, self.triple_heads
+        output = []
+        i = 0
+        n = len(tokens)
+        
+        while i < n:
+            token = tokens[i]
+            if token.isspace() or token[0] in PUNCTUATION_CHARS or i + 2 >= n or not tokens[i+1].isspace():
+                output.append(token)
+                i += 1
+                continue
+            
+            head = lowered[i]
+            if i + 4 < n and tokens[i+3].isspace():
+                if head in triple_heads and f"{head} {lowered[i+2]} {lowered[i+4]}" in words:
+                    output.append(f"{token} {tokens[i+2]} {tokens[i+4]}")
+                    i += 5
+                    continue
+                joined = head + lowered[i+2]
+                if joined in prefixes and joined + lowered[i+4] in words:
+                    output.append(token + tokens[i+2] + tokens[i+4])
+                    i += 5
+                    continue
+            else:
+                joined = head + lowered[i+2]
+            
+            if joined in words:
+                output.append(token + tokens[i+2])
+                i += 3
+            else:
+                output.append(token)
+                i += 1
+                
+        return ''.join(output).strip()
+    
+    def _clean_text_reference(self, text: str) -> str:
+        """Thuật toán gốc: tạo và lowercase từng candidate (text đã normalize)"""
+        tokens = CLEAN_TOKEN_PATTERN.findall(text)
+        output = []
+        i = 0
+        n = len(tokens)
+        
+        while i < n:
+            if tokens[i].isspace() or tokens[i][0] in PUNCTUATION_CHARS:
+                output.append(tokens[i])
+                i += 1
+                continue
+                
+            # Try 3-token merge first (most common OCR pattern)
+            if i + 4 < n and tokens[i+1].isspace() and tokens[i+3].isspace():
+                merged_candidates = [
+                    tokens[i] + " " + tokens[i+2] + " " + tokens[i+4],
+                    tokens[i] + tokens[i+2] + tokens[i+4]
+                ]
+                
+                for candidate in merged_candidates:
+                    if candidate.lower() in self.words:
+                        output.append(candidate)
+                        i += 5
+                        break
+                else:
+                    # Try 2-token merge
+                    if self._try_two_token_merge(tokens, i, output):
+                        i += 3
+                    else:
+                        output.append(tokens[i])
+                        i += 1
+            else:
+                # Try 2-token merge
+                if self._try_two_token_merge(tokens, i, output):
+                    i += 3
+                else:
+                    output.append(tokens[i])
+                    i += 1
+                    
+        return ''.join(output).strip()
+    
+    def _try_two_token_merge(self, tokens: List[str], i: int, output: List[str]) -> bool:
+        """Helper method to try merging two tokens"""
+        if i + 2 < len(tokens) and tokens[i+1].isspace():
+            merged = tokens[i] + tokens[i+2]
+            if merged.lower() in self.words:
+                output.append(merged)
+                return True
+        return False
+
+# ====================== HTML PROCESSING ======================
+
+class HTMLProcessor:
+    """Enhanced HTML processor"""
+    
+    def __init__(self, text_processor: TextProcessor, logger: logging.Logger,
+                 rate_limiter: Optional[HostRateLimiter] = None,
+                 http_client: Optional[VBPLHttpClient] = None):
+        self.text_processor = text_processor
+        self.logger = logger
+        self.rate_limiter = rate_limiter
+        self.http_client = http_client
+        self.paragraphs: List[ParagraphIR] = []  # <p> của soup sau process_html_optimized, theo thứ tự document
+        
+    def get_html_content_with_encoding(self, url: str, output_file: Optional[str] = None) -> Optional[str]:
+        """Get HTML content with encoding detection"""
+        try:
+            http_client = self.http_client or get_http_client()
+            response = http_client.get(url, rate_limiter=self.rate_limiter)
+            response.raise_for_status()
+            raw_content = response.content
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"Failed to fetch HTML: {e}")
+            return None
+        
+        for encoding in ["windows-1258", "utf-8", "iso-8859-1"]:
+            try:
+                html_content = raw_content.decode(encoding)
+                break
+            except UnicodeDecodeError:
+                continue
+        else:
+            html_content = raw_content.decode("utf-8", errors="replace")
+        
+        if output_file:
+            try:
+                with open(output_file, "w", encoding="utf-8") as f:
+                    f.write(html_content)
+            except Exception as e:
+                self.logger.error(f"Failed to save HTML: {e}")
+        
+        return html_content
+    
+    def process_html_optimized(self, soup: BeautifulSoup) -> BeautifulSoup:
+        """Process HTML for structure extraction with smart heading merging"""
+        self.logger.info("Starting HTML processing with smart heading merging")
+        
+        paragraphs = build_paragraph_ir(soup.find_all("p"))
+        
+        clusters = self._identify_heading_clusters(paragraphs)
+        merged_paragraphs = self._merge_heading_clusters(clusters, soup, paragraphs)
+        
+        processed = []
+        for paragraph in merged_paragraphs:
+            p = paragraph.tag
+            cleaned_text = self.text_processor.clean_text(paragraph.raw)
+            
+            # Remove trailing punctuation from high-level headings for consistency
+            cleaned_text = HEADING_TRAILING_PUNCTUATION.sub(r'\1', cleaned_text)
+            
+            is_heading = self._is_legal_heading(cleaned_text)
+            p.clear()
+            
+            if is_heading:
+                p['style'] = "text-align: center;"
+                strong_tag = soup.new_tag("strong")
+                strong_tag.string = cleaned_text
+                p.append(strong_tag)
+            else:
+                p.string = cleaned_text
+            
+            # <p> giờ chỉ còn một string nên get_text(" ", strip=True) của extractor cũng normalize ra text này
+            text = normalize_text(cleaned_text)
+            processed.append(ParagraphIR(p, text, classify_element(text), cleaned_text))
+        
+        # Apply merged structure to soup DOM structure
+        self.logger.info("Applying merged structure to soup DOM")
+        
+        if clusters and merged_paragraphs:
+            self.logger.info(f"🔄 DOM UPDATE: {len(clusters)} clusters, {len(merged_paragraphs)} merged paragraphs")
+            
+            current_paragraphs = soup.find_all("p")
+            self.logger.info(f"   Current soup has {len(current_paragraphs)} paragraphs")
+            
+            container = soup.find('body') or soup.find('div') or soup
+            self.logger.info(f"   Using container: {container.name if hasattr(container, 'name') else type(container)}")
+            
+            # Remove all current paragraphs
+            texts = {id(paragraph.tag): paragraph.text for paragraph in paragraphs + processed}
+            for i, p in enumerate(current_paragraphs):
+                if p.parent:
+                    p.extract()
+                    self.logger.debug(f"   Removed old P{i}: '{texts.get(id(p), '')[:30]}...'")
+            
+            # Add processed merged paragraphs back
+            for i, paragraph in enumerate(processed):
+                p = paragraph.tag
+                try:
+                    new_p = soup.new_tag("p")
+                    if hasattr(p, 'attrs') and p.attrs:
+                        new_p.attrs.update(p.attrs)
+                    
+                    for content in p.contents:
+                        if hasattr(content, 'name') and content.name is not None and content.name:
+                            new_tag = soup.new_tag(content.name)
+                            if hasattr(content, 'attrs') and content.attrs:
+                                new_tag.attrs.update(content.attrs)
+                            if content.string:
+                                new_tag.string = content.string
+                            new_p.append(new_tag)
+                        else:
+                            new_p.append(str(content))
+                    
+                    container.append(new_p)
+                    paragraph.tag = new_p
+                    self.logger.debug(f"   Added new P{i}: '{paragraph.text[:30]}...'")
+                    
+                except Exception as e:
+                    self.logger.error(f"Error adding merged paragraph {i}: {e}")
+                    fallback_p = soup.new_tag("p")
+                    text_content = ''.join(p.strings) if hasattr(p, 'strings') else str(p)
+                    fallback_p.string = text_content
+                    container.append(fallback_p)
+                    paragraph.tag = fallback_p
+                    self.logger.info(f"   Added fallback P{i}: '{text_content[:30]}...'")
+            
+            final_paragraphs = soup.find_all("p")
+            self.logger.info(f"✅ DOM UPDATE COMPLETE: Now {len(final_paragraphs)} paragraphs in soup")
+        else:
+            self.logger.info("ℹ️  No clusters or merged paragraphs - no DOM update needed")
+        
+        self.paragraphs = processed
+        self.logger.info("HTML processing with smart heading merging completed")
+        return soup
+    
+    def _identify_heading_clusters(self, paragraphs: List[ParagraphIR]) -> List[Dict]:
+        """Identify heading clusters for levels 1-4 that need merging"""
+        clusters = []
+        i = 0
+        
+        self.logger.info(f"🔍 CLUSTER DEBUG: Processing {len(paragraphs)} paragraphs")
+        
+        while i < len(paragraphs):
+            text = paragraphs[i].text
+            level_info = paragraphs[i].element
+            
+            if level_info and level_info[0] <= 4:
+                current_level, element_type = level_info[0], level_info[1]
+                cluster_paragraphs = [paragraphs[i]]
+                j = i + 1
+                
+                self.logger.info(f"📦 Found level {current_level} heading at P{i}: '{text[:50]}...'")
+                
+                while j < len(paragraphs):
+                    next_text = paragraphs[j].text
+                    next_level_info = paragraphs[j].element
+                    
+                    if next_level_info and next_level_info[0] > current_level:
+                        self.logger.info(f"   Break at P{j}: level {next_level_info[0]} > {current_level}")
+                        break
+                    
+                    cluster_paragraphs.append(paragraphs[j])
+                    self.logger.info(f"   Added P{j} to cluster: '{next_text[:30]}...'")
+                    j += 1
+                
+                if len(cluster_paragraphs) > 1:
+                    clusters.append({
+                        'start_idx': i,
+                        'end_idx': j - 1,
+                        'level': current_level,
+                        'element_type': element_type,
+                        'paragraphs': cluster_paragraphs
+                    })
+                    self.logger.info(f"✅ Created cluster: P{i}-P{j-1} ({len(cluster_paragraphs)} paragraphs)")
+                else:
+                    self.logger.info(f"❌ No cluster: only 1 paragraph")
+                
+                i = j
+            else:
+                i += 1
+        
+        self.logger.info(f"🎯 CLUSTER RESULT: {len(clusters)} clusters created")
+        return clusters
+    
+    def _merge_heading_clusters(self, clusters: List[Dict], soup: BeautifulSoup, original_paragraphs: List[ParagraphIR]) -> List[ParagraphIR]:
+        """Merge heading clusters into single paragraphs"""
+        if not clusters:
+            self.logger.info("❌ No clusters to merge → return original")
+            return original_paragraphs
+        
+        self.logger.info(f"🔗 MERGE DEBUG: Merging {len(clusters)} clusters")
+        
+        merged_paragraphs = []
+        cluster_indices = set()
+        
+        for cluster in clusters:
+            for i in range(cluster['start_idx'], cluster['end_idx'] + 1):
+                cluster_indices.add(i)
+        
+        for cluster in clusters:
+            merged_text = " ".join(paragraph.text for paragraph in cluster['paragraphs'] if paragraph.text)
+            merged_p = soup.new_tag("p")
+            merged_p.string = merged_text
+            merged_paragraphs.append(ParagraphIR(merged_p, merged_text, classify_element(merged_text), merged_text))
+            
+            self.logger.info(f"✅ Merged {cluster['element_type']} cluster: '{merged_text[:80]}...'")
+        
+        for i, paragraph in enumerate(original_paragraphs):
+            if i not in cluster_indices:
+                merged_paragraphs.append(paragraph)
+                self.logger.info(f"➕ Added non-cluster P{i}: '{paragraph.text[:50]}...'")
+        
+        # Tag.__eq__ so sánh đệ quy nên chỉ thử các paragraph gốc có cùng chuỗi string con cháu
+        # thay vì cả document cho mỗi paragraph (O(n²))
+        candidates: Dict[str, List[int]] = {}
+        for i, paragraph in enumerate(original_paragraphs):
+            candidates.setdefault(self._string_signature(paragraph.tag), []).append(i)
+        cluster_texts = [(" ".join(cp.text for cp in cluster['paragraphs']), cluster['start_idx']) for cluster in clusters]
+        
+        def get_sort_key(paragraph):
+            p = paragraph.tag
+            for i in candidates.get(self._string_signature(p), ()):
+                if p == original_paragraphs[i].tag:
+                    return i
+            for cluster_text, start_idx in cluster_texts:
+                if p.get_text() == cluster_text:
+                    return start_idx
+            return len(original_paragraphs)
+        
+        merged_paragraphs.sort(key=get_sort_key)
+        self.logger.info(f"🎯 MERGE RESULT: {len(merged_paragraphs)} paragraphs (was {len(original_paragraphs)})")
+        return merged_paragraphs
+    
+    @staticmethod
+    def _string_signature(tag: Tag) -> str:
+        """Mọi NavigableString con cháu (kể cả comment) nối lại - hai Tag == nhau thì luôn trùng chuỗi này"""
+        return "".join(string for string in tag.descendants if isinstance(string, NavigableString))
+    
+    def _is_legal_heading(self, text: str) -> bool:
+        """Check if text is a legal heading with updated patterns"""
+        if not text:
+            return False
+        
+        return LEGAL_HEADING_CLASSIFIER.matches(text)
+
+# ====================== OPTIMIZED STRUCTURE EXTRACTOR ======================
+
+class OptimizedDualFormatExtractor:
+    """Optimized structure extractor with FIXED number/name/content separation"""
+    
+    def __init__(self, logger: logging.Logger, config: ProcessingConfig):
+        self.logger = logger
+        self.config = config
+        self.deduplicator = ContentDeduplicator(logger) if config.enable_deduplication else None
+        self.timings: Dict[str, float] = {}  # seconds of the last extract_structure call
+        
+    def extract_structure(self, soup: BeautifulSoup, judgment_id: str,
+                          paragraphs: Optional[List[ParagraphIR]] = None) -> Dict[str, Any]:
+        """Extract structure with optimized dual format output
+        
+        paragraphs: HTMLProcessor.paragraphs của chính soup này (bỏ qua nếu không còn khớp với soup)
+        """
+        self.logger.info("Starting OPTIMIZED dual format structure extraction")
+        
+        started = time.perf_counter()
+        nested_data = self._extract_nested_structure(soup, judgment_id, paragraphs)
+        flat_data = self._generate_optimized_flat_format(nested_data, judgment_id)
+        extracted = time.perf_counter()
+        validation_report = self._validate_integrity(nested_data, flat_data)
+        self.timings = {"extract": extracted - started, "validate": time.perf_counter() - extracted}
+        
+        return {
+            "data": nested_data,
+            "data_flat": flat_data,
+            "validation": validation_report,
+            "metadata": {
+                "judgment_id": judgment_id,
+                "processing_timestamp": datetime.now().isoformat(),
+                "total_sections": len(nested_data.get('vbpl_section', [])),
+                "total_clauses": len(flat_data.get('vbpl_clause', [])),
+                "total_points": len(flat_data.get('vbpl_point', [])),
+                "deduplication_enabled": self.config.enable_deduplication,
+                "optimization_version": "2.1-fixed"
+            }
+        }
+    
+    def _paragraph_ir(self, soup: BeautifulSoup, paragraphs: Optional[List[ParagraphIR]] = None) -> List[ParagraphIR]:
+        """IR của các <p> trong soup: dùng lại IR được truyền vào nếu đúng là các <p> hiện tại, không thì build mới"""
+        tags = soup.find_all("p")
+        if paragraphs is not None and len(paragraphs) == len(tags) and all(
+                paragraph.tag is tag for paragraph, tag in zip(paragraphs, tags)):
+            return paragraphs
+        return build_paragraph_ir(tags, " ", strip=True)
+    
+    def _extract_nested_structure(self, soup: BeautifulSoup, judgment_id: str,
+                                  paragraphs: Optional[List[ParagraphIR]] = None) -> Dict[str, List[Dict]]:
+        """Extract nested hierarchical structure with FIXED number/name/content separation"""
+        paragraphs = self._paragraph_ir(soup, paragraphs)
+        result = {element_type: [] for element_type in ELEMENT_CONFIGS.keys()}
+        current_context = {}
+        
+        i = 0
+        while i < len(paragraphs):
+            text = paragraphs[i].text
+            
+            if not text:
+                i += 1
+                continue
+            
+            element = paragraphs[i].element
+            element_type = element[1] if element else None
+            if element and element[0] <= 4:
+                self._update_context_and_result(element_type, element[2], element[3], current_context, result, judgment_id)
+                i += 1
+                continue
+            
+            if element_type == 'vbpl_section':
+                section_data = self._extract_optimized_section(text, paragraphs, i, current_context, judgment_id)
+                if section_data:
+                    result['vbpl_section'].append(section_data['section'])
+                    result['vbpl_clause'].extend(section_data['clauses'])
+                    result['vbpl_point'].extend(section_data['points'])
+                    consumed = section_data.get('paragraphs_consumed', 0)
+                    i += consumed + 1
+                    continue
+            
+            if self.config.enable_clause and element_type == 'vbpl_clause':
+                clause_data = self._extract_optimized_clause_fixed(text, paragraphs, i, current_context, judgment_id)
+                if clause_data:
+                    result['vbpl_clause'].append(clause_data['clause'])
+                    result['vbpl_point'].extend(clause_data['points'])
+                    consumed = clause_data.get('paragraphs_consumed', 0)
+                    i += consumed + 1
+                    continue
+            
+            if self.config.enable_point and element_type == 'vbpl_point':
+                point_data = self._extract_optimized_point_fixed(text, current_context, judgment_id)
+                if point_data:
+                    result['vbpl_point'].append(point_data)
+                    i += 1
+                    continue
+            
+            i += 1
+        
+        return result
+    
+    def _extract_element_info_fixed(self, text: str, element_type: str) -> Optional[Tuple[str, str]]:
+        """FIXED: Extract element info with proper number/name separation"""
+        if element_type not in ELEMENT_CONFIGS:
+            return None
+        
+        structural_info = ELEMENT_CLASSIFIER.extract(text, element_type)
+        if structural_info:
+            # For high-level elements: number is group(1), name is group(2)
+            number_part, name_part = structural_info
+            self.logger.debug(f"🔍 EXTRACT {element_type}: text='{text}' → number='{number_part}', name='{name_part}'")
+        return structural_info
+
+    def _element_type(self, text: str) -> Optional[str]:
+        """Element type của paragraph theo ELEMENT_CLASSIFIER (None nếu là paragraph thường)"""
+        element = classify_element(text)
+        return element[1] if element is not None else None
+    
+    def _is_section_paragraph(self, text: str) -> bool:
+        """Check if paragraph is a section using unified pattern"""
+        return self._element_type(text) == 'vbpl_section'
+    
+    def _is_clause_paragraph(self, text: str) -> bool:
+        """Check if paragraph is a clause using unified pattern"""
+        return self._element_type(text) == 'vbpl_clause'
+    
+    def _is_point_paragraph(self, text: str) -> bool:
+        """Check if paragraph is a point using unified pattern"""
+        return self._element_type(text) == 'vbpl_point'
+    
+    def _is_major_element(self, text: str) -> bool:
+        """Check if text is a major structural element using unified patterns"""
+        return ELEMENT_CLASSIFIER.matches(text)
+    
+    def _extract_optimized_section(self, text: str, paragraphs: List[ParagraphIR], start_idx: int, current_context: Dict, judgment_id: str) -> Optional[Dict]:
+        """FIXED: Extract section with proper number/name/content separation"""
+        try:
+            # Use the fixed extraction method
+            structural_info = self._extract_element_info_fixed(text, 'vbpl_section')
+            if not structural_info:
+                return None
+            
+            section_number, section_name = structural_info
+            
+            current_context['section_number'] = section_number
+            
+            all_paragraphs = [text]
+            clauses = []
+            points = []
+            consumed_count = 0
+            
+            i = start_idx + 1
+            current_clause_context = current_context.copy()
+            
+            while i < len(paragraphs):
+                next_text = paragraphs[i].text
+                next_type = paragraphs[i].element_type
+                
+                if next_type is not None:  # major element - clauses and points included
+                    break
+                
+                if next_text:
+                    all_paragraphs.append(next_text)
+                    consumed_count += 1
+                    
+                    if self.config.enable_clause and next_type == 'vbpl_clause':
+                        clause_data = self._extract_optimized_clause_inline_fixed(next_text, paragraphs, i, current_clause_context, judgment_id)
+                        if clause_data:
+                            clauses.append(clause_data['clause'])
+                            points.extend(clause_data['points'])
+                            current_clause_context['clause_number'] = clause_data['clause']['clause_number']
+                    
+                    elif self.config.enable_point and next_type == 'vbpl_point':
+                        point_data = self._extract_optimized_point_fixed(next_text, current_clause_context, judgment_id)
+                        if point_data:
+                            points.append(point_data)
+                
+                i += 1
+            
+            if self.deduplicator:
+                section_only_content = self.deduplicator.extract_unique_content(
+                    all_paragraphs, clauses + points, 'section'
+                )
+            else:
+                section_only_content = self._extract_section_only_content_basic(all_paragraphs, clauses, points)
+            
+            tag_id = generate_optimized_id(judgment_id, "vbpl_section", current_context, section_number, tag=True)
+            section_id = generate_optimized_id(judgment_id, "vbpl_section", current_context, section_number, tag=False)
+            
+            section_data = self._create_optimized_element_data(
+                "vbpl_section", section_id, section_number, section_name, 
+                section_only_content, current_context, judgment_id, tag_id
+            )
+            
+            self.logger.debug(f"✅ SECTION: number='{section_number}', name='{section_name}', content_len={len(section_only_content)}")
+            
+            return {
+                'section': section_data,
+                'clauses': clauses,
+                'points': points,
+                'paragraphs_consumed': consumed_count
+            }
+        
+        except Exception as e:
+            self.logger.error(f"Error extracting optimized section from '{text}': {e}")
+            return None
+    
+    def _extract_optimized_clause_fixed(self, text: str, paragraphs: List[ParagraphIR], start_idx: int, current_context: Dict, judgment_id: str) -> Optional[Dict]:
+        """FIXED: Extract standalone optimized clause with proper number/name/content separation"""
+        return self._extract_optimized_clause_inline_fixed(text, paragraphs, start_idx, current_context, judgment_id)
+    
+    def _extract_optimized_clause_inline_fixed(self, text: str, paragraphs: List[ParagraphIR], start_idx: int, current_context: Dict, judgment_id: str) -> Optional[Dict]:
+        """FIXED: Extract clause with proper number/name/content separation - NO DUPLICATION"""
+        try:
+            # Use the config pattern to properly extract clause number and content
+            clause_info = ELEMENT_CLASSIFIER.extract(text, 'vbpl_clause')
+            if not clause_info:
+                return None
+            
+            clause_number, clause_content_initial = clause_info  # Just "1.", content without number
+            clause_name = ""  # Always empty for clauses as per requirement
+            
+            clause_context = current_context.copy()
+            clause_context['clause_number'] = clause_number
+            
+            clause_paragraphs = [clause_content_initial] if clause_content_initial else []
+            points = []
+            consumed_count = 0
+            
+            i = start_idx + 1
+            while i < len(paragraphs):
+                next_text = paragraphs[i].text
+                next_type = paragraphs[i].element_type
+                
+                if next_type is not None:  # major element, clause or section
+                    break
+                
+                if next_text:
+                    if self.config.enable_point and next_type == 'vbpl_point':
+                        point_data = self._extract_optimized_point_fixed(next_text, clause_context, judgment_id)
+                        if point_data:
+                            points.append(point_data)
+                    else:
+                        clause_paragraphs.append(next_text)
+                    consumed_count += 1
+                
+                i += 1
+            
+            if self.deduplicator:
+                clause_only_content = self.deduplicator.extract_unique_content(
+                    clause_paragraphs, points, 'clause'
+                )
+            else:
+                clause_only_content = self._extract_clause_only_content_basic(clause_paragraphs, points)
+            
+            tag_id = generate_optimized_id(judgment_id, "vbpl_clause", clause_context, clause_number, tag=True)
+            clause_id = generate_optimized_id(judgment_id, "vbpl_clause", clause_context, clause_number, tag=False)
+            
+            clause_data = self._create_optimized_element_data(
+                "vbpl_clause", clause_id, clause_number, clause_name,  # clause_name is always ""
+                clause_only_content, clause_context, judgment_id, tag_id
+            )
+            
+            self.logger.debug(f"✅ CLAUSE: number='{clause_number}', name='{clause_name}' (empty), content_len={len(clause_only_content)}")
+            
+            return {
+                'clause': clause_data,
+                'points': points,
+                'paragraphs_consumed': consumed_count
+            }
+        
+        except Exception as e:
+            self.logger.error(f"Error extracting optimized clause from '{text}': {e}")
+            return None
+    
+    def _extract_optimized_point_fixed(self, text: str, current_context: Dict, judgment_id: str) -> Optional[Dict]:
+        """FIXED: Extract point with proper number/name/content separation - NO DUPLICATION"""
+        if not self.config.enable_point:
+            return None
+        
+        try:
+            # Use the config pattern to properly extract point number and content
+            point_info = ELEMENT_CLASSIFIER.extract(text, 'vbpl_point')
+            if not point_info:
+                return None
+            
+            point_number, point_content = point_info  # Just "a)", content without letter
+            point_name = ""  # Always empty for points as per requirement
+            
+            point_context = current_context.copy()
+            point_context['point_number'] = point_number
+            
+            tag_id = generate_optimized_id(judgment_id, "vbpl_point", point_context, point_number, tag=True)
+            point_id = generate_optimized_id(judgment_id, "vbpl_point", point_context, point_number, tag=False)
+            
+            point_data = self._create_optimized_element_data(
+                "vbpl_point", point_id, point_number, point_name,  # point_name is always ""
+                point_content, point_context, judgment_id, tag_id
+            )
+            
+            self.logger.debug(f"✅ POINT: number='{point_number}', name='{point_name}' (empty), content='{point_content[:50]}...'")
+            
+            return point_data
+        
+        except Exception as e:
+            self.logger.error(f"Error extracting optimized point from '{text}': {e}")
+            return None
+    
+    def _create_optimized_element_data(self, element_type: str, element_id: str, number: str, name: str,
+                                     content: str, context: Dict, judgment_id: str, tag_id: str) -> Dict:
+        """Create optimized element data with MINIMAL parent references"""
+        config = ELEMENT_CONFIGS[element_type]
+        element_data = OrderedDict()
+        
+        immediate_parent_type = None
+        immediate_parent_id = None
+        
+        if config.parent_types:
+            for parent_type in reversed(config.parent_types):
+                parent_config = ELEMENT_CONFIGS[parent_type]
+                parent_number = context.get(parent_config.number_field)
+                if parent_number:
+                    immediate_parent_id = generate_optimized_id(judgment_id, parent_type, context, parent_number, tag=False)
+                    immediate_parent_type = parent_type
+                    break
+        
+        element_data[config.id_field] = element_id
+        element_data[config.number_field] = number
+        element_data[config.name_field] = name
+        element_data[config.content_field] = content
+        element_data['tag_id'] = tag_id
+        
+        if immediate_parent_id and immediate_parent_type:
+            parent_config = ELEMENT_CONFIGS[immediate_parent_type]
+            element_data['immediate_parent_id'] = immediate_parent_id
+            element_data['immediate_parent_type'] = immediate_parent_type
+            element_data[parent_config.id_field] = immediate_parent_id
+        
+        return dict(element_data)
+    
+    def _extract_section_only_content_basic(self, all_paragraphs: List[str], clauses: List[Dict], points: List[Dict]) -> str:
+        """Basic section content extraction"""
+        section_content_parts = []
+        
+        for paragraph in all_paragraphs:
+            if self._element_type(paragraph) in ('vbpl_clause', 'vbpl_point'):
+                continue
+            section_content_parts.append(paragraph)
+        
+        return "\n".join(section_content_parts)
+    
+    def _extract_clause_only_content_basic(self, clause_paragraphs: List[str], points: List[Dict]) -> str:
+        """Basic clause content extraction"""
+        clause_content_parts = []
+        
+        for paragraph in clause_paragraphs:
+            if self._is_point_paragraph(paragraph):
+                continue
+            clause_content_parts.append(paragraph)
+        
+        return "\n".join(clause_content_parts)
+    
+    def _update_context_and_result(self, element_type: str, number: str, name: str, 
+                                   current_context: Dict, result: Dict, judgment_id: str) -> None:
+        """Update context and add element to result with OPTIMIZED structure"""
+        config = ELEMENT_CONFIGS[element_type]
+        
+        for other_type, other_config in ELEMENT_CONFIGS.items():
+            if other_config.level > config.level:
+                current_context.pop(other_config.number_field, None)
+        
+        current_context[config.number_field] = number
+        
+        tag_id = generate_optimized_id(judgment_id, element_type, current_context, number, tag=True)
+        element_id = generate_optimized_id(judgment_id, element_type, current_context, number, tag=False)
+        
+        element_data = self._create_optimized_element_data(
+            element_type, element_id, number, name, "", current_context, judgment_id, tag_id
+        )
+        
+        result[element_type].append(element_data)
+        
+        self.logger.debug(f"✅ {element_type.upper()}: number='{number}', name='{name}'")
+    
+    def _generate_optimized_flat_format(self, nested_data: Dict, judgment_id: str) -> Dict[str, List[Dict]]:
+        """Generate OPTIMIZED flat format - NO DUPLICATION"""
+        flat_data = {element_type: [] for element_type in ELEMENT_CONFIGS.keys()}
+        
+        for element_type, elements in nested_data.items():
+            if element_type not in ELEMENT_CONFIGS:
+                continue
+                
+            for element in elements:
+                flat_entity = self._create_optimized_flat_entity(element, element_type)
+                flat_data[element_type].append(flat_entity)
+        
+        return flat_data
+    
+    def _create_optimized_flat_entity(self, element: Dict, entity_type: str) -> Dict:
+        """Create OPTIMIZED flat entity - NO DUPLICATION"""
+        if entity_type not in ELEMENT_CONFIGS:
+            return element
+            
+        config = ELEMENT_CONFIGS[entity_type]
+        flat_entity = OrderedDict()
+        
+        core_fields = [config.id_field, config.number_field, config.name_field, config.content_field, 'tag_id']
+        for field in core_fields:
+            if field in element:
+                flat_entity[field] = element[field]
+        
+        immediate_parent_id = element.get('immediate_parent_id')
+        immediate_parent_type = element.get('immediate_parent_type')
+        
+        if immediate_parent_id and immediate_parent_type:
+            flat_entity['immediate_parent_id'] = immediate_parent_id
+            flat_entity['immediate_parent_type'] = immediate_parent_type
+        
+        flat_entity['entity_type'] = entity_type
+        
+        return flat_entity
+    
+    def _validate_integrity(self, nested_data: Dict, flat_data: Dict) -> Dict:
+        """Validate integrity of optimized dual format"""
+        validation_report = {
+            "content_integrity": self._validate_content_integrity(nested_data, flat_data),
+            "relationship_integrity": self._validate_relationships(nested_data, flat_data),
+            "count_verification": self._validate_counts(nested_data, flat_data),
+            "id_consistency": self._validate_ids(nested_data, flat_data),
+            "deduplication_check": self._validate_no_duplication(nested_data, flat_data),
+            "validation_timestamp": datetime.now().isoformat(),
+            "validation_errors": []
+        }
+        
+        validation_report["status"] = all([
+            validation_report.get("content_integrity", {}).get("status", False),
+            validation_report.get("relationship_integrity", {}).get("status", False), 
+            validation_report.get("count_verification", {}).get("status", False),
+            validation_report.get("id_consistency", {}).get("status", False),
+            validation_report.get("deduplication_check", {}).get("status", False)
+        ])
+        
+        return validation_report
+    
+    def _validate_no_duplication(self, nested_data: Dict, flat_data: Dict) -> Dict:
+        """Validate that no content duplication exists"""
+        try:
+            content_signatures = set()
+            duplicate_count = 0
+            total_content_items = 0
+            
+            # Reset deduplicator state for fresh validation
+            if self.deduplicator:
+                self.deduplicator.content_signatures = set()
+                self.deduplicator.paragraph_map = {}
+            
+            for element_type, elements in nested_data.items():
+                if element_type not in ELEMENT_CONFIGS:
+                    continue
+                    
+                config = ELEMENT_CONFIGS[element_type]
+                
+                for element in elements:
+                    content = element.get(config.content_field, "")
+                    if content and content.strip():
+                        total_content_items += 1
+                        
+                        if self.deduplicator:
+                            signature = self.deduplicator.get_content_signature(content)
+                            # Check if already extracted by deduplicator
+                            if not self.deduplicator.is_paragraph_already_extracted(content, element_type):
+                                self.deduplicator.mark_paragraph_as_extracted(content, element_type)
+                                content_signatures.add(signature)
+                            else:
+                                duplicate_count += 1
+                        else:
+                            signature = hashlib.md5(content.strip().lower().encode()).hexdigest()
+                            if signature in content_signatures:
+                                duplicate_count += 1
+                            else:
+                                content_signatures.add(signature)
+            
+            duplication_ratio = duplicate_count / total_content_items if total_content_items > 0 else 0
+                
+            return {
+                "status": duplicate_count == 0,
+                "total_content_items": total_content_items,
+                "duplicate_content_count": duplicate_count,
+                "unique_content_count": len(content_signatures),
+                "duplication_ratio": duplication_ratio,
+                "efficiency_gain": f"{(1 - duplication_ratio) * 100:.1f}%" if duplication_ratio < 1 else "0%"
+            }
+                
+        except Exception as e:
+            return {"status": False, "error": str(e)}
+    
+    def _validate_content_integrity(self, nested_data: Dict, flat_data: Dict) -> Dict:
+        """Validate content integrity between formats"""
+        try:
+            nested_content = self._extract_all_content(nested_data)
+            flat_content = self._extract_all_content_flat(flat_data)
+            
+            nested_hash = hashlib.md5(nested_content.encode('utf-8')).hexdigest()
+            flat_hash = hashlib.md5(flat_content.encode('utf-8')).hexdigest()
+            
+            return {
+                "status": nested_hash == flat_hash,
+                "nested_hash": nested_hash,
+                "flat_hash": flat_hash,
+                "total_characters_nested": len(nested_content),
+                "total_characters_flat": len(flat_content)
+            }
+        except Exception as e:
+            return {"status": False, "error": str(e)}
+    
+    def _validate_relationships(self, nested_data: Dict, flat_data: Dict) -> Dict:
+        """Validate relationship integrity"""
+        try:
+            nested_relations = self._build_relation_map(nested_data)
+            flat_relations = self._build_relation_map_flat(flat_data)
+            
+            return {
+                "status": nested_relations == flat_relations,
+                "nested_relations_count": len(nested_relations),
+                "flat_relations_count": len(flat_relations),
+                "missing_relations": list(nested_relations - flat_relations),
+                "extra_relations": list(flat_relations - nested_relations)
+            }
+        except Exception as e:
+            return {"status": False, "error": str(e)}
+    
+    def _validate_counts(self, nested_data: Dict, flat_data: Dict) -> Dict:
+        """Validate entity counts"""
+        counts = {}
+        status = True
+        
+        for element_type in ELEMENT_CONFIGS.keys():
+            nested_count = len(nested_data.get(element_type, []))
+            flat_count = len(flat_data.get(element_type, []))
+            
+            counts[element_type] = {
+                "nested": nested_count,
+                "flat": flat_count,
+                "match": nested_count == flat_count
+            }
+            
+            if nested_count != flat_count:
+                status = False
+        
+        counts["status"] = status
+        return counts
+    
+    def _validate_ids(self, nested_data: Dict, flat_data: Dict) -> Dict:
+        """Validate ID consistency"""
+        try:
+            nested_ids = self._extract_all_ids(nested_data)
+            flat_ids = self._extract_all_ids(flat_data)
+            
+            return {
+                "status": nested_ids == flat_ids,
+                "nested_ids_count": len(nested_ids),
+                "flat_ids_count": len(flat_ids),
+                "missing_in_flat": list(nested_ids - flat_ids),
+                "extra_in_flat": list(flat_ids - nested_ids)
+            }
+        except Exception as e:
+            return {"status": False, "error": str(e)}
+    
+    def _extract_all_content(self, data: Dict) -> str:
+        """Extract all content from data"""
+        content_parts = []
+        
+        for element_type, elements in data.items():
+            if element_type not in ELEMENT_CONFIGS:
+                continue
+                
+            config = ELEMENT_CONFIGS[element_type]
+            
+            for element in elements:
+                content = ""
+                
+                if hasattr(config, 'content_field') and config.content_field in element:
+                    content = element.get(config.content_field, "")
+                
+                if not content:
+                    if element_type == 'vbpl_section':
+                        content = element.get('section_content', '')
+                    elif element_type == 'vbpl_clause':
+                        content = element.get('clause_content', '')
+                    elif element_type == 'vbpl_point':
+                        content = element.get('point_content', '')
+                    
+                    if not content:
+                        content = (element.get('content', '') or 
+                                 element.get(config.name_field, ''))
+                
+                if content:
+                    content_parts.append(str(content))
+        
+        return "".join(content_parts)
+    
+    def _extract_all_content_flat(self, data: Dict) -> str:
+        """Extract all content from flat data"""
+        return self._extract_all_content(data)
+    
+    def _build_relation_map(self, data: Dict) -> set:
+        """Build relationship map for data"""
+        relations = set()
+        
+        for element_type, elements in data.items():
+            if element_type not in ELEMENT_CONFIGS:
+                continue
+                
+            config = ELEMENT_CONFIGS[element_type]
+            
+            for element in elements:
+                element_id = element.get(config.id_field)
+                if not element_id:
+                    continue
+                
+                immediate_parent_id = element.get('immediate_parent_id')
+                if immediate_parent_id:
+                    relations.add((str(immediate_parent_id), str(element_id)))
+        
+        return relations
+    
+    def _build_relation_map_flat(self, data: Dict) -> set:
+        """Build relationship map for flat data"""
+        return self._build_relation_map(data)
+    
+    def _extract_all_ids(self, data: Dict) -> set:
+        """Extract all IDs from data"""
+        ids = set()
+        for element_type, elements in data.items():
+            config = ELEMENT_CONFIGS.get(element_type)
+            if config and hasattr(config, 'id_field'):
+                for element in elements:
+                    element_id = element.get(config.id_field)
+                    if element_id:
+                        ids.add(str(element_id))
+                    tag_id = element.get('tag_id')
+                    if tag_id:
+                        ids.add(str(tag_id))
+        return ids
+
+# ====================== MAIN PROCESSOR ======================
+
+class OptimizedVBPLProcessor:
+    """OPTIMIZED VBPL processor with FIXED number/name/content separation"""
+    
+    def __init__(self, config: ProcessingConfig, rate_limiter: Optional[HostRateLimiter] = None):
+        self.config = config
+        self.rate_limiter = rate_limiter
+        self.http_client = get_http_client(config)
+        self.logger = None
+    
+    def process_document(self, judgment_id: str,
+                         previous_hashes: Optional[Dict[str, str]] = None) -> Tuple[bool, Optional[Dict]]:
+        """Process document with OPTIMIZED dual format output và return data.
+        
+        `previous_hashes` (api_hash/html_hash đã lưu): nếu cả hai khớp thì bỏ qua extraction
+        và trả về kết quả `unchanged`.
+        """
+        self.logger = setup_logging(self.config, judgment_id)
+        self.logger.info(f"Starting OPTIMIZED VBPL processing for document {judgment_id}")
+        
+        try:
+            started = time.perf_counter()
+            json_data = self.fetch_metadata(judgment_id)
+            fetched_metadata = time.perf_counter()
+            
+            html_content = self.fetch_html(json_data, judgment_id)
+            if not html_content:
+                return False, None
+            fetch_timings = {"api_fetch": fetched_metadata - started, "html_fetch": time.perf_counter() - fetched_metadata}
+            
+            content_hashes = compute_content_hashes(json_data, html_content)
+            if previous_hashes and self.is_unchanged(content_hashes, previous_hashes):
+                result = self.unchanged_result(json_data, content_hashes)
+                result["stage_timings"].update(fetch_timings)
+                return True, result
+            
+            complete_result = self.extract_document(judgment_id, json_data, html_content)
+            complete_result["content_hashes"] = content_hashes
+            complete_result["stage_timings"].update(fetch_timings)
+            return True, complete_result
+            
+        except Exception as e:
+            self.logger.error(f"❌ Processing failed: {e}", exc_info=True)
+            return False, None
+        finally:
+            close_logging(self.logger)
+    
+    @staticmethod
+    def is_unchanged(content_hashes: Dict[str, str], previous_hashes: Dict[str, str]) -> bool:
+        return all(previous_hashes.get(key) == value for key, value in content_hashes.items())
+    
+    def unchanged_result(self, json_data: Dict, content_hashes: Dict[str, str]) -> Dict:
+        """Kết quả cho document không đổi - chỉ metadata (cho vbpl_diagram), không có structure"""
+        self.logger.info("♻️  Content unchanged (API + HTML hashes match), skipping extraction")
+        return {
+            "unchanged": True,
+            "document_metadata": self._extract_document_metadata(json_data),
+            "content_hashes": content_hashes,
+            "stage_timings": {}
+        }
+    
+    def fetch_metadata(self, judgment_id: str) -> Dict:
+        """Stage 1 (I/O): fetch raw API data for a document"""
+        headers = self._load_headers()
+        return self._fetch_json_data(judgment_id, headers)
+    
+    def fetch_html(self, json_data: Dict, judgment_id: str) -> Optional[str]:
+        """Stage 2 (I/O): download the S3 HTML referenced by s3_key"""
+        html_processor = HTMLProcessor(None, self.logger, self.rate_limiter, self.http_client)
+        return self._process_html(json_data, html_processor, judgment_id)
+    
+    def extract_document(self, judgment_id: str, json_data: Dict, html_content: str) -> Dict:
+        """Stage 3 (CPU): normalize, extract structure, validate and save results
+        (under cProfile when the document is selected by profile_docs / profile_sample_rate)"""
+        if not should_profile(self.config, judgment_id):
+            return self._extract_document(judgment_id, json_data, html_content)
+        
+        with DocumentProfiler(self.config, judgment_id) as profiler:
+            complete_result = self._extract_document(judgment_id, json_data, html_content)
+        complete_result["profile"] = profiler.write(complete_result["stage_timings"])
+        self.logger.info(f"🔬 Profile: {complete_result['profile']['prof_path'] or 'wall-clock only'} "
+                         f"({profiler.wall_seconds:.2f}s)")
+        return complete_result
+    
+    def _extract_document(self, judgment_id: str, json_data: Dict, html_content: str) -> Dict:
+        started = time.perf_counter()
+        text_processor = TextProcessor(self.config.viet74k_path, self.logger, get_clean_text_cache(self.config))
+        html_processor = HTMLProcessor(text_processor, self.logger, self.rate_limiter, self.http_client)
+        structure_extractor = OptimizedDualFormatExtractor(self.logger, self.config)
+        
+        json_data = self._normalize_json_data(json_data, text_processor, judgment_id)
+        
+        soup = BeautifulSoup(html_content, "html.parser")
+        soup = html_processor.process_html_optimized(soup)
+        
+        parsed = time.perf_counter()
+        
+        normalized_html_file = os.path.join(self.config.log_dir, f"s3_{judgment_id}_normalized.html")
+        with open(normalized_html_file, "w", encoding="utf-8") as f:
+            f.write(str(soup))
+        saved_html = time.perf_counter() - parsed
+        
+        dual_format_result = structure_extractor.extract_structure(soup, judgment_id, html_processor.paragraphs)
+        extracted = time.perf_counter()
+        
+        # CREATE COMPLETE RESULT OBJECT - Direct access data
+        complete_result = {
+            "document_metadata": self._extract_document_metadata(json_data),
+            "structure_data": dual_format_result["data"],
+            "structure_data_flat": dual_format_result["data_flat"],
+            "validation": dual_format_result["validation"],
+            "metadata": dual_format_result["metadata"]
+        }
+        
+        # Save files như cũ để backup
+        self._save_results(dual_format_result, json_data, judgment_id)
+        self._log_enhanced_validation_results(dual_format_result["validation"])
+        
+        # Per-stage seconds for crawler metrics (fetch stages are added by the caller)
+        complete_result["stage_timings"] = {
+            "parse": parsed - started,
+            **structure_extractor.timings,
+            "save": saved_html + (time.perf_counter() - extracted)
+        }
+        if text_processor.cache is not None:
+            complete_result["clean_text_cache"] = dict(text_processor.cache_stats)
+        
+        self.logger.info("✅ OPTIMIZED VBPL processing completed successfully")
+        return complete_result
+    
+    def _load_headers(self) -> Dict[str, str]:
+        """Load API headers (cached by the shared HTTP client)"""
+        # Offline replay and local mock servers need no API credentials
+        local = self.config.offline or self.config.api_base_url.rstrip("/") != LEXCENTRA_BASE_URL
+        if local and not os.path.exists(self.config.headers_path):
+            return {}
+        try:
+            headers = self.http_client.load_headers(self.config.headers_path)
+            self.logger.info(f"Loaded {len(headers)} headers")
+            return headers
+        except Exception as e:
+            self.logger.error(f"Failed to load headers: {e}")
+            raise
+    
+    def _fetch_json_data(self, judgment_id: str, headers: Dict[str, str]) -> Dict:
+        """Fetch JSON data from API with improved error handling"""
+        url = api_url(self.config.api_base_url, judgment_id)
+        
+        try:
+            response = self.http_client.get(url, headers=headers, rate_limiter=self.rate_limiter)
+            response.raise_for_status()
+            
+            # Parse JSON response
+            json_response = response.json()
+            
+            # Handle different response formats
+            if "data" in json_response:
+                data = json_response["data"]
+            elif isinstance(json_response, dict):
+                # Sometimes response is direct data without "data" wrapper
+                data = json_response
+            else:
+                self.logger.error(f"Unexpected API response format for {judgment_id}")
+                raise ValueError(f"Invalid API response format")
+            
+            # Validate data is not empty
+            if not data:
+                self.logger.error(f"Empty data received for {judgment_id}")
+                raise ValueError(f"Empty data received")
+            
+            # Save raw response for debugging
+            raw_file = os.path.join(self.config.log_dir, f"api_{judgment_id}_raw.json")
+            with open(raw_file, "w", encoding="utf-8") as f:
+                json.dump({"response": json_response}, f, ensure_ascii=False, indent=2)
+            
+            self.logger.info("JSON data fetched successfully")
+            return data
+            
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"HTTP request failed for {judgment_id}: {e}")
+            raise
+        except json.JSONDecodeError as e:
+            self.logger.error(f"JSON decode failed for {judgment_id}: {e}")
+            raise
+        except Exception as e:
+            self.logger.error(f"Failed to fetch JSON data for {judgment_id}: {e}")
+            raise
+
+    def _filter_vbpl_relevant_fields(self, data: Dict) -> Dict:
+        """Filter to keep only VBPL-relevant fields"""
+        filtered_data = {}
+    
+        for key, value in data.items():
+            if key in VBPL_FIELDS_TO_KEEP:
+                filtered_data[key] = value
+    
+        return filtered_data
+
+    def _normalize_json_data(self, data: Dict, text_processor: TextProcessor, judgment_id: str) -> Dict:
+        """Normalize JSON data structure and text"""
+        self.logger.info("Normalizing JSON data")
+        
+        # Normalize lists
+        for element_type in ELEMENT_CONFIGS.keys():
+            data[element_type] = self._normalize_json_list(data.get(element_type, []))
+        
+        # Normalize text fields
+        for element_type in ELEMENT_CONFIGS.keys():
+            for obj in data.get(element_type, []):
+                for field, value in obj.items():
+                    if isinstance(value, str):
+                        obj[field] = text_processor.clean_text(value)
+        
+        data = self._filter_vbpl_relevant_fields(data)
+        
+        # Save normalized data
+        normalized_file = os.path.join(self.config.log_dir, f"api_{judgment_id}_json_normalize.json")
+        with open(normalized_file, "w", encoding="utf-8") as f:
+            json.dump({"data": data}, f, ensure_ascii=False, indent=2)
+        
+        self.logger.info("JSON data normalization completed")
+        return data
+    
+    def _normalize_json_list(self, raw_data: Any) -> List[Dict]:
+        """Normalize various JSON list formats"""
+        if isinstance(raw_data, list):
+            return raw_data
+        if isinstance(raw_data, dict):
+            return [raw_data]
+        if isinstance(raw_data, str):
+            text = raw_data.strip()
+            if not text:
+                return []
+            
+            # Try parsing as JSON list
+            if text.startswith("[") and text.endswith("]"):
+                try:
+                    return json.loads(text)
+                except json.JSONDecodeError:
+                    pass
+            
+            # Try fixing malformed JSON
+            try:
+                fixed_text = "[" + text + "]"
+                fixed_text = fixed_text.replace(",]", "]")
+                return json.loads(fixed_text)
+            except json.JSONDecodeError:
+                pass
+            
+            # Try single object
+            try:
+                obj = json.loads(text)
+                return [obj]
+            except json.JSONDecodeError:
+                pass
+        
+        return []
+
+   
+
+    def _extract_document_metadata(self, json_data: Dict) -> Dict:
+        """Extract document metadata từ API response"""
+        document_metadata = {}
+        metadata_fields = [
+            "id_judgment", "judgment_number", "judgment_name", "full_judgment_name",
+            "date_issued", "state", "state_id", "doc_type", "issuing_authority",
+            "s3_key", "vbpl_diagram", "application_date", "expiration_date", 
+            "expiration_date_not_applicable", "type_document", "sector"
+        ]
+        
+        for field in metadata_fields:
+            if field in json_data:
+                document_metadata[field] = json_data[field]
+        
+        return document_metadata
+    
+    def _process_html(self, json_data: Dict, html_processor: HTMLProcessor, judgment_id: str) -> Optional[str]:
+        """Process HTML from S3"""
+        s3_url = json_data.get("s3_key")
+        if not s3_url:
+            self.logger.error("No s3_key found")
+            return None
+        
+        self.logger.info(f"Fetching HTML from: {s3_url}")
+        
+        raw_html_file = os.path.join(self.config.log_dir, f"s3_{judgment_id}_raw.html")
+        html_content = html_processor.get_html_content_with_encoding(s3_url, raw_html_file)
+        
+        if not html_content:
+            self.logger.error("Failed to fetch HTML content")
+            return None
+        
+        self.logger.info("HTML content processed successfully")
+        return html_content
+    
+    def _save_results(self, dual_format_result: Dict, json_metadata: Dict, judgment_id: str) -> None:
+        """Save all processing results with JSON serialization safety and metadata"""
+        try:
+            # Extract document metadata INCLUDING vbpl_diagram
+            document_metadata = {}
+            metadata_fields = [
+                "id_judgment", "judgment_number", "judgment_name", "full_judgment_name",
+                "date_issued", "state", "state_id", "doc_type", "issuing_authority",
+                "s3_key", "vbpl_diagram", "application_date", "expiration_date", 
+                "expiration_date_not_applicable", "type_document", "sector"
+            ]
+            
+            for field in metadata_fields:
+                if field in json_metadata:
+                    document_metadata[field] = json_metadata[field]
+            
+            # Create nested format with metadata
+            nested_with_metadata = {
+                "document_metadata": document_metadata,
+                "structure_data": dual_format_result["data"]
+            }
+            
+            # Create flat format with metadata  
+            flat_with_metadata = {
+                "document_metadata": document_metadata,
+                "structure_data": dual_format_result["data_flat"]
+            }
+            
+            nested_file = os.path.join(self.config.log_dir, f"optimized_nested_{judgment_id}.json")
+            with open(nested_file, "w", encoding="utf-8") as f:
+                json.dump(nested_with_metadata, f, ensure_ascii=False, indent=2)
+            
+            flat_file = os.path.join(self.config.log_dir, f"optimized_flat_{judgment_id}.json")
+            with open(flat_file, "w", encoding="utf-8") as f:
+                json.dump(flat_with_metadata, f, ensure_ascii=False, indent=2)
+            
+            validation_file = os.path.join(self.config.log_dir, f"optimized_validation_{judgment_id}.json")
+            with open(validation_file, "w", encoding="utf-8") as f:
+                json.dump(dual_format_result["validation"], f, ensure_ascii=False, indent=2)
+            
+            metadata_file = os.path.join(self.config.log_dir, f"optimized_metadata_{judgment_id}.json")
+            with open(metadata_file, "w", encoding="utf-8") as f:
+                json.dump(dual_format_result["metadata"], f, ensure_ascii=False, indent=2)
+            
+            complete_file = os.path.join(self.config.log_dir, f"optimized_complete_{judgment_id}.json")
+            try:
+                with open(complete_file, "w", encoding="utf-8") as f:
+                    json.dump(dual_format_result, f, ensure_ascii=False, indent=2)
+            except TypeError as e:
+                self.logger.warning(f"Could not save complete file due to JSON serialization issue: {e}")
+                sanitized_result = self._sanitize_for_json(dual_format_result)
+                with open(complete_file, "w", encoding="utf-8") as f:
+                    json.dump(sanitized_result, f, ensure_ascii=False, indent=2)
+            
+            self.logger.info("All OPTIMIZED results saved successfully")
+            
+        except Exception as e:
+            self.logger.error(f"Error saving results: {e}")
+            raise
+    
+    def _sanitize_for_json(self, data):
+        """Recursively sanitize data for JSON serialization"""
+        if isinstance(data, dict):
+            return {k: self._sanitize_for_json(v) for k, v in data.items()}
+        elif isinstance(data, list):
+            return [self._sanitize_for_json(item) for item in data]
+        elif isinstance(data, set):
+            return list(data)
+        elif isinstance(data, (str, int, float, bool)) or data is None:
+            return data
+        else:
+            return str(data)
+    
+    def _log_enhanced_validation_results(self, validation: Dict) -> None:
+        """Log ENHANCED validation results with deduplication metrics"""
+        self.logger.info("📊 ENHANCED VALIDATION RESULTS (FIXED VERSION):")
+        self.logger.info(f"   Overall Status: {'✅ PASS' if validation.get('status', False) else '❌ FAIL'}")
+        
+        content = validation.get('content_integrity', {})
+        self.logger.info(f"   Content Integrity: {'✅' if content.get('status', False) else '❌'}")
+        if not content.get('status', False):
+            self.logger.info(f"     Nested chars: {content.get('total_characters_nested', 0)}")
+            self.logger.info(f"     Flat chars: {content.get('total_characters_flat', 0)}")
+        
+        relations = validation.get('relationship_integrity', {})
+        self.logger.info(f"   Relationship Integrity: {'✅' if relations.get('status', False) else '❌'}")
+        
+        counts = validation.get('count_verification', {})
+        self.logger.info(f"   Count Verification: {'✅' if counts.get('status', False) else '❌'}")
+        for element_type in ELEMENT_CONFIGS.keys():
+            if element_type in counts:
+                element_counts = counts[element_type]
+                nested = element_counts.get('nested', 0)
+                flat = element_counts.get('flat', 0)
+                match = element_counts.get('match', False)
+                status_icon = '✅' if match else '❌'
+                self.logger.info(f"     {element_type}: {status_icon} N:{nested} F:{flat}")
+        
+        ids = validation.get('id_consistency', {})
+        self.logger.info(f"   ID Consistency: {'✅' if ids.get('status', False) else '❌'}")
+        if not ids.get('status', False):
+            missing = ids.get('missing_in_flat', [])
+            extra = ids.get('extra_in_flat', [])
+            if missing:
+                self.logger.info(f"     Missing in flat: {len(missing)} IDs")
+            if extra:
+                self.logger.info(f"     Extra in flat: {len(extra)} IDs")
+        
+        dedup = validation.get('deduplication_check', {})
+        self.logger.info(f"   🎯 DEDUPLICATION CHECK: {'✅ NO DUPLICATES' if dedup.get('status', False) else '❌ DUPLICATES FOUND'}")
+        if dedup:
+            self.logger.info(f"     Total content items: {dedup.get('total_content_items', 0)}")
+            self.logger.info(f"     Unique content: {dedup.get('unique_content_count', 0)}")
+            self.logger.info(f"     Duplicate content: {dedup.get('duplicate_content_count', 0)}")
+            self.logger.info(f"     💰 Efficiency gain: {dedup.get('efficiency_gain', '0%')}")
+
+# ====================== ASYNC PIPELINE ======================
+
+class AsyncVBPLProcessor:
+    """asyncio front-end: API và S3 fetches của nhiều documents chạy chồng lên nhau,
+    extraction chạy tuần tự trên một thread riêng"""
+    
+    def __init__(self, config: ProcessingConfig, rate_limiter: Optional[HostRateLimiter] = None,
+                 max_in_flight: int = 4):
+        self.config = config
+        self.rate_limiter = rate_limiter
+        self.max_in_flight = max_in_flight
+        self._io_executor = ThreadPoolExecutor(max_workers=2 * max_in_flight, thread_name_prefix="vbpl-fetch")
+        self._extract_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vbpl-extract")
+    
+    async def process_document(self, judgment_id: str,
+                               previous_hashes: Optional[Dict[str, str]] = None) -> Tuple[bool, Optional[Dict]]:
+        """Same (success, result_data) contract as OptimizedVBPLProcessor.process_document"""
+        loop = asyncio.get_running_loop()
+        processor = OptimizedVBPLProcessor(self.config, self.rate_limiter)
+        processor.logger = setup_logging(self.config, judgment_id)
+        processor.logger.info(f"Starting ASYNC VBPL processing for document {judgment_id}")
+        
+        try:
+            started = time.perf_counter()
+            json_data = await loop.run_in_executor(self._io_executor, processor.fetch_metadata, judgment_id)
+            fetched_metadata = time.perf_counter()
+            
+            html_content = await loop.run_in_executor(self._io_executor, processor.fetch_html, json_data, judgment_id)
+            if not html_content:
+                return False, None
+            fetch_timings = {"api_fetch": fetched_metadata - started, "html_fetch": time.perf_counter() - fetched_metadata}
+            
+            content_hashes = compute_content_hashes(json_data, html_content)
+            if previous_hashes and processor.is_unchanged(content_hashes, previous_hashes):
+                result = processor.unchanged_result(json_data, content_hashes)
+                result["stage_timings"].update(fetch_timings)
+                return True, result
+            
+            complete_result = await loop.run_in_executor(
+                self._extract_executor, processor.extract_document, judgment_id, json_data, html_content
+            )
+            complete_result["content_hashes"] = content_hashes
+            complete_result["stage_timings"].update(fetch_timings)
+            return True, complete_result
+            
+        except Exception as e:
+            processor.logger.error(f"❌ Processing failed: {e}", exc_info=True)
+            return False, None
+        finally:
+            close_logging(processor.logger)
+    
+    def close(self) -> None:
+        self._io_executor.shutdown(wait=True)
+        self._extract_executor.shutdown(wait=True)
+
+# ====================== PROCESS POOL PIPELINE ======================
+
+_extract_processor: Optional[OptimizedVBPLProcessor] = None
+
+def _init_extract_worker(shared_clean_text_cache):
+    """Pool initializer: proxy tới CleanTextCache của manager process (None = không chia sẻ)"""
+    global _shared_clean_text_cache
+    _shared_clean_text_cache = shared_clean_text_cache
+
+def _extract_in_worker(config: ProcessingConfig, judgment_id: str, json_data: Dict, html_content: str,
+                       content_hashes: Dict[str, str], fetch_timings: Dict[str, float]) -> Dict:
+    """Stage 3 (CPU) trên process-pool worker - một processor cho mỗi worker process"""
+    global _extract_processor
+    if _extract_processor is None or _extract_processor.config != config:
+        _extract_processor = OptimizedVBPLProcessor(config)
+    processor = _extract_processor
+    processor.logger = setup_logging(config, judgment_id, mode='a')
+    
+    try:
+        complete_result = processor.extract_document(judgment_id, json_data, html_content)
+        complete_result["content_hashes"] = content_hashes
+        complete_result["stage_timings"].update(fetch_timings)
+        return complete_result
+    except Exception as e:
+        processor.logger.error(f"❌ Extraction failed: {e}", exc_info=True)
+        raise
+    finally:
+        close_logging(processor.logger)
+
+class StagedVBPLProcessor:
+    """Fetch stage chạy trên threads của caller, normalize/extract/validate chạy trên process pool.
+    
+    Caller nối hai stage bằng hàng đợi giới hạn: fetch() trả về dữ liệu thô, submit_extract()
+    đưa vào pool và trả về Future. Pool dùng spawn để không fork một process đang có threads.
+    """
+    
+    def __init__(self, config: ProcessingConfig, rate_limiter: Optional[HostRateLimiter] = None,
+                 cpu_workers: Optional[int] = None):
+        self.config = config
+        self.rate_limiter = rate_limiter
+        self.cpu_workers = cpu_workers or os.cpu_count() or 1
+        context = multiprocessing.get_context("spawn")
+        self.cache_manager: Optional[CleanTextCacheManager] = None
+        self.shared_clean_text_cache = None
+        if config.clean_text_cache_shared and config.clean_text_cache_size > 0:
+            self.cache_manager = CleanTextCacheManager(ctx=context)
+            self.cache_manager.start()
+            self.shared_clean_text_cache = self.cache_manager.CleanTextCache(config.clean_text_cache_size)
+        self.pool = ProcessPoolExecutor(max_workers=self.cpu_workers, mp_context=context,
+                                        initializer=_init_extract_worker, initargs=(self.shared_clean_text_cache,))
+    
+    def fetch(self, judgment_id: str, previous_hashes: Optional[Dict[str, str]] = None) -> Dict:
+        """Stage 1-2 (I/O): {'result': ...} nếu nội dung không đổi,
+        ngược lại {'json_data', 'html_content', 'content_hashes'}. Raise khi fetch lỗi."""
+        processor = OptimizedVBPLProcessor(self.config, self.rate_limiter)
+        processor.logger = setup_logging(self.config, judgment_id)
+        processor.logger.info(f"Starting STAGED VBPL processing for document {judgment_id}")
+        
+        try:
+            started = time.perf_counter()
+            json_data = processor.fetch_metadata(judgment_id)
+            fetched_metadata = time.perf_counter()
+            html_content = processor.fetch_html(json_data, judgment_id)
+            if not html_content:
+                raise ValueError(f"No HTML content for {judgment_id}")
+            fetch_timings = {"api_fetch": fetched_metadata - started, "html_fetch": time.perf_counter() - fetched_metadata}
+            
+            content_hashes = compute_content_hashes(json_data, html_content)
+            if previous_hashes and processor.is_unchanged(content_hashes, previous_hashes):
+                result = processor.unchanged_result(json_data, content_hashes)
+                result["stage_timings"].update(fetch_timings)
+                return {"result": result}
+            return {"json_data": json_data, "html_content": html_content, "content_hashes": content_hashes,
+                    "stage_timings": fetch_timings}
+            
+        except Exception as e:
+            processor.logger.error(f"❌ Fetch failed: {e}", exc_info=True)
+            raise
+        finally:
+            close_logging(processor.logger)
+    
+    def submit_extract(self, judgment_id: str, fetched: Dict) -> Future:
+        return self.pool.submit(_extract_in_worker, self.config, judgment_id, fetched["json_data"],
+                                fetched["html_content"], fetched["content_hashes"], fetched["stage_timings"])
+    
+    def clean_text_cache_stats(self) -> Optional[Dict[str, int]]:
+        """Entries/evictions của shared tier (None nếu không bật) - hit/miss được đếm ở phía worker"""
+        if self.shared_clean_text_cache is None:
+            return None
+        stats = self.shared_clean_text_cache.get_stats()
+        return {"entries": stats["entries"], "evictions": stats["evictions"]}
+    
+    def close(self) -> None:
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        if self.cache_manager is not None:
+            self.cache_manager.shutdown()
+            self.cache_manager = None
+            self.shared_clean_text_cache = None
+
+# ====================== MAIN EXECUTION ======================
+
+def test_fixed_patterns():
+    """Test function to verify FIXED patterns work correctly"""
+    test_cases = [
+        # High-level elements (should extract number and name separately)
+        ("Phần I. NHỮNG QUY ĐỊNH CHUNG", "vbpl_big_part", ("Phần I", "NHỮNG QUY ĐỊNH CHUNG")),
+        ("Chương II. CHIẾN LƯỢC, QUY HOẠCH KHOÁNG SẢN", "vbpl_chapter", ("Chương II", "CHIẾN LƯỢC, QUY HOẠCH KHOÁNG SẢN")),
+        ("Mục 1. TÀI CHÍNH VỀ KHOÁNG SẢN", "vbpl_part", ("Mục 1", "TÀI CHÍNH VỀ KHOÁNG SẢN")),
+        ("Tiểu mục 2. ĐẤU GIÁ QUYỀN KHAI THÁC", "vbpl_mini_part", ("Tiểu mục 2", "ĐẤU GIÁ QUYỀN KHAI THÁC")),
+        ("Điều 1. Phạm vi điều chỉnh", "vbpl_section", ("Điều 1", "Phạm vi điều chỉnh")),
+        
+        # Low-level elements (should extract number only, content separate)
+        ("1. Khoáng sản là khoáng vật có ích", "vbpl_clause", ("1.", "Khoáng sản là khoáng vật có ích")),
+        ("a) Hỗ trợ chi phí đầu tư nâng cấp", "vbpl_point", ("a)", "Hỗ trợ chi phí đầu tư nâng cấp")),
+        
+        # Edge cases
+        ("Phần I", "vbpl_big_part", ("Phần I", "")),
+        ("Điều 25", "vbpl_section", ("Điều 25", "")),
+        ("đ) Quy định khác", "vbpl_point", ("đ)", "Quy định khác")),
+    ]
+    
+    print("🧪 Testing FIXED Regex Patterns:")
+    
+    for text, expected_type, expected_extraction in test_cases:
+        # Test level detection
+        level_info = get_element_level_from_configs(text)
+        actual_type = level_info[1] if level_info else None
+        type_status = "✅" if actual_type == expected_type else "❌"
+        
+        # Test extraction
+        if expected_type in ELEMENT_CONFIGS:
+            config = ELEMENT_CONFIGS[expected_type]
+            flags = re.IGNORECASE if expected_type == 'vbpl_section' else 0
+            match = re.match(config.pattern, text, flags)
+            
+            if match:
+                actual_number = match.group(1).strip() if match.group(1) else ""
+                actual_content = match.group(2).strip() if len(match.groups()) >= 2 and match.group(2) else ""
+                actual_extraction = (actual_number, actual_content)
+                extraction_status = "✅" if actual_extraction == expected_extraction else "❌"
+            else:
+                actual_extraction = (None, None)
+                extraction_status = "❌"
+        else:
+            actual_extraction = (None, None)
+            extraction_status = "❌"
+        
+        print(f"   {type_status}{extraction_status} '{text}'")
+        print(f"      Type: {actual_type} (expected: {expected_type})")
+        print(f"      Extract: {actual_extraction} (expected: {expected_extraction})")
+
+# ====================== UTILITY FUNCTIONS FOR CLI CRAWLER ======================
+
+def extract_judgment_ids_from_vbpl_diagram(vbpl_diagram_data) -> List[str]:
+    """Extract judgment IDs từ vbpl_diagram field - API format"""
+    judgment_ids = []
+    
+    if not vbpl_diagram_data:
+        return judgment_ids
+    
+    # Handle different input types  
+    if isinstance(vbpl_diagram_data, str):
+        try:
+            data = json.loads(vbpl_diagram_data)
+        except json.JSONDecodeError:
+            return judgment_ids
+    elif isinstance(vbpl_diagram_data, list):
+        data = vbpl_diagram_data
+    else:
+        return judgment_ids
+    
+    # Process vbpl_diagram array: [{"vbpl_diagram_name": "...", "id_judgments": "12561, 27504", "count": 2}]
+    for item in data:
+        if isinstance(item, dict) and 'id_judgments' in item:
+            id_judgments_str = str(item['id_judgments']).strip()
+            
+            if id_judgments_str:
+                # Parse comma-separated judgment IDs
+                ids = [id.strip() for id in id_judgments_str.split(',')]
+                
+                # Validate and add numeric IDs
+                for jid in ids:
+                    jid = jid.strip()
+                    if jid and jid.isdigit():
+                        judgment_ids.append(jid)
+    
+    # Remove duplicates while preserving order
+    unique_ids = []
+    for jid in judgment_ids:
+        if jid not in unique_ids:
+            unique_ids.append(jid)
+    
+    return unique_ids
+
+def extract_vbpl_relations_with_types(vbpl_diagram_data) -> List[Dict[str, str]]:
+    """Extract relations với types cho database storage"""
+    relations = []
+    
+    if not vbpl_diagram_data:
+        return relations
+    
+    # Parse input
+    if isinstance(vbpl_diagram_data, str):
+        try:
+            data = json.loads(vbpl_diagram_data)
+        except json.JSONDecodeError:
+            return relations
+    elif isinstance(vbpl_diagram_data, list):
+        data = vbpl_diagram_data
+    else:
+        return relations
+    
+    # Extract relationships
+    for item in data:
+        if isinstance(item, dict) and 'id_judgments' in item:
+            relation_name = item.get('vbpl_diagram_name', 'unknown')
+            id_judgments_str = str(item['id_judgments']).strip()
+            
+            if id_judgments_str:
+                ids = [id.strip() for id in id_judgments_str.split(',')]
+                
+                for jid in ids:
+                    jid = jid.strip()
+                    if jid and jid.isdigit():
+                        relations.append({
+                            'target_judgment_id': jid,
+                            'relation_type': relation_name
+                        })
+    
+    return relations
+
+def extract_judgment_ids_from_result(result_data: Dict) -> List[str]:
+    """Extract judgment IDs directly từ result data"""
+    if not result_data or 'document_metadata' not in result_data:
+        return []
+    
+    vbpl_diagram = result_data['document_metadata'].get('vbpl_diagram')
+    return extract_judgment_ids_from_vbpl_diagram(vbpl_diagram)
+
+def extract_relations_from_result(result_data: Dict) -> List[Dict[str, str]]:
+    """Extract relations directly từ result data"""
+    if not result_data or 'document_metadata' not in result_data:
+        return []
+    
+    vbpl_diagram = result_data['document_metadata'].get('vbpl_diagram')
+    return extract_vbpl_relations_with_types(vbpl_diagram)
+
+def get_processor_for_crawler(log_dir: str = "log_vbpl",
+                              rate_limiter: Optional[HostRateLimiter] = None,
+                              **options) -> OptimizedVBPLProcessor:
+    """Factory function cho CLI crawler - `options` override ProcessingConfig fields"""
+    config = ProcessingConfig(
+        debug_extraction=False,
+        enable_clause=True,
+        enable_point=True,
+        enable_deduplication=True,
+        log_dir=log_dir,
+        **options
+    )
+    return OptimizedVBPLProcessor(config, rate_limiter)
+
+def get_async_processor_for_crawler(log_dir: str = "log_vbpl",
+                                    rate_limiter: Optional[HostRateLimiter] = None,
+                                    max_in_flight: int = 4,
+                                    **options) -> AsyncVBPLProcessor:
+    """Factory function cho async crawl mode"""
+    processor = get_processor_for_crawler(log_dir, rate_limiter, **options)
+    return AsyncVBPLProcessor(processor.config, rate_limiter, max_in_flight)
+
+def get_staged_processor_for_crawler(log_dir: str = "log_vbpl",
+                                     rate_limiter: Optional[HostRateLimiter] = None,
+                                     cpu_workers: Optional[int] = None,
+                                     **options) -> StagedVBPLProcessor:
+    """Factory function cho pipeline mode (fetch threads + extraction process pool)"""
+    processor = get_processor_for_crawler(log_dir, rate_limiter, **options)
+    return StagedVBPLProcessor(processor.config, rate_limiter, cpu_workers)
+
+def main(judgment_id: str = None, return_data: bool = False):
+    """Main execution với support cho CLI crawler"""
+    print("🚀 Starting FIXED VBPL Processor")
+    
+    config = ProcessingConfig(
+        debug_extraction=True,
+        enable_clause=True,
+        enable_point=True,
+        enable_deduplication=True
+    )
+    
+    processor = OptimizedVBPLProcessor(config)
+    
+    judgment_id = judgment_id or "115624"
+    
+    if return_data:
+        # Mode cho CLI crawler - return data
+        success, result_data = processor.process_document(judgment_id)
+        if success:
+            print(f"✅ Document {judgment_id} processed successfully!")
+            print(f"📁 Check results in: {config.log_dir}/")
+            return True, result_data
+        else:
+            print(f"❌ Document {judgment_id} processing failed!")
+            return False, None
+    else:
+        # Mode cũ - chỉ return boolean
+        success, _ = processor.process_document(judgment_id)
+        if success:
+            print(f"✅ Document {judgment_id} processed successfully!")
+            print(f"📁 Check results in: {config.log_dir}/")
+            print("🎯 FIXED Features:")
+            print("   • ✅ Proper Number/Name/Content Separation")
+            print("   • ✅ NO Content Duplication")
+            print("   • ✅ Smart Heading Merging")
+            print("💰 Benefits: 77% Storage Reduction, 70% Faster RAG")
+        else:
+            print(f"❌ Document {judgment_id} processing failed!")
+            print(f"📁 Check logs in: {config.log_dir}/")
+
+
+if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,663 +1,2106 @@
-#!/usr/bin/env python3
-"""
-VBPL CLI Crawler - Automated Document Processing & Database Storage
-Crawl và xử lý các văn bản VBPL từ judgment_id gốc, tự động mở rộng chuỗi thông qua vbpl_diagram
-"""
-
-import os
-import sys
-import json
-import sqlite3
-import time
-import argparse
-from collections import deque
-from datetime import datetime, timedelta
-from dataclasses import dataclass
-from typing import Dict, List, Set, Optional, Tuple
-from pathlib import Path
-
-# Import từ update_vbpl_CL.py đã sửa
-try:
-    from update_vbpl_CL import (
-        get_processor_for_crawler,
-        extract_judgment_ids_from_result, 
-        extract_relations_from_result
-    )
-except ImportError as e:
-    print(f"❌ Cannot import from update_vbpl_CL.py: {e}")
-    print("📝 Make sure update_vbpl_CL.py is in the same directory and contains required functions")
-    sys.exit(1)
-
-@dataclass
-class CrawlerConfig:
-    """Configuration for VBPL Crawler"""
-    start_id: str
-    log_dir: str = "./logs"
-    db_path: str = "./vbpl.db"
-    report_path: str = "./vbpl_report.json"
-    max_workers: int = 1  # Sequential processing for stability
-    retry_attempts: int = 3
-    delay_between_requests: float = 2.0  # Rate limiting
-    enable_resume: bool = True
-    max_documents: int = 1000  # Safety limit
-    complete_scan: bool = False  # Complete discovery scan
-
-class CrawlerStats:
-    """Track crawler statistics"""
-    def __init__(self):
-        self.total_processed = 0
-        self.total_success = 0
-        self.total_failed = 0
-        self.total_skipped = 0
-        self.start_time = datetime.now()
-        self.relations_found = 0
-        self.unique_ids_discovered = 0
-
-    def to_dict(self) -> Dict:
-        duration = datetime.now() - self.start_time
-        return {
-            "total_processed": self.total_processed,
-            "total_success": self.total_success, 
-            "total_failed": self.total_failed,
-            "total_skipped": self.total_skipped,
-            "relations_found": self.relations_found,
-            "unique_ids_discovered": self.unique_ids_discovered,
-            "duration_minutes": duration.total_seconds() / 60,
-            "start_time": self.start_time.isoformat(),
-            "end_time": datetime.now().isoformat()
-        }
-
-class SQLiteDatabase:
-    """SQLite database operations for VBPL data"""
-    
-    def __init__(self, db_path: str):
-        self.db_path = db_path
-        self.init_database()
-    
-    def init_database(self):
-        """Initialize database với schema tối ưu"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Documents table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS documents (
-                    judgment_id TEXT PRIMARY KEY,
-                    judgment_number TEXT,
-                    judgment_name TEXT,
-                    full_judgment_name TEXT,
-                    date_issued TEXT,
-                    state TEXT,
-                    state_id INTEGER,
-                    doc_type TEXT,
-                    issuing_authority TEXT,
-                    s3_key TEXT,
-                    application_date TEXT,
-                    expiration_date TEXT,
-                    expiration_date_not_applicable BOOLEAN,
-                    type_document TEXT,
-                    sector TEXT,
-                    processing_timestamp TEXT,
-                    total_sections INTEGER,
-                    total_clauses INTEGER,
-                    total_points INTEGER,
-                    processing_status TEXT DEFAULT 'completed',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Elements table - tất cả structural elements
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS elements (
-                    element_id TEXT PRIMARY KEY,
-                    judgment_id TEXT NOT NULL,
-                    element_type TEXT NOT NULL,
-                    element_number TEXT,
-                    element_name TEXT,
-                    element_content TEXT,
-                    tag_id TEXT,
-                    immediate_parent_id TEXT,
-                    immediate_parent_type TEXT,
-                    level INTEGER,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    
-                    FOREIGN KEY (judgment_id) REFERENCES documents(judgment_id),
-                    FOREIGN KEY (immediate_parent_id) REFERENCES elements(element_id)
-                )
-            """)
-            
-            # Relations table với relationship types
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS vbpl_relations (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    source_judgment_id TEXT NOT NULL,
-                    target_judgment_id TEXT NOT NULL,
-                    relation_type TEXT NOT NULL,
-                    relation_name TEXT,
-                    discovered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    
-                    FOREIGN KEY (source_judgment_id) REFERENCES documents(judgment_id),
-                    FOREIGN KEY (target_judgment_id) REFERENCES documents(judgment_id),
-                    
-                    UNIQUE(source_judgment_id, target_judgment_id, relation_type)
-                )
-            """)
-            
-            # Processing queue table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS processing_queue (
-                    judgment_id TEXT PRIMARY KEY,
-                    status TEXT DEFAULT 'pending',
-                    priority INTEGER DEFAULT 0,
-                    attempts INTEGER DEFAULT 0,
-                    last_attempt_at TIMESTAMP,
-                    error_message TEXT,
-                    added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    completed_at TIMESTAMP
-                )
-            """)
-            
-            # Create indexes
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_elements_judgment_id ON elements(judgment_id)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_elements_type ON elements(element_type)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_elements_parent ON elements(immediate_parent_id)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_relations_source ON vbpl_relations(source_judgment_id)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_relations_target ON vbpl_relations(target_judgment_id)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_relations_type ON vbpl_relations(relation_type)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_queue_status ON processing_queue(status)")
-            
-            conn.commit()
-    
-    def document_exists(self, judgment_id: str) -> bool:
-        """Check if document đã xử lý"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1 FROM documents WHERE judgment_id = ?", (judgment_id,))
-            return cursor.fetchone() is not None
-    
-    def insert_document(self, judgment_id: str, metadata: Dict):
-        """Insert document metadata"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Prepare data
-            data = {
-                'judgment_id': judgment_id,
-                'judgment_number': metadata.get('judgment_number'),
-                'judgment_name': metadata.get('judgment_name'),
-                'full_judgment_name': metadata.get('full_judgment_name'),
-                'date_issued': metadata.get('date_issued'),
-                'state': metadata.get('state'),
-                'state_id': metadata.get('state_id'),
-                'doc_type': metadata.get('doc_type'),
-                'issuing_authority': metadata.get('issuing_authority'),
-                's3_key': metadata.get('s3_key'),
-                'application_date': metadata.get('application_date'),
-                'expiration_date': metadata.get('expiration_date'),
-                'expiration_date_not_applicable': metadata.get('expiration_date_not_applicable'),
-                'type_document': metadata.get('type_document'),
-                'sector': metadata.get('sector'),
-                'processing_timestamp': datetime.now().isoformat()
-            }
-            
-            cursor.execute("""
-                INSERT OR REPLACE INTO documents 
-                (judgment_id, judgment_number, judgment_name, full_judgment_name, 
-                 date_issued, state, state_id, doc_type, issuing_authority, s3_key,
-                 application_date, expiration_date, expiration_date_not_applicable,
-                 type_document, sector, processing_timestamp)
-                VALUES 
-                (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                data['judgment_id'], data['judgment_number'], data['judgment_name'],
-                data['full_judgment_name'], data['date_issued'], data['state'], 
-                data['state_id'], data['doc_type'], data['issuing_authority'],
-                data['s3_key'], data['application_date'], data['expiration_date'],
-                data['expiration_date_not_applicable'], data['type_document'],
-                data['sector'], data['processing_timestamp']
-            ))
-            
-            conn.commit()
-    
-    def insert_element(self, judgment_id: str, element_type: str, element: Dict):
-        """Insert structural element"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Map element fields based on type
-            field_mapping = {
-                'vbpl_big_part': ('vbpl_big_part_id', 'big_part_number', 'big_part_name', 'big_part_content'),
-                'vbpl_chapter': ('vbpl_chapter_id', 'chapter_number', 'chapter_name', 'chapter_content'),
-                'vbpl_part': ('vbpl_part_id', 'part_number', 'part_name', 'part_content'),
-                'vbpl_mini_part': ('vbpl_mini_part_id', 'mini_part_number', 'mini_part_name', 'mini_part_content'),
-                'vbpl_section': ('vbpl_section_id', 'section_number', 'section_name', 'section_content'),
-                'vbpl_clause': ('vbpl_clause_id', 'clause_number', 'clause_name', 'clause_content'),
-                'vbpl_point': ('vbpl_point_id', 'point_number', 'point_name', 'point_content')
-            }
-            
-            if element_type not in field_mapping:
-                return
-            
-            id_field, number_field, name_field, content_field = field_mapping[element_type]
-            
-            # Get level from element type
-            level_mapping = {
-                'vbpl_big_part': 1, 'vbpl_chapter': 2, 'vbpl_part': 3, 
-                'vbpl_mini_part': 4, 'vbpl_section': 5, 'vbpl_clause': 6, 'vbpl_point': 7
-            }
-            
-            cursor.execute("""
-                INSERT OR REPLACE INTO elements 
-                (element_id, judgment_id, element_type, element_number, element_name, 
-                 element_content, tag_id, immediate_parent_id, immediate_parent_type, level)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                element.get(id_field),
-                judgment_id,
-                element_type,
-                element.get(number_field),
-                element.get(name_field),
-                element.get(content_field),
-                element.get('tag_id'),
-                element.get('immediate_parent_id'),
-                element.get('immediate_parent_type'),
-                level_mapping[element_type]
-            ))
-            
-            conn.commit()
-    
-    def insert_relation(self, source_judgment_id: str, target_judgment_id: str, relation_type: str):
-        """Insert relationship between documents"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                INSERT OR IGNORE INTO vbpl_relations 
-                (source_judgment_id, target_judgment_id, relation_type, relation_name)
-                VALUES (?, ?, ?, ?)
-            """, (source_judgment_id, target_judgment_id, relation_type, relation_type))
-            
-            conn.commit()
-    
-    def get_stats(self) -> Dict:
-        """Get database statistics"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            stats = {}
-            
-            # Document counts
-            cursor.execute("SELECT COUNT(*) FROM documents")
-            stats['total_documents'] = cursor.fetchone()[0]
-            
-            # Element counts by type
-            cursor.execute("""
-                SELECT element_type, COUNT(*) 
-                FROM elements 
-                GROUP BY element_type
-            """)
-            stats['elements_by_type'] = dict(cursor.fetchall())
-            
-            # Relation counts
-            cursor.execute("SELECT COUNT(*) FROM vbpl_relations")
-            stats['total_relations'] = cursor.fetchone()[0]
-            
-            cursor.execute("""
-                SELECT relation_type, COUNT(*) 
-                FROM vbpl_relations 
-                GROUP BY relation_type
-            """)
-            stats['relations_by_type'] = dict(cursor.fetchall())
-            
-            return stats
-
-class VBPLCrawler:
-    """Main VBPL Crawler với queue-based processing"""
-    
-    def __init__(self, config: CrawlerConfig):
-        self.config = config
-        self.db = SQLiteDatabase(config.db_path)
-        self.processor = get_processor_for_crawler(config.log_dir)
-        self.queue = deque([config.start_id])
-        self.processed: Set[str] = set()
-        self.failed: Set[str] = set()
-        self.stats = CrawlerStats()
-        
-        # Setup logging directory
-        Path(config.log_dir).mkdir(parents=True, exist_ok=True)
-        if os.path.exists(config.db_path):
-            self.get_database_summary()
-        
-        print(f"🚀 VBPL Crawler initialized")
-        print(f"📊 Database: {config.db_path}")
-        print(f"📁 Logs: {config.log_dir}")
-        print(f"🎯 Starting from: {config.start_id}")
-    
-    def should_skip(self, judgment_id: str) -> bool:
-        """Check if document should be skipped"""
-        if judgment_id in self.processed:
-            return True
-        
-        if judgment_id in self.failed:
-            return True
-        
-        if self.db.document_exists(judgment_id):
-            print(f"⚠️  Đã có: {judgment_id}, bỏ qua")
-            self.stats.total_skipped += 1
-            self.processed.add(judgment_id)
-            return True
-        
-        return False
-    
-    def process_document(self, judgment_id: str) -> bool:
-        """Process single document với error handling"""
-        print(f"🔄 Đang xử lý: {judgment_id}")
-        
-        try:
-            # Call processor với return data
-            success, result_data = self.processor.process_document(judgment_id)
-            
-            if success and result_data:
-                # Save to database
-                self.save_to_database(judgment_id, result_data)
-                
-                # Extract và queue related IDs
-                related_ids = extract_judgment_ids_from_result(result_data)
-                self.queue_related_ids(related_ids)
-                
-                print(f"✅ Đã xử lý và lưu: {judgment_id}")
-                if related_ids:
-                    print(f"📎 Tìm thấy {len(related_ids)} liên kết")
-                    
-                self.stats.total_success += 1
-                self.stats.relations_found += len(related_ids)
-                return True
-            else:
-                print(f"❌ Lỗi xử lý: {judgment_id}")
-                self.stats.total_failed += 1
-                self.failed.add(judgment_id)
-                return False
-                
-        except Exception as e:
-            print(f"❌ Exception: {judgment_id} - {e}")
-            self.stats.total_failed += 1
-            self.failed.add(judgment_id)
-            return False
-    
-    def save_to_database(self, judgment_id: str, result_data: Dict):
-        """Save processed data to SQLite"""
-        try:
-            # Extract metadata và structure data
-            metadata = result_data.get('document_metadata', {})
-            structure_data = result_data.get('structure_data', {})
-            
-            # Save document
-            self.db.insert_document(judgment_id, metadata)
-            
-            # Save elements
-            total_elements = 0
-            for element_type, elements in structure_data.items():
-                for element in elements:
-                    self.db.insert_element(judgment_id, element_type, element)
-                    total_elements += 1
-            
-            # Save relations từ vbpl_diagram
-            relations = extract_relations_from_result(result_data)
-            for relation in relations:
-                self.db.insert_relation(
-                    judgment_id, 
-                    relation['target_judgment_id'],
-                    relation['relation_type']
-                )
-            
-            print(f"💾 Lưu DB: {total_elements} elements, {len(relations)} relations")
-            
-        except Exception as e:
-            print(f"⚠️  Lỗi lưu DB cho {judgment_id}: {e}")
-            raise
-    
-    def queue_related_ids(self, related_ids: List[str]):
-        """Add related IDs to processing queue"""
-        new_ids = 0
-        for related_id in related_ids:
-            if (related_id not in self.processed and 
-                related_id not in self.queue and 
-                related_id not in self.failed):
-                self.queue.append(related_id)
-                new_ids += 1
-                print(f"📎 Queue: {related_id}")
-        
-        if new_ids > 0:
-            self.stats.unique_ids_discovered += new_ids
-    def load_unprocessed_queue(self):
-        """Load unprocessed related documents vào queue"""
-        with sqlite3.connect(self.config.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Get all target IDs chưa được processed
-            cursor.execute("""
-                SELECT DISTINCT target_judgment_id 
-                FROM vbpl_relations 
-                WHERE target_judgment_id NOT IN (
-                    SELECT judgment_id FROM documents
-                )
-                ORDER BY target_judgment_id
-            """)
-            
-            unprocessed_ids = [row[0] for row in cursor.fetchall()]
-            
-            # Add to queue
-            for judgment_id in unprocessed_ids:
-                if judgment_id not in self.queue:
-                    self.queue.append(judgment_id)
-            
-            print(f"📥 Loaded {len(unprocessed_ids)} unprocessed IDs from database")
-            return len(unprocessed_ids)
-
-    def get_database_summary(self):
-        """Get database summary for debugging"""
-        with sqlite3.connect(self.config.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Total stats
-            cursor.execute("SELECT COUNT(*) FROM documents")
-            total_docs = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(DISTINCT target_judgment_id) FROM vbpl_relations")
-            total_targets = cursor.fetchone()[0]
-            
-            cursor.execute("""
-                SELECT COUNT(DISTINCT target_judgment_id) 
-                FROM vbpl_relations 
-                WHERE target_judgment_id NOT IN (SELECT judgment_id FROM documents)
-            """)
-            unprocessed = cursor.fetchone()[0]
-            
-            print(f"📊 Database Summary:")
-            print(f"   📄 Processed docs: {total_docs}")
-            print(f"   🎯 Total targets discovered: {total_targets}")
-            print(f"   ⏳ Unprocessed targets: {unprocessed}")
-            if total_targets > 0:
-                print(f"   📈 Coverage: {(total_docs/total_targets*100):.1f}%")
-            
-            return {
-                'processed': total_docs,
-                'total_targets': total_targets, 
-                'unprocessed': unprocessed
-            }
-    
-    def run(self):
-        """Main crawler loop với comprehensive discovery"""
-        print(f"\n🚀 Bắt đầu crawling từ ID: {self.config.start_id}")
-        print(f"📊 Giới hạn: {self.config.max_documents} documents")
-        print("-" * 60)
-        
-        # Complete discovery scan if requested
-        if hasattr(self.config, 'complete_scan') and self.config.complete_scan and os.path.exists(self.config.db_path):
-            new_discoveries = self.complete_discovery_scan()
-            if new_discoveries > 0:
-                print(f"🎯 Found {new_discoveries} additional documents to process")
-        
-        # Auto-resume logic
-        if self.db.document_exists(self.config.start_id):
-            print(f"⚠️  Start ID {self.config.start_id} đã processed, loading unprocessed queue...")
-            loaded = self.load_unprocessed_queue()
-            if loaded == 0 and len(self.queue) == 0:
-                print("✅ Tất cả related documents đã được processed!")
-                print("🎯 Try với start ID khác để discover thêm documents")
-                self.generate_report()
-                self.print_final_stats()
-                return
-        
-        while self.queue and self.stats.total_processed < self.config.max_documents:
-            judgment_id = self.queue.popleft()
-            
-            if self.should_skip(judgment_id):
-                continue
-            
-            # Rate limiting
-            if self.stats.total_processed > 0:
-                time.sleep(self.config.delay_between_requests)
-            
-            # Process document
-            self.process_document(judgment_id)
-            self.processed.add(judgment_id)
-            self.stats.total_processed += 1
-            
-            # Progress update
-            if self.stats.total_processed % 5 == 0:
-                self.print_progress()
-        
-        # Final results
-        self.generate_report()
-        print(f"\n🎉 Crawler hoàn thành!")
-        self.print_final_stats()
-    
-    def print_progress(self):
-        """Print progress summary"""
-        print(f"\n📊 Tiến độ:")
-        print(f"   ✅ Thành công: {self.stats.total_success}")
-        print(f"   ❌ Thất bại: {self.stats.total_failed}")
-        print(f"   ⚠️  Đã có: {self.stats.total_skipped}")
-        print(f"   📎 Queue còn: {len(self.queue)}")
-        print(f"   🔗 Relations: {self.stats.relations_found}")
-    
-    def print_final_stats(self):
-        """Print final statistics"""
-        db_stats = self.db.get_stats()
-        print(f"\n📊 Thống kê cuối:")
-        print(f"   📄 Documents: {db_stats['total_documents']}")
-        print(f"   🧱 Elements: {sum(db_stats['elements_by_type'].values())}")
-        print(f"   🔗 Relations: {db_stats['total_relations']}")
-        print(f"   ⏱️  Thời gian: {(datetime.now() - self.stats.start_time).total_seconds():.1f}s")
-        print(f"   💾 Database: {self.config.db_path}")
-    
-    def generate_report(self):
-        """Generate final JSON report"""
-        report = {
-            "crawler_stats": self.stats.to_dict(),
-            "database_stats": self.db.get_stats(),
-            "config": {
-                "start_id": self.config.start_id,
-                "max_documents": self.config.max_documents,
-                "db_path": self.config.db_path
-            },
-            "failed_ids": list(self.failed) if self.failed else [],
-            "queue_remaining": list(self.queue) if self.queue else []
-        }
-        
-        try:
-            with open(self.config.report_path, 'w', encoding='utf-8') as f:
-                json.dump(report, f, ensure_ascii=False, indent=2)
-            print(f"📄 Report saved: {self.config.report_path}")
-        except Exception as e:
-            print(f"⚠️  Cannot save report: {e}")
-
-    def complete_discovery_scan(self):
-        """Comprehensive scan để ensure không miss relations"""
-        print("🔍 Starting complete discovery scan...")
-        
-        with sqlite3.connect(self.config.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Get ALL processed documents
-            cursor.execute("SELECT judgment_id FROM documents")
-            processed_docs = [row[0] for row in cursor.fetchall()]
-            
-            new_discoveries = 0
-            total_new_relations = 0
-            
-            for doc_id in processed_docs:
-                print(f"🔍 Re-scanning: {doc_id}")
-                
-                # Re-read vbpl_diagram từ processed files
-                complete_file = os.path.join(self.config.log_dir, f"optimized_complete_{doc_id}.json")
-                
-                if os.path.exists(complete_file):
-                    try:
-                        with open(complete_file, 'r', encoding='utf-8') as f:
-                            result_data = json.load(f)
-                        
-                        # Extract relations again
-                        relations = extract_relations_from_result(result_data)
-                        
-                        for relation in relations:
-                            target_id = relation['target_judgment_id']
-                            
-                            # Check if this target is new (not in documents and not in current queue)
-                            cursor.execute("SELECT 1 FROM documents WHERE judgment_id = ?", (target_id,))
-                            if not cursor.fetchone() and target_id not in self.queue:
-                                self.queue.append(target_id)
-                                new_discoveries += 1
-                                print(f"📎 New discovery: {target_id}")
-                            
-                            # Re-insert relation (INSERT OR IGNORE will handle duplicates)
-                            self.db.insert_relation(doc_id, target_id, relation['relation_type'])
-                            total_new_relations += 1
-                    
-                    except Exception as e:
-                        print(f"⚠️  Error re-scanning {doc_id}: {e}")
-            
-            print(f"🔍 Discovery scan complete:")
-            print(f"   📎 New documents found: {new_discoveries}")
-            print(f"   🔗 Relations re-verified: {total_new_relations}")
-            
-            return new_discoveries
-
-def main():
-    """CLI entry point"""
-    parser = argparse.ArgumentParser(description="VBPL Document Crawler")
-    parser.add_argument("start_id", help="Starting judgment ID")
-    parser.add_argument("--log-dir", default="./logs", help="Log directory")
-    parser.add_argument("--db-path", default="./vbpl.db", help="SQLite database path")  
-    parser.add_argument("--report-path", default="./vbpl_report.json", help="Report output path")
-    parser.add_argument("--max-docs", type=int, default=100, help="Maximum documents to process")
-    parser.add_argument("--delay", type=float, default=2.0, help="Delay between requests (seconds)")
-    parser.add_argument("--complete-scan", action="store_true", help="Do complete discovery scan before resume")
-    
-    args = parser.parse_args()
-    
-    # Create configuration
-    config = CrawlerConfig(
-        start_id=args.start_id,
-        log_dir=args.log_dir,
-        db_path=args.db_path,
-        report_path=args.report_path,
-        max_documents=args.max_docs,
-        delay_between_requests=args.delay,
-        complete_scan=args.complete_scan
-    )
-    
-    # Run crawler
-    crawler = VBPLCrawler(config)
-    try:
-        crawler.run()
-    except KeyboardInterrupt:
-        print(f"\n⏹️  Crawler stopped by user")
-        crawler.generate_report()
-        crawler.print_final_stats()
-    except Exception as e:
-        print(f"\n❌ Crawler error: {e}")
-        crawler.generate_report()
-if __name__ == "__main__":
+#!/usr/bin/env python3
+"""
+VBPL CLI Crawler - Automated Document Processing & Database Storage
+Crawl và xử lý các văn bản VBPL từ judgment_id gốc, tự động mở rộng chuỗi thông qua vbpl_diagram
+"""
+
+import os
+import sys
+import json
+import math
+import hashlib
+import sqlite3
+import time
+import queue
+import socket
+import argparse
+import asyncio
+import heapq
+import threading
+import unicodedata
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta
+from dataclasses import dataclass
+from typing import Dict, List, Set, Optional, Tuple, Iterable, Iterator
+from pathlib import Path
+
+# Import từ update_vbpl_CL.py đã sửa
+try:
+    from update_vbpl_CL import (
+        get_processor_for_crawler,
+        get_async_processor_for_crawler,
+        get_staged_processor_for_crawler,
+        extract_relations_from_result,
+        extract_vbpl_relations_with_types,
+        get_http_client,
+        HostRateLimiter,
+        LEXCENTRA_BASE_URL,
+        api_host
+    )
+except ImportError as e:
+    print(f"❌ Cannot import from update_vbpl_CL.py: {e}")
+    print("📝 Make sure update_vbpl_CL.py is in the same directory and contains required functions")
+    sys.exit(1)
+
+from vbpl_shards import ShardRouter, open_coordination_store, parse_shard
+from vbpl_metrics import CrawlerMetrics, MetricsFileWriter, start_metrics_server
+
+@dataclass
+class CrawlerConfig:
+    """Configuration for VBPL Crawler"""
+    start_id: str
+    log_dir: str = "./logs"
+    db_path: str = "./vbpl.db"
+    report_path: str = "./vbpl_report.json"
+    max_workers: int = 1  # 1 = sequential, >1 = worker pool
+    retry_attempts: int = 3  # per HTTP request (jittered backoff) and per document in the durable queue
+    retry_backoff: float = 1.0
+    adaptive: bool = False  # AIMD per-host concurrency instead of a fixed --delay
+    pipeline: bool = False  # fetch threads -> extraction process pool -> DB writer
+    cpu_workers: int = 0  # extraction processes in pipeline mode, 0 = os.cpu_count()
+    shard: Optional[Tuple[int, int]] = None  # (k, N): only crawl IDs with shard_of(id, N) == k
+    coord_store: str = "./vbpl_coord.db"  # SQLite path or postgres:// DSN shared by all shards
+    shard_idle_timeout: float = 30.0  # seconds an idle shard waits for forwarded IDs before finishing
+    priority: bool = False  # best-first frontier scored by relation type, depth and doc type
+    max_depth: Optional[int] = None  # hops from start_id, None = unlimited
+    relation_allowlist: Optional[List[str]] = None  # follow only relation types containing one of these keywords
+    delay_between_requests: float = 2.0  # Rate limiting
+    api_rate: Optional[float] = None  # requests/sec to lexcentra API, None = 1/delay
+    api_base_url: str = LEXCENTRA_BASE_URL  # point at vbpl_mock_server.py for load tests
+    html_rate: Optional[float] = None  # requests/sec per S3 HTML host, None = 1/delay
+    async_mode: bool = False  # asyncio engine với pipelined API/S3 fetches
+    connect_timeout: float = 10.0
+    read_timeout: float = 30.0
+    writer_queue_size: int = 32  # documents chờ ghi trước khi fetch workers bị chặn
+    writer_batch_size: int = 8  # documents per commit
+    durable_queue: bool = False  # frontier trong bảng processing_queue thay vì deque
+    lease_seconds: float = 300.0
+    reset_leases: bool = False
+    bloom_capacity: int = 0  # >0: seen-set là Bloom filter cỡ này thay vì set()
+    bloom_fp_rate: float = 0.001
+    cache_dir: Optional[str] = None  # on-disk HTTP cache (ETag/Last-Modified revalidation)
+    cache_api_ttl: float = 86400.0
+    cache_html_ttl: float = 30 * 86400.0
+    offline: bool = False  # replay from cache_dir only
+    incremental: bool = False  # re-check stored documents, re-extract only those whose hashes changed
+    metrics_port: Optional[int] = None  # serve Prometheus /metrics on 127.0.0.1:port
+    metrics_file: Optional[str] = None  # or rewrite a Prometheus text file every metrics_interval seconds
+    metrics_interval: float = 10.0
+    profile_docs: Tuple[str, ...] = ()  # judgment IDs to extract under cProfile
+    profile_sample_rate: float = 0.0  # fraction of other documents to profile
+    clean_cache_size: int = 32768  # clean_text LRU entries per process, 0 = disabled
+    clean_cache_shared: bool = False  # pipeline mode: share long cleaned strings between extraction processes
+    enable_resume: bool = True
+    max_documents: int = 1000  # Safety limit
+    complete_scan: bool = False  # Complete discovery scan
+    
+    def __post_init__(self):
+        # Shard inbox IDs are acknowledged once stored in the local frontier, so it has to survive a crash
+        if self.shard:
+            self.durable_queue = True
+
+def shorter_depth(current: Optional[int], depth: Optional[int]) -> Optional[int]:
+    """Min hop distance; None = chưa biết, mọi depth đã biết đều thắng None"""
+    if current is None:
+        return depth
+    if depth is None:
+        return current
+    return min(current, depth)
+
+class CrawlFrontier:
+    """FIFO frontier với O(1) membership: deque cho thứ tự, dict ID -> depth cho dedup.
+    Một ID được thấy lại qua đường ngắn hơn giữ depth nhỏ nhất."""
+    
+    def __init__(self, judgment_ids: Iterable[str] = (), depth: Optional[int] = None):
+        self._order: deque = deque()
+        self._members: Dict[str, Optional[int]] = {}
+        self.extend(judgment_ids, depth=depth)
+    
+    def append(self, judgment_id: str, depth: Optional[int] = None) -> bool:
+        """Add an ID unless already queued, return True if added"""
+        if judgment_id in self._members:
+            self._members[judgment_id] = shorter_depth(self._members[judgment_id], depth)
+            return False
+        self._members[judgment_id] = depth
+        self._order.append(judgment_id)
+        return True
+    
+    def extend(self, judgment_ids: Iterable[str], depth: Optional[int] = None) -> int:
+        return sum(1 for judgment_id in judgment_ids if self.append(judgment_id, depth))
+    
+    def popleft_entry(self) -> Tuple[str, Optional[int]]:
+        """(judgment_id, depth) of the oldest ID"""
+        judgment_id = self._order.popleft()
+        return judgment_id, self._members.pop(judgment_id)
+    
+    def popleft(self) -> str:
+        return self.popleft_entry()[0]
+    
+    def __contains__(self, judgment_id: str) -> bool:
+        return judgment_id in self._members
+    
+    def __len__(self) -> int:
+        return len(self._order)
+    
+    def __iter__(self):
+        return iter(self._order)
+
+# Relation type keyword -> weight, checked in order (first match wins) against vbpl_diagram_name
+RELATION_WEIGHTS = [
+    ("thay thế", 10.0),
+    ("hướng dẫn", 9.0),
+    ("sửa đổi", 9.0),
+    ("bổ sung", 8.0),
+    ("hợp nhất", 7.0),
+    ("đính chính", 6.0),
+    ("hết hiệu lực", 5.0),
+    ("đình chỉ", 5.0),
+    ("căn cứ", 4.0),
+    ("dẫn chiếu", 3.0),
+    ("liên quan", 2.0),
+]
+DEFAULT_RELATION_WEIGHT = 1.0
+
+# Loại văn bản của document nguồn -> hệ số (proxy cho loại của target, chưa biết khi xếp hàng)
+DOC_TYPE_WEIGHTS = [
+    ("bộ luật", 1.5),
+    ("luật", 1.5),
+    ("pháp lệnh", 1.4),
+    ("nghị quyết", 1.3),
+    ("nghị định", 1.3),
+    ("thông tư", 1.1),
+    ("quyết định", 1.0),
+]
+DEFAULT_DOC_TYPE_WEIGHT = 0.8
+DEPTH_DECAY = 0.6
+
+def _normalize_keyword(text: Optional[str]) -> str:
+    return unicodedata.normalize("NFC", text or "").lower()
+
+def relation_matches(relation_type: str, keywords: List[str]) -> bool:
+    """Relation allowlist: relation_type chứa một trong các keywords (không phân biệt hoa thường)"""
+    relation_type = _normalize_keyword(relation_type)
+    return any(_normalize_keyword(keyword) in relation_type for keyword in keywords)
+
+def score_relation(relation_type: str, depth: Optional[int], source_doc_type: Optional[str] = None) -> float:
+    """Best-first priority: relation weight x doc type weight x DEPTH_DECAY^depth.
+    depth None (hop distance chưa biết) cho score 0: xếp sau mọi ID có depth"""
+    if depth is None:
+        return 0.0
+    relation_type = _normalize_keyword(relation_type)
+    relation_weight = next((weight for keyword, weight in RELATION_WEIGHTS if keyword in relation_type),
+                           DEFAULT_RELATION_WEIGHT)
+    doc_type = _normalize_keyword(source_doc_type)
+    doc_type_weight = next((weight for keyword, weight in DOC_TYPE_WEIGHTS if doc_type.startswith(keyword)),
+                           DEFAULT_DOC_TYPE_WEIGHT)
+    return relation_weight * doc_type_weight * DEPTH_DECAY ** depth
+
+class PriorityFrontier:
+    """Best-first frontier: heap theo score, ID được thấy lại với score cao hơn thì được nâng hạng
+    (entry cũ bị bỏ qua khi pop). Cùng interface với CrawlFrontier."""
+    
+    def __init__(self, judgment_ids: Iterable[str] = (), depth: Optional[int] = None):
+        self._heap: List[Tuple[float, int, str]] = []
+        self._scores: Dict[str, float] = {}
+        self._depths: Dict[str, Optional[int]] = {}
+        self._counter = 0
+        self.extend(judgment_ids, depth=depth)
+    
+    def append(self, judgment_id: str, priority: float = 0.0, depth: Optional[int] = None) -> bool:
+        """Queue or raise the priority of an ID (keeping its smallest depth), return True if the frontier changed"""
+        current = self._scores.get(judgment_id)
+        if current is not None:
+            self._depths[judgment_id] = shorter_depth(self._depths[judgment_id], depth)
+            if current >= priority:
+                return False
+        else:
+            self._depths[judgment_id] = depth
+        self._scores[judgment_id] = priority
+        self._counter += 1
+        heapq.heappush(self._heap, (-priority, self._counter, judgment_id))
+        return True
+    
+    def extend(self, judgment_ids: Iterable[str], priority: float = 0.0, depth: Optional[int] = None) -> int:
+        return sum(1 for judgment_id in judgment_ids if self.append(judgment_id, priority, depth))
+    
+    def popleft_entry(self) -> Tuple[str, Optional[int]]:
+        """(judgment_id, depth) of the highest-score ID (FIFO among equal scores)"""
+        while self._heap:
+            neg_priority, _, judgment_id = heapq.heappop(self._heap)
+            if self._scores.get(judgment_id) == -neg_priority:
+                del self._scores[judgment_id]
+                return judgment_id, self._depths.pop(judgment_id)
+        raise IndexError("pop from an empty frontier")
+    
+    def popleft(self) -> str:
+        return self.popleft_entry()[0]
+    
+    def __contains__(self, judgment_id: str) -> bool:
+        return judgment_id in self._scores
+    
+    def __len__(self) -> int:
+        return len(self._scores)
+    
+    def __iter__(self):
+        return iter(sorted(self._scores, key=lambda judgment_id: -self._scores[judgment_id]))
+
+class BloomFilter:
+    """Compact seen-set: no false negatives, about `fp_rate` false positives at `capacity` items"""
+    
+    def __init__(self, capacity: int, fp_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(fp_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+    
+    def _positions(self, item: str):
+        # Double hashing (Kirsch-Mitzenmacher) from one 128-bit digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+    
+    def add(self, item: str) -> bool:
+        """Set the item's bits, return True if it was (probably) new"""
+        added = False
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                added = True
+        if added:
+            self.count += 1
+        return added
+    
+    def __contains__(self, item: str) -> bool:
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                return False
+        return True
+    
+    def __len__(self) -> int:
+        return self.count
+
+class SeenSet:
+    """set-compatible wrapper over BloomFilter; discard() is kept exact by a small removal set"""
+    
+    def __init__(self, capacity: int, fp_rate: float = 0.001):
+        self.bloom = BloomFilter(capacity, fp_rate)
+        self.removed: Set[str] = set()
+    
+    def add(self, judgment_id: str):
+        self.removed.discard(judgment_id)
+        self.bloom.add(judgment_id)
+    
+    def discard(self, judgment_id: str):
+        if judgment_id in self.bloom:
+            self.removed.add(judgment_id)
+    
+    def __contains__(self, judgment_id: str) -> bool:
+        return judgment_id not in self.removed and judgment_id in self.bloom
+    
+    def __len__(self) -> int:
+        return max(0, len(self.bloom) - len(self.removed))
+
+class StoredDocumentIndex:
+    """Index of document IDs in the documents table for bounded-memory crawls: a BloomFilter seeded by
+    streaming the table, positives confirmed by a primary-key lookup so membership stays exact.
+    add()/update() mirror the set the crawler uses without --bloom-capacity."""
+    
+    def __init__(self, db: "SQLiteDatabase", capacity: int, fp_rate: float = 0.001):
+        self.db = db
+        self.bloom = BloomFilter(max(capacity, db.document_count()), fp_rate)
+        for judgment_id in db.iter_document_ids():
+            self.bloom.add(judgment_id)
+    
+    def add(self, judgment_id: str):
+        self.bloom.add(judgment_id)
+    
+    def update(self, judgment_ids: Iterable[str]):
+        for judgment_id in judgment_ids:
+            self.bloom.add(judgment_id)
+    
+    def __contains__(self, judgment_id: str) -> bool:
+        return judgment_id in self.bloom and self.db.document_exists(judgment_id)
+    
+    def __len__(self) -> int:
+        return len(self.bloom)
+
+class CrawlerStats:
+    """Track crawler statistics"""
+    def __init__(self):
+        self.total_processed = 0
+        self.total_success = 0
+        self.total_failed = 0
+        self.total_skipped = 0
+        self.total_unchanged = 0
+        self.start_time = datetime.now()
+        self.relations_found = 0
+        self.unique_ids_discovered = 0
+        self.worker_stats: Dict[str, Dict] = {}
+        self.writer_stats: Dict = {}
+        self.profiles: List[Dict] = []  # (judgment_id, stage_timings, profile summary) of profiled documents
+        self.clean_text_cache = {"hits": 0, "shared_hits": 0, "misses": 0}
+        self.shared_clean_text_cache: Dict = {}  # manager-side counters, pipeline mode with --clean-cache-shared
+
+    def record_worker(self, worker_name: str, success: bool, elapsed: float):
+        """Track throughput per worker thread"""
+        worker = self.worker_stats.setdefault(worker_name, {
+            "documents": 0, "success": 0, "failed": 0, "busy_seconds": 0.0
+        })
+        worker["documents"] += 1
+        worker["success" if success else "failed"] += 1
+        worker["busy_seconds"] += elapsed
+
+    def worker_throughput(self) -> Dict[str, Dict]:
+        """Per-worker docs/min, tính trên tổng thời gian chạy và thời gian bận"""
+        duration_minutes = max((datetime.now() - self.start_time).total_seconds() / 60, 1e-9)
+        throughput = {}
+        for name, worker in sorted(self.worker_stats.items()):
+            busy_minutes = worker["busy_seconds"] / 60
+            throughput[name] = {
+                **worker,
+                "docs_per_minute": worker["documents"] / duration_minutes,
+                "docs_per_busy_minute": worker["documents"] / busy_minutes if busy_minutes > 0 else 0.0
+            }
+        return throughput
+
+    def record_profile(self, judgment_id: str, result_data: Dict):
+        """Keep the per-document profile summary (fetch stages included) for the run-level report"""
+        profile = result_data.get("profile")
+        if profile:
+            self.profiles.append({**profile, "stage_timings": result_data.get("stage_timings") or profile["stage_timings"]})
+    
+    def record_clean_text_cache(self, result_data: Dict):
+        """Cộng dồn hit/miss của clean_text cache mà processor (có thể ở process khác) trả về cho document"""
+        for event, count in (result_data.get("clean_text_cache") or {}).items():
+            self.clean_text_cache[event] = self.clean_text_cache.get(event, 0) + count
+    
+    def clean_text_cache_report(self) -> Dict:
+        lookups = sum(self.clean_text_cache.values())
+        hits = self.clean_text_cache["hits"] + self.clean_text_cache["shared_hits"]
+        return {**self.clean_text_cache, "hit_rate": hits / lookups if lookups else 0.0,
+                "shared": self.shared_clean_text_cache or None}
+    
+    def profile_report(self, top_n: int = 10) -> Optional[Dict]:
+        """Slowest stages, hotspot functions và documents trên các document đã profile"""
+        if not self.profiles:
+            return None
+        stages: Dict[str, Dict] = {}
+        hotspots: Dict[str, Dict] = {}
+        for profile in self.profiles:
+            for stage, seconds in profile["stage_timings"].items():
+                stage_stats = stages.setdefault(stage, {"documents": 0, "total_seconds": 0.0, "max_seconds": 0.0,
+                                                        "slowest_document": None})
+                stage_stats["documents"] += 1
+                stage_stats["total_seconds"] += seconds
+                if seconds > stage_stats["max_seconds"]:
+                    stage_stats["max_seconds"] = seconds
+                    stage_stats["slowest_document"] = profile["judgment_id"]
+            for name, hotspot in profile["hotspots"].items():
+                total = hotspots.setdefault(name, {"calls": 0, "tottime": 0.0, "cumtime": 0.0})
+                for key in total:
+                    total[key] += hotspot[key]
+        
+        for stage_stats in stages.values():
+            stage_stats["mean_seconds"] = stage_stats["total_seconds"] / stage_stats["documents"]
+        slowest = sorted(self.profiles, key=lambda profile: sum(profile["stage_timings"].values()), reverse=True)
+        return {
+            "profiled_documents": len(self.profiles),
+            "slowest_stages": dict(sorted(stages.items(), key=lambda item: item[1]["total_seconds"], reverse=True)),
+            "hotspots": dict(sorted(hotspots.items(), key=lambda item: item[1]["cumtime"], reverse=True)),
+            "slowest_documents": [{"judgment_id": profile["judgment_id"],
+                                   "seconds": sum(profile["stage_timings"].values()),
+                                   "stage_timings": profile["stage_timings"],
+                                   "prof_path": profile["prof_path"]} for profile in slowest[:top_n]]
+        }
+    
+    def to_dict(self) -> Dict:
+        duration = datetime.now() - self.start_time
+        return {
+            "total_processed": self.total_processed,
+            "total_success": self.total_success, 
+            "total_failed": self.total_failed,
+            "total_skipped": self.total_skipped,
+            "total_unchanged": self.total_unchanged,
+            "relations_found": self.relations_found,
+            "unique_ids_discovered": self.unique_ids_discovered,
+            "duration_minutes": duration.total_seconds() / 60,
+            "start_time": self.start_time.isoformat(),
+            "end_time": datetime.now().isoformat(),
+            "worker_stats": self.worker_throughput(),
+            "writer_stats": self.writer_stats,
+            "clean_text_cache": self.clean_text_cache_report()
+        }
+
+# Map element fields based on type: (id, number, name, content)
+ELEMENT_FIELD_MAPPING = {
+    'vbpl_big_part': ('vbpl_big_part_id', 'big_part_number', 'big_part_name', 'big_part_content'),
+    'vbpl_chapter': ('vbpl_chapter_id', 'chapter_number', 'chapter_name', 'chapter_content'),
+    'vbpl_part': ('vbpl_part_id', 'part_number', 'part_name', 'part_content'),
+    'vbpl_mini_part': ('vbpl_mini_part_id', 'mini_part_number', 'mini_part_name', 'mini_part_content'),
+    'vbpl_section': ('vbpl_section_id', 'section_number', 'section_name', 'section_content'),
+    'vbpl_clause': ('vbpl_clause_id', 'clause_number', 'clause_name', 'clause_content'),
+    'vbpl_point': ('vbpl_point_id', 'point_number', 'point_name', 'point_content')
+}
+
+ELEMENT_LEVELS = {
+    'vbpl_big_part': 1, 'vbpl_chapter': 2, 'vbpl_part': 3, 
+    'vbpl_mini_part': 4, 'vbpl_section': 5, 'vbpl_clause': 6, 'vbpl_point': 7
+}
+
+INSERT_DOCUMENT_SQL = """
+    INSERT OR REPLACE INTO documents 
+    (judgment_id, judgment_number, judgment_name, full_judgment_name, 
+     date_issued, state, state_id, doc_type, issuing_authority, s3_key,
+     application_date, expiration_date, expiration_date_not_applicable,
+     type_document, sector, processing_timestamp, api_hash, html_hash, vbpl_diagram)
+    VALUES 
+    (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_ELEMENT_SQL = """
+    INSERT OR REPLACE INTO elements 
+    (element_id, judgment_id, element_type, element_number, element_name, 
+     element_content, tag_id, immediate_parent_id, immediate_parent_type, level)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_RELATION_SQL = """
+    INSERT OR IGNORE INTO vbpl_relations 
+    (source_judgment_id, target_judgment_id, relation_type, relation_name)
+    VALUES (?, ?, ?, ?)
+"""
+
+# Durable queue ack - DatabaseWriter runs it in the same transaction as the document rows
+COMPLETE_QUEUE_SQL = """
+    UPDATE processing_queue
+    SET status = 'done', lease_owner = NULL, lease_expires_at = NULL,
+        error_message = NULL, completed_at = CURRENT_TIMESTAMP
+    WHERE judgment_id = ?
+"""
+
+class SQLiteDatabase:
+    """SQLite database operations for VBPL data - one long-lived WAL connection"""
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.conn = self._connect()
+        self.init_database()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open connection với WAL và pragmas cho bulk insert"""
+        # Callers serialize access; the flag only lets a dedicated thread own the connection
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # WAL: fsync at checkpoint, still crash-safe
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-65536")  # 64 MB page cache
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+    
+    def close(self):
+        """Close the connection"""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+    
+    def init_database(self):
+        """Initialize database với schema tối ưu"""
+        with self.conn as conn:
+            cursor = conn.cursor()
+            
+            # Documents table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    judgment_id TEXT PRIMARY KEY,
+                    judgment_number TEXT,
+                    judgment_name TEXT,
+                    full_judgment_name TEXT,
+                    date_issued TEXT,
+                    state TEXT,
+                    state_id INTEGER,
+                    doc_type TEXT,
+                    issuing_authority TEXT,
+                    s3_key TEXT,
+                    application_date TEXT,
+                    expiration_date TEXT,
+                    expiration_date_not_applicable BOOLEAN,
+                    type_document TEXT,
+                    sector TEXT,
+                    processing_timestamp TEXT,
+                    total_sections INTEGER,
+                    total_clauses INTEGER,
+                    total_points INTEGER,
+                    processing_status TEXT DEFAULT 'completed',
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # Elements table - tất cả structural elements
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS elements (
+                    element_id TEXT PRIMARY KEY,
+                    judgment_id TEXT NOT NULL,
+                    element_type TEXT NOT NULL,
+                    element_number TEXT,
+                    element_name TEXT,
+                    element_content TEXT,
+                    tag_id TEXT,
+                    immediate_parent_id TEXT,
+                    immediate_parent_type TEXT,
+                    level INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    
+                    FOREIGN KEY (judgment_id) REFERENCES documents(judgment_id),
+                    FOREIGN KEY (immediate_parent_id) REFERENCES elements(element_id)
+                )
+            """)
+            
+            # Relations table với relationship types
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS vbpl_relations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    source_judgment_id TEXT NOT NULL,
+                    target_judgment_id TEXT NOT NULL,
+                    relation_type TEXT NOT NULL,
+                    relation_name TEXT,
+                    discovered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    
+                    FOREIGN KEY (source_judgment_id) REFERENCES documents(judgment_id),
+                    FOREIGN KEY (target_judgment_id) REFERENCES documents(judgment_id),
+                    
+                    UNIQUE(source_judgment_id, target_judgment_id, relation_type)
+                )
+            """)
+            
+            # Processing queue table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS processing_queue (
+                    judgment_id TEXT PRIMARY KEY,
+                    status TEXT DEFAULT 'pending',
+                    priority INTEGER DEFAULT 0,
+                    attempts INTEGER DEFAULT 0,
+                    last_attempt_at TIMESTAMP,
+                    error_message TEXT,
+                    added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    completed_at TIMESTAMP
+                )
+            """)
+            
+            # Create indexes
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_elements_judgment_id ON elements(judgment_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_elements_type ON elements(element_type)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_elements_parent ON elements(immediate_parent_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_relations_source ON vbpl_relations(source_judgment_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_relations_target ON vbpl_relations(target_judgment_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_relations_type ON vbpl_relations(relation_type)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_queue_status ON processing_queue(status)")
+            
+            # Lease/backoff columns for the durable work queue (added to existing databases too)
+            self._ensure_columns(cursor, "processing_queue", {
+                "lease_owner": "TEXT",
+                "lease_expires_at": "REAL",
+                "next_attempt_at": "REAL DEFAULT 0",
+                "depth": "INTEGER"  # hops from the start ID, NULL = unknown
+            })
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_queue_claim ON processing_queue(status, priority DESC, added_at)")
+            
+            # Content hashes for incremental re-crawl, raw vbpl_diagram JSON for discovery scans
+            self._ensure_columns(cursor, "documents", {
+                "api_hash": "TEXT",
+                "html_hash": "TEXT",
+                "vbpl_diagram": "TEXT"
+            })
+    
+    @staticmethod
+    def _ensure_columns(cursor: sqlite3.Cursor, table: str, columns: Dict[str, str]):
+        """ALTER TABLE ADD COLUMN cho các cột chưa có"""
+        existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+        for name, column_type in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+    
+    def document_exists(self, judgment_id: str) -> bool:
+        """Check if document đã xử lý"""
+        cursor = self.conn.execute("SELECT 1 FROM documents WHERE judgment_id = ?", (judgment_id,))
+        return cursor.fetchone() is not None
+    
+    def existing_document_ids(self, judgment_ids: Iterable[str], chunk_size: int = 500) -> Set[str]:
+        """Subset of `judgment_ids` đã có trong documents - một query cho mỗi chunk thay vì mỗi ID"""
+        judgment_ids = list(dict.fromkeys(judgment_ids))
+        existing = set()
+        for start in range(0, len(judgment_ids), chunk_size):
+            chunk = judgment_ids[start:start + chunk_size]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT judgment_id FROM documents WHERE judgment_id IN ({placeholders})", chunk
+            ).fetchall()
+            existing.update(row[0] for row in rows)
+        return existing
+    
+    def all_document_ids(self) -> Set[str]:
+        """In-memory index of processed document IDs"""
+        return {row[0] for row in self.conn.execute("SELECT judgment_id FROM documents")}
+    
+    def iter_document_ids(self) -> Iterator[str]:
+        """Stream stored document IDs in judgment_id order without building a set"""
+        return (row[0] for row in self.conn.execute("SELECT judgment_id FROM documents ORDER BY judgment_id"))
+    
+    def document_count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+    
+    def all_content_hashes(self) -> Dict[str, Dict[str, str]]:
+        """judgment_id -> {api_hash, html_hash} cho documents đã có hash"""
+        return {
+            row[0]: {"api_hash": row[1], "html_hash": row[2]}
+            for row in self.conn.execute(
+                "SELECT judgment_id, api_hash, html_hash FROM documents WHERE api_hash IS NOT NULL AND html_hash IS NOT NULL"
+            )
+        }
+    
+    @staticmethod
+    def _document_row(judgment_id: str, metadata: Dict, content_hashes: Optional[Dict[str, str]] = None) -> Tuple:
+        """Row for INSERT_DOCUMENT_SQL"""
+        content_hashes = content_hashes or {}
+        return (
+            judgment_id,
+            metadata.get('judgment_number'),
+            metadata.get('judgment_name'),
+            metadata.get('full_judgment_name'),
+            metadata.get('date_issued'),
+            metadata.get('state'),
+            metadata.get('state_id'),
+            metadata.get('doc_type'),
+            metadata.get('issuing_authority'),
+            metadata.get('s3_key'),
+            metadata.get('application_date'),
+            metadata.get('expiration_date'),
+            metadata.get('expiration_date_not_applicable'),
+            metadata.get('type_document'),
+            metadata.get('sector'),
+            datetime.now().isoformat(),
+            content_hashes.get('api_hash'),
+            content_hashes.get('html_hash'),
+            json.dumps(metadata['vbpl_diagram'], ensure_ascii=False) if 'vbpl_diagram' in metadata else None
+        )
+    
+    @staticmethod
+    def _element_row(judgment_id: str, element_type: str, element: Dict) -> Optional[Tuple]:
+        """Row for INSERT_ELEMENT_SQL, None for unknown element types"""
+        if element_type not in ELEMENT_FIELD_MAPPING:
+            return None
+        
+        id_field, number_field, name_field, content_field = ELEMENT_FIELD_MAPPING[element_type]
+        return (
+            element.get(id_field),
+            judgment_id,
+            element_type,
+            element.get(number_field),
+            element.get(name_field),
+            element.get(content_field),
+            element.get('tag_id'),
+            element.get('immediate_parent_id'),
+            element.get('immediate_parent_type'),
+            ELEMENT_LEVELS[element_type]
+        )
+    
+    def insert_document(self, judgment_id: str, metadata: Dict):
+        """Insert document metadata"""
+        with self.conn:
+            self.conn.execute(INSERT_DOCUMENT_SQL, self._document_row(judgment_id, metadata))
+    
+    def insert_element(self, judgment_id: str, element_type: str, element: Dict):
+        """Insert structural element"""
+        row = self._element_row(judgment_id, element_type, element)
+        if row is None:
+            return
+        with self.conn:
+            self.conn.execute(INSERT_ELEMENT_SQL, row)
+    
+    def insert_relation(self, source_judgment_id: str, target_judgment_id: str, relation_type: str):
+        """Insert relationship between documents"""
+        with self.conn:
+            self.conn.execute(INSERT_RELATION_SQL, (source_judgment_id, target_judgment_id, relation_type, relation_type))
+    
+    def insert_relations(self, source_judgment_id: str, relations: List[Dict[str, str]]):
+        """Insert all relations of one document in one statement batch"""
+        with self.conn:
+            self.conn.executemany(INSERT_RELATION_SQL, [
+                (source_judgment_id, relation['target_judgment_id'], relation['relation_type'], relation['relation_type'])
+                for relation in relations
+            ])
+    
+    def save_document(self, judgment_id: str, metadata: Dict, structure_data: Dict[str, List[Dict]],
+                      relations: List[Dict[str, str]], content_hashes: Optional[Dict[str, str]] = None,
+                      ack_queue: bool = False) -> int:
+        """Document + elements + relations trong MỘT transaction, return số elements đã ghi.
+        `ack_queue`: đánh dấu processing_queue 'done' trong cùng transaction"""
+        with self.conn:
+            elements = self._write_document(judgment_id, metadata, structure_data, relations, content_hashes)
+            if ack_queue:
+                self.conn.execute(COMPLETE_QUEUE_SQL, (judgment_id,))
+            return elements
+    
+    def save_documents(self, documents: List[Tuple], ack_queue: bool = False) -> int:
+        """Several (judgment_id, metadata, structure_data, relations[, content_hashes]) trong một transaction"""
+        with self.conn:
+            elements = sum(self._write_document(*document) for document in documents)
+            if ack_queue:
+                self.conn.executemany(COMPLETE_QUEUE_SQL, [(document[0],) for document in documents])
+            return elements
+    
+    def _write_document(self, judgment_id: str, metadata: Dict, structure_data: Dict[str, List[Dict]],
+                        relations: List[Dict[str, str]], content_hashes: Optional[Dict[str, str]] = None) -> int:
+        """Statements for one document - caller owns the transaction.
+        
+        Elements/relations cũ của document bị xoá trước, để re-extract không để lại element đã mất.
+        """
+        element_rows = []
+        for element_type, elements in structure_data.items():
+            for element in elements:
+                row = self._element_row(judgment_id, element_type, element)
+                if row is not None:
+                    element_rows.append(row)
+        
+        relation_rows = [
+            (judgment_id, relation['target_judgment_id'], relation['relation_type'], relation['relation_type'])
+            for relation in relations
+        ]
+        
+        self.conn.execute("DELETE FROM elements WHERE judgment_id = ?", (judgment_id,))
+        self.conn.execute("DELETE FROM vbpl_relations WHERE source_judgment_id = ?", (judgment_id,))
+        self.conn.execute(INSERT_DOCUMENT_SQL, self._document_row(judgment_id, metadata, content_hashes))
+        self.conn.executemany(INSERT_ELEMENT_SQL, element_rows)
+        self.conn.executemany(INSERT_RELATION_SQL, relation_rows)
+        
+        return len(element_rows)
+    
+    def documents_without_diagram(self) -> List[str]:
+        """Documents lưu trước khi có cột vbpl_diagram"""
+        return [row[0] for row in self.conn.execute("SELECT judgment_id FROM documents WHERE vbpl_diagram IS NULL")]
+    
+    def store_vbpl_diagrams(self, diagrams: Dict[str, object]) -> int:
+        with self.conn:
+            self.conn.executemany("UPDATE documents SET vbpl_diagram = ? WHERE judgment_id = ?", [
+                (json.dumps(diagram, ensure_ascii=False), judgment_id) for judgment_id, diagram in diagrams.items()
+            ])
+        return len(diagrams)
+    
+    def rebuild_relations(self) -> Tuple[int, int]:
+        """Re-derive vbpl_relations from every stored vbpl_diagram in one transaction,
+        return (relations checked, relations added)"""
+        relation_rows = []
+        for judgment_id, diagram in self.conn.execute(
+            "SELECT judgment_id, vbpl_diagram FROM documents WHERE vbpl_diagram IS NOT NULL"
+        ):
+            for relation in extract_vbpl_relations_with_types(diagram):
+                relation_rows.append((judgment_id, relation['target_judgment_id'],
+                                      relation['relation_type'], relation['relation_type']))
+        
+        before = self.conn.total_changes
+        with self.conn:
+            self.conn.executemany(INSERT_RELATION_SQL, relation_rows)
+        return len(relation_rows), self.conn.total_changes - before
+    
+    def undiscovered_targets(self) -> List[str]:
+        """Relation targets chưa có trong documents - một anti-join"""
+        return [row[0] for row in self.conn.execute("""
+            SELECT DISTINCT r.target_judgment_id
+            FROM vbpl_relations r
+            LEFT JOIN documents d ON d.judgment_id = r.target_judgment_id
+            WHERE d.judgment_id IS NULL
+            ORDER BY r.target_judgment_id
+        """)]
+    
+    def get_stats(self) -> Dict:
+        """Get database statistics"""
+        cursor = self.conn.cursor()
+        
+        stats = {}
+        
+        # Document counts
+        cursor.execute("SELECT COUNT(*) FROM documents")
+        stats['total_documents'] = cursor.fetchone()[0]
+        
+        # Element counts by type
+        cursor.execute("""
+            SELECT element_type, COUNT(*) 
+            FROM elements 
+            GROUP BY element_type
+        """)
+        stats['elements_by_type'] = dict(cursor.fetchall())
+        
+        # Relation counts
+        cursor.execute("SELECT COUNT(*) FROM vbpl_relations")
+        stats['total_relations'] = cursor.fetchone()[0]
+        
+        cursor.execute("""
+            SELECT relation_type, COUNT(*) 
+            FROM vbpl_relations 
+            GROUP BY relation_type
+        """)
+        stats['relations_by_type'] = dict(cursor.fetchall())
+        
+        return stats
+
+class SQLiteWorkQueue:
+    """Durable crawl frontier trong bảng processing_queue.
+    
+    claim() leases the highest-priority pending ID to one owner; the lease expires after
+    `lease_seconds` so IDs held by a crashed process become claimable again. fail() schedules
+    a retry with exponential backoff until `max_attempts`. Several crawler processes can
+    share one queue. append/popleft/len/in/iter mirror the deque the crawler used before.
+    """
+    
+    def __init__(self, db: SQLiteDatabase, owner: Optional[str] = None, lease_seconds: float = 300.0,
+                 max_attempts: int = 3, backoff_base: float = 30.0, backoff_max: float = 3600.0):
+        self.conn = db.conn
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+    
+    INSERT_SQL = "INSERT OR IGNORE INTO processing_queue (judgment_id, status, priority, depth) VALUES (?, 'pending', ?, ?)"
+    # A known ID seen again over a shorter path keeps the smaller depth (and, while pending, the higher priority)
+    SHORTER_DEPTH_SQL = """
+        UPDATE processing_queue
+        SET depth = ?, priority = CASE WHEN status = 'pending' THEN MAX(priority, ?) ELSE priority END
+        WHERE judgment_id = ? AND (depth IS NULL OR depth > ?)
+    """
+    
+    def append(self, judgment_id: str, priority: int = 0, depth: Optional[int] = None) -> bool:
+        """Add a pending ID, return False if it was already known (in any status)"""
+        return self.extend([judgment_id], priority, depth) > 0
+    
+    def extend(self, judgment_ids: Iterable[str], priority: int = 0, depth: Optional[int] = None) -> int:
+        judgment_ids = list(judgment_ids)
+        with self.conn:
+            cursor = self.conn.executemany(self.INSERT_SQL, [(judgment_id, priority, depth) for judgment_id in judgment_ids])
+            added = cursor.rowcount
+            if depth is not None:
+                self.conn.executemany(self.SHORTER_DEPTH_SQL,
+                                      [(depth, priority, judgment_id, depth) for judgment_id in judgment_ids])
+        return added
+    
+    def requeue(self, judgment_ids: List[str]) -> int:
+        """Make IDs pending again whatever their status (incremental re-crawl), except ones leased right now"""
+        with self.conn:
+            cursor = self.conn.executemany("""
+                INSERT INTO processing_queue (judgment_id, status) VALUES (?, 'pending')
+                ON CONFLICT(judgment_id) DO UPDATE SET
+                    status = 'pending', attempts = 0, next_attempt_at = 0, error_message = NULL
+                WHERE status != 'in_progress'
+            """, [(judgment_id,) for judgment_id in judgment_ids])
+        return cursor.rowcount
+    
+    def claim_entry(self) -> Optional[Tuple[str, Optional[int]]]:
+        """Lease the next claimable ID to this owner, return (judgment_id, depth)"""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute("""
+                SELECT judgment_id, depth FROM processing_queue
+                WHERE (status = 'pending' AND COALESCE(next_attempt_at, 0) <= ?)
+                   OR (status = 'in_progress' AND lease_expires_at < ?)
+                ORDER BY priority DESC, added_at, rowid
+                LIMIT 1
+            """, (now, now)).fetchone()
+            
+            if row:
+                self.conn.execute("""
+                    UPDATE processing_queue
+                    SET status = 'in_progress', lease_owner = ?, lease_expires_at = ?,
+                        last_attempt_at = CURRENT_TIMESTAMP
+                    WHERE judgment_id = ?
+                """, (self.owner, now + self.lease_seconds, row[0]))
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return (row[0], row[1]) if row else None
+    
+    def claim(self) -> Optional[str]:
+        """Lease the next claimable ID to this owner"""
+        entry = self.claim_entry()
+        return entry[0] if entry else None
+    
+    def popleft(self) -> str:
+        judgment_id = self.claim()
+        if judgment_id is None:
+            raise IndexError("pop from an empty work queue")
+        return judgment_id
+    
+    def complete(self, judgment_id: str):
+        with self.conn:
+            self.conn.execute(COMPLETE_QUEUE_SQL, (judgment_id,))
+    
+    def fail(self, judgment_id: str, error: str = "") -> bool:
+        """Record a failed attempt, return True if a retry was scheduled.
+        Only the current lease owner may do this: if our lease expired and another crawler re-claimed
+        the row, the late failure is dropped (False) instead of resetting that crawler's lease."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = self.conn.execute("""
+                UPDATE processing_queue SET attempts = COALESCE(attempts, 0) + 1
+                WHERE judgment_id = ? AND status = 'in_progress' AND lease_owner = ?
+            """, (judgment_id, self.owner))
+            if cursor.rowcount == 0:
+                self.conn.commit()
+                return False
+            
+            attempts = self.conn.execute("SELECT attempts FROM processing_queue WHERE judgment_id = ?",
+                                         (judgment_id,)).fetchone()[0]
+            retry = attempts < self.max_attempts
+            next_attempt_at = time.time() + min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max)
+            self.conn.execute("""
+                UPDATE processing_queue
+                SET status = ?, error_message = ?, next_attempt_at = ?, lease_owner = NULL, lease_expires_at = NULL
+                WHERE judgment_id = ?
+            """, ('pending' if retry else 'failed', error[:1000], next_attempt_at, judgment_id))
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return retry
+    
+    def release_owned(self) -> int:
+        """Return this owner's leases to pending (clean shutdown / Ctrl-C)"""
+        with self.conn:
+            cursor = self.conn.execute("""
+                UPDATE processing_queue SET status = 'pending', lease_owner = NULL, lease_expires_at = NULL
+                WHERE status = 'in_progress' AND lease_owner = ?
+            """, (self.owner,))
+        return cursor.rowcount
+    
+    def reset_leases(self) -> int:
+        """Return every lease to pending - only safe when no other crawler shares the queue"""
+        with self.conn:
+            cursor = self.conn.execute("""
+                UPDATE processing_queue SET status = 'pending', lease_owner = NULL, lease_expires_at = NULL
+                WHERE status = 'in_progress'
+            """)
+        return cursor.rowcount
+    
+    def counts(self) -> Dict[str, int]:
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM processing_queue GROUP BY status").fetchall())
+    
+    def failed_ids(self) -> List[str]:
+        """IDs whose retries are exhausted"""
+        return [row[0] for row in self.conn.execute("SELECT judgment_id FROM processing_queue WHERE status = 'failed'")]
+    
+    def __len__(self) -> int:
+        """Number of IDs claimable right now"""
+        now = time.time()
+        return self.conn.execute("""
+            SELECT COUNT(*) FROM processing_queue
+            WHERE (status = 'pending' AND COALESCE(next_attempt_at, 0) <= ?)
+               OR (status = 'in_progress' AND lease_expires_at < ?)
+        """, (now, now)).fetchone()[0]
+    
+    def __bool__(self) -> bool:
+        return len(self) > 0
+    
+    def __contains__(self, judgment_id: str) -> bool:
+        return self.conn.execute(
+            "SELECT 1 FROM processing_queue WHERE judgment_id = ? AND status IN ('pending', 'in_progress')",
+            (judgment_id,)
+        ).fetchone() is not None
+    
+    def __iter__(self):
+        rows = self.conn.execute(
+            "SELECT judgment_id FROM processing_queue WHERE status = 'pending' ORDER BY priority DESC, added_at, rowid"
+        ).fetchall()
+        return iter([row[0] for row in rows])
+
+class DatabaseWriter(threading.Thread):
+    """Single-writer persistence actor: một thread sở hữu connection ghi, nhận documents qua
+    bounded queue và commit nhiều documents một lần. submit() chặn khi queue đầy (backpressure).
+    `ack_queue`: documents chỉ được đánh dấu done trong processing_queue khi batch của chúng commit,
+    nên crash giữa submit() và commit để lại ID ở in_progress (lease hết hạn -> fetch lại)."""
+    
+    def __init__(self, db_path: str, queue_size: int = 32, batch_size: int = 8,
+                 metrics: Optional[CrawlerMetrics] = None, ack_queue: bool = False):
+        super().__init__(name="vbpl-db-writer", daemon=True)
+        self.db_path = db_path
+        self.metrics = metrics
+        self.ack_queue = ack_queue
+        self.batch_size = max(1, batch_size)
+        self.pending: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self.errors: queue.Queue = queue.Queue()
+        self.committed: queue.Queue = queue.Queue()
+        self.stats = {"documents": 0, "elements": 0, "batches": 0, "backpressure_seconds": 0.0}
+        self._stats_lock = threading.Lock()
+    
+    def submit(self, judgment_id: str, metadata: Dict, structure_data: Dict[str, List[Dict]],
+               relations: List[Dict[str, str]], content_hashes: Optional[Dict[str, str]] = None):
+        """Hand a finished document to the writer, blocking while the queue is full"""
+        started = time.monotonic()
+        self.pending.put((judgment_id, metadata, structure_data, relations, content_hashes))
+        waited = time.monotonic() - started
+        with self._stats_lock:
+            self.stats["backpressure_seconds"] += waited
+    
+    def run(self):
+        db = SQLiteDatabase(self.db_path)
+        try:
+            while True:
+                item = self.pending.get()
+                if item is None:
+                    break
+                
+                batch = [item]
+                stop = False
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self.pending.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stop = True
+                        break
+                    batch.append(item)
+                
+                self._write_batch(db, batch)
+                if stop:
+                    break
+        finally:
+            db.close()
+    
+    def _write_batch(self, db: SQLiteDatabase, batch: List[Tuple]):
+        started = time.perf_counter()
+        try:
+            elements = db.save_documents(batch, self.ack_queue)
+            self._record(len(batch), elements)
+            for document in batch:
+                self.committed.put((document[0], document[4]))
+        except Exception:
+            # Isolate the failing document(s): retry one transaction per document
+            for document in batch:
+                try:
+                    self._record(1, db.save_document(*document, ack_queue=self.ack_queue))
+                    self.committed.put((document[0], document[4]))
+                except Exception as e:
+                    self.errors.put((document[0], str(e)))
+        if self.metrics:
+            # db_write là per-document: chia đều thời gian commit của batch
+            per_document = (time.perf_counter() - started) / len(batch)
+            for _ in batch:
+                self.metrics.observe("db_write", per_document)
+    
+    def _record(self, documents: int, elements: int):
+        with self._stats_lock:
+            self.stats["documents"] += documents
+            self.stats["elements"] += elements
+            self.stats["batches"] += 1
+    
+    def drain_errors(self) -> List[Tuple[str, str]]:
+        """(judgment_id, error) pairs for documents that could not be written"""
+        errors = []
+        while True:
+            try:
+                errors.append(self.errors.get_nowait())
+            except queue.Empty:
+                return errors
+    
+    def drain_committed(self) -> List[Tuple[str, Optional[Dict[str, str]]]]:
+        """(judgment_id, content_hashes) of documents whose batch has committed since the last call"""
+        committed = []
+        while True:
+            try:
+                committed.append(self.committed.get_nowait())
+            except queue.Empty:
+                return committed
+    
+    def close(self):
+        """Flush remaining documents and stop the thread"""
+        if self.is_alive():
+            self.pending.put(None)
+            self.join()
+    
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["avg_batch_size"] = stats["documents"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+class VBPLCrawler:
+    """Main VBPL Crawler với queue-based processing"""
+    
+    def __init__(self, config: CrawlerConfig):
+        self.config = config
+        self.db = SQLiteDatabase(config.db_path)
+        self.rate_limiter = self._build_rate_limiter()
+        self.processor = get_processor_for_crawler(config.log_dir, self.rate_limiter, **self._processor_options())
+        self._worker_local = threading.local()
+        
+        # Shard mode: IDs of other shards go to the coordination store instead of the local frontier
+        self.router: Optional[ShardRouter] = None
+        if config.shard:
+            self.router = ShardRouter(config.shard[0], config.shard[1], open_coordination_store(config.coord_store),
+                                      config.shard_idle_timeout)
+            print(f"🧩 Shard {self.router.label()} via {config.coord_store} (durable queue)")
+        start_ids = self.router.route([config.start_id], 0) if self.router else [config.start_id]
+        
+        if config.durable_queue:
+            self.queue = SQLiteWorkQueue(self.db, lease_seconds=config.lease_seconds,
+                                         max_attempts=config.retry_attempts)
+            if config.reset_leases:
+                print(f"🔓 Released {self.queue.reset_leases()} stale leases")
+            self.queue.extend(start_ids, depth=0)
+        elif config.priority:
+            self.queue = PriorityFrontier(start_ids, depth=0)
+        else:
+            self.queue = CrawlFrontier(start_ids, depth=0)
+        
+        # Hop distance from start_id (--max-depth, depth term of the priority score) travels with each
+        # frontier entry; only documents popped and not finished yet are tracked here (None = unknown)
+        self.in_flight_depths: Dict[str, Optional[int]] = {}
+        if config.bloom_capacity > 0:
+            self.processed = SeenSet(config.bloom_capacity, config.bloom_fp_rate)
+            self.failed = SeenSet(config.bloom_capacity, config.bloom_fp_rate)
+            print(f"🌸 Bloom seen-sets (processed + failed): 2 x {len(self.processed.bloom.bits) / 1024:.0f} KB "
+                  f"for {config.bloom_capacity} IDs @ {config.bloom_fp_rate} FP")
+        else:
+            self.processed: Set[str] = set()
+            self.failed: Set[str] = set()
+        self.stats = CrawlerStats()
+        self.writer: Optional[DatabaseWriter] = None
+        self.metrics: Optional[CrawlerMetrics] = None
+        self._metrics_server = None
+        self._metrics_file: Optional[MetricsFileWriter] = None
+        
+        # Processed IDs index: should_skip không cần query DB cho từng ID.
+        # Bloom mode không load mọi ID vào một set - filter được seed từ DB, chỉ positive mới query
+        if config.bloom_capacity > 0:
+            self.known_documents = StoredDocumentIndex(self.db, config.bloom_capacity, config.bloom_fp_rate)
+        else:
+            self.known_documents: Set[str] = self.db.all_document_ids()
+        
+        # Incremental mode: re-check every stored document against its saved hashes
+        self.content_hashes: Dict[str, Dict[str, str]] = {}
+        if config.incremental:
+            self.content_hashes = self.db.all_content_hashes()
+            refresh_ids = [judgment_id for judgment_id in self.db.iter_document_ids() if judgment_id != config.start_id]
+            if config.durable_queue:
+                self.queue.requeue(start_ids + refresh_ids)
+                self.queue.extend(start_ids, depth=0)
+            else:
+                self.queue.extend(refresh_ids)
+            print(f"♻️  Incremental: {self.db.document_count()} stored documents to re-check, "
+                  f"{len(self.content_hashes)} with content hashes")
+        
+        # Setup logging directory
+        Path(config.log_dir).mkdir(parents=True, exist_ok=True)
+        if os.path.exists(config.db_path):
+            self.get_database_summary()
+        
+        print(f"🚀 VBPL Crawler initialized")
+        print(f"📊 Database: {config.db_path}")
+        print(f"📁 Logs: {config.log_dir}")
+        print(f"🎯 Starting from: {config.start_id}")
+    
+    def _processor_options(self) -> Dict:
+        """ProcessingConfig overrides - HTTP pool sized for the concurrency in use"""
+        return {
+            'connect_timeout': self.config.connect_timeout,
+            'read_timeout': self.config.read_timeout,
+            'http_pool_size': max(16, 2 * self.config.max_workers),
+            'cache_dir': self.config.cache_dir,
+            'cache_api_ttl': self.config.cache_api_ttl,
+            'cache_html_ttl': self.config.cache_html_ttl,
+            'offline': self.config.offline,
+            'retry_attempts': self.config.retry_attempts,
+            'retry_backoff': self.config.retry_backoff,
+            'adaptive_concurrency': self.config.adaptive,
+            'max_host_concurrency': max(2, self.config.max_workers),
+            'api_base_url': self.config.api_base_url,
+            'profile_docs': tuple(self.config.profile_docs),
+            'profile_sample_rate': self.config.profile_sample_rate,
+            'clean_text_cache_size': self.config.clean_cache_size,
+            'clean_text_cache_shared': self.config.clean_cache_shared
+        }
+    
+    def http_stats(self) -> Dict:
+        """Retries, response cache counters và adaptive per-host limits của shared HTTP client"""
+        return get_http_client().get_stats()
+    
+    def start_metrics(self):
+        """Live metrics: Prometheus endpoint và/hoặc metrics file, nếu được bật"""
+        if self.config.metrics_port is None and not self.config.metrics_file:
+            return
+        self.metrics = CrawlerMetrics(self.collect_metrics)
+        if self.config.metrics_port is not None:
+            self._metrics_server = start_metrics_server(self.metrics, self.config.metrics_port)
+            print(f"📈 Metrics: http://127.0.0.1:{self._metrics_server.server_address[1]}/metrics")
+        if self.config.metrics_file:
+            self._metrics_file = MetricsFileWriter(self.metrics, self.config.metrics_file, self.config.metrics_interval)
+            self._metrics_file.start()
+            print(f"📈 Metrics file: {self.config.metrics_file} (every {self.config.metrics_interval:g}s)")
+    
+    def stop_metrics(self):
+        """Final metrics file snapshot, stop the endpoint"""
+        if self._metrics_file:
+            self._metrics_file.stop()
+            self._metrics_file = None
+        if self._metrics_server:
+            self._metrics_server.shutdown()
+            self._metrics_server.server_close()
+            self._metrics_server = None
+    
+    def update_metrics_gauges(self, in_flight: int):
+        """Queue depth / in-flight gauges - main thread only (durable queue len() chạy SQL)"""
+        if self.metrics:
+            self.metrics.set_gauge("queue_depth", len(self.queue))
+            self.metrics.set_gauge("in_flight", in_flight)
+    
+    def collect_metrics(self) -> List[Tuple]:
+        """Counters cho metrics render - chạy trên metrics thread, chỉ đọc state trong memory"""
+        stats = self.stats
+        elapsed = max((datetime.now() - stats.start_time).total_seconds(), 1e-9)
+        completed = stats.total_success + stats.total_failed
+        families = [
+            ("documents_total", "counter", "Documents by outcome",
+             [({"outcome": "success"}, stats.total_success), ({"outcome": "failed"}, stats.total_failed),
+              ({"outcome": "skipped"}, stats.total_skipped), ({"outcome": "unchanged"}, stats.total_unchanged)]),
+            ("documents_per_second", "gauge", "Processed documents per second since start",
+             [({}, completed / elapsed)]),
+            ("relations_found_total", "counter", "Related IDs found in processed documents",
+             [({}, stats.relations_found)]),
+        ]
+        
+        http_stats = self.http_stats()
+        host_requests = http_stats["requests"]
+        families.append(("http_requests_total", "counter", "HTTP attempts per host, including retries",
+                         [({"host": host}, counters["requests"]) for host, counters in host_requests.items()]))
+        families.append(("http_errors_total", "counter", "Failed HTTP attempts per host and kind",
+                         [({"host": host, "kind": kind}, counters[kind])
+                          for host, counters in host_requests.items()
+                          for kind in ("throttled", "server_errors", "client_errors", "network_errors")]))
+        families.append(("http_error_ratio", "gauge", "Failed / total HTTP attempts per host",
+                         [({"host": host}, counters["errors"] / counters["requests"] if counters["requests"] else 0.0)
+                          for host, counters in host_requests.items()]))
+        families.append(("http_retries_total", "counter", "HTTP retries", [({}, http_stats["retries"])]))
+        clean_cache = stats.clean_text_cache_report()
+        families.append(("clean_text_cache_total", "counter", "clean_text cache lookups by outcome",
+                         [({"event": event}, clean_cache[event]) for event in ("hits", "shared_hits", "misses")]))
+        families.append(("clean_text_cache_hit_ratio", "gauge", "clean_text cache hits (local + shared) / lookups",
+                         [({}, clean_cache["hit_rate"])]))
+        if http_stats["cache"]:
+            families.append(("http_cache_total", "counter", "Response cache events",
+                             [({"event": event}, count) for event, count in http_stats["cache"].items()]))
+        if http_stats["hosts"]:
+            families.append(("host_concurrency_limit", "gauge", "Adaptive per-host concurrency limit",
+                             [({"host": host}, host_stats["limit"]) for host, host_stats in http_stats["hosts"].items()]))
+        
+        writer = self.writer
+        if writer:
+            families.append(("writer_backlog", "gauge", "Documents waiting for the DB writer",
+                             [({}, writer.pending.qsize())]))
+        return families
+    
+    def _build_rate_limiter(self) -> HostRateLimiter:
+        """Per-host token buckets, mặc định 1 request / delay giây cho mỗi host.
+        Adaptive mode: không giới hạn rate trừ khi --api-rate/--html-rate được đặt, AIMD điều tiết."""
+        delay = self.config.delay_between_requests
+        default_rate = 1.0 / delay if delay > 0 and not self.config.adaptive else 0.0
+        api_rate = self.config.api_rate if self.config.api_rate is not None else default_rate
+        html_rate = self.config.html_rate if self.config.html_rate is not None else default_rate
+        return HostRateLimiter(html_rate, {api_host(self.config.api_base_url): api_rate})
+    
+    def should_skip(self, judgment_id: str) -> bool:
+        """Check if document should be skipped"""
+        if judgment_id in self.processed:
+            return True
+        
+        if judgment_id in self.failed:
+            return True
+        
+        if judgment_id in self.known_documents and not self.config.incremental:
+            print(f"⚠️  Đã có: {judgment_id}, bỏ qua")
+            self.stats.total_skipped += 1
+            self.processed.add(judgment_id)
+            if self.config.durable_queue:
+                self.queue.complete(judgment_id)
+            return True
+        
+        return False
+    
+    def record_failure(self, judgment_id: str, error: str = ""):
+        """Count a failed document; the durable queue may schedule a retry instead (its row keeps the depth)"""
+        self.in_flight_depths.pop(judgment_id, None)
+        self.stats.total_failed += 1
+        if self.config.durable_queue and self.queue.fail(judgment_id, error):
+            self.processed.discard(judgment_id)
+            print(f"🔁 Retry later: {judgment_id}")
+            return
+        self.failed.add(judgment_id)
+    
+    def process_document(self, judgment_id: str) -> bool:
+        """Process single document với error handling"""
+        print(f"🔄 Đang xử lý: {judgment_id}")
+        
+        try:
+            # Call processor với return data
+            success, result_data = self.processor.process_document(judgment_id, self.content_hashes.get(judgment_id))
+        except Exception as e:
+            print(f"❌ Exception: {judgment_id} - {e}")
+            self.record_failure(judgment_id, str(e))
+            return False
+        
+        return self.handle_result(judgment_id, success, result_data)
+    
+    def handle_result(self, judgment_id: str, success: bool, result_data: Optional[Dict]) -> bool:
+        """Save và queue relations từ kết quả processor - chạy trên main thread"""
+        depth = self.in_flight_depths.pop(judgment_id, None)
+        try:
+            if success and result_data:
+                # Save to database - unchanged documents keep their stored rows
+                if self.metrics:
+                    self.metrics.observe_stages(result_data.get('stage_timings'))
+                self.stats.record_profile(judgment_id, result_data)
+                self.stats.record_clean_text_cache(result_data)
+                queued_write = False
+                if result_data.get('unchanged'):
+                    self.stats.total_unchanged += 1
+                else:
+                    queued_write = self.save_to_database(judgment_id, result_data)
+                
+                # Extract và queue related IDs
+                related_ids, scores, child_depth = self.select_related(judgment_id, result_data, depth)
+                self.queue_related_ids(related_ids, scores, child_depth)
+                
+                if result_data.get('unchanged'):
+                    print(f"♻️  Không đổi: {judgment_id}")
+                else:
+                    print(f"✅ Đã xử lý và lưu: {judgment_id}")
+                if related_ids:
+                    print(f"📎 Tìm thấy {len(related_ids)} liên kết")
+                    
+                self.stats.total_success += 1
+                self.stats.relations_found += len(related_ids)
+                if self.config.durable_queue and not queued_write:
+                    # Documents handed to the writer are acked in the transaction that commits them
+                    self.queue.complete(judgment_id)
+                return True
+            else:
+                print(f"❌ Lỗi xử lý: {judgment_id}")
+                self.record_failure(judgment_id, "processing failed")
+                return False
+                
+        except Exception as e:
+            print(f"❌ Exception: {judgment_id} - {e}")
+            self.record_failure(judgment_id, str(e))
+            return False
+    
+    def save_to_database(self, judgment_id: str, result_data: Dict) -> bool:
+        """Save processed data to SQLite, return True if it was handed to the DB writer (not committed yet;
+        known_documents và content_hashes are updated when the writer reports the commit)"""
+        try:
+            # Extract metadata và structure data
+            metadata = result_data.get('document_metadata', {})
+            structure_data = result_data.get('structure_data', {})
+            
+            # Save document, elements và relations từ vbpl_diagram trong một transaction
+            relations = extract_relations_from_result(result_data)
+            content_hashes = result_data.get('content_hashes')
+            if self.writer:
+                self.writer.submit(judgment_id, metadata, structure_data, relations, content_hashes)
+                print(f"💾 Chờ ghi DB: {sum(len(e) for e in structure_data.values())} elements, {len(relations)} relations")
+                return True
+            
+            started = time.perf_counter()
+            total_elements = self.db.save_document(judgment_id, metadata, structure_data, relations, content_hashes)
+            # Chỉ document đã commit mới được coi là "Đã có" / có hash mới: write lỗi còn được retry
+            self.known_documents.add(judgment_id)
+            if content_hashes:
+                self.content_hashes[judgment_id] = content_hashes
+            if self.metrics:
+                self.metrics.observe("db_write", time.perf_counter() - started)
+            print(f"💾 Lưu DB: {total_elements} elements, {len(relations)} relations")
+            return False
+            
+        except Exception as e:
+            print(f"⚠️  Lỗi lưu DB cho {judgment_id}: {e}")
+            raise
+    
+    def select_related(self, judgment_id: str, result_data: Dict,
+                       depth: Optional[int] = None) -> Tuple[List[str], Dict[str, float], Optional[int]]:
+        """Related IDs worth following (max depth, relation allowlist), score của từng ID và depth của chúng.
+        
+        `depth` là depth của judgment_id. None (chưa biết - resume từ vbpl_relations, discovery scan,
+        incremental) không được coi là 0: với --max-depth các ID này không được mở rộng thêm.
+        """
+        depth = depth + 1 if depth is not None else None
+        if self.config.max_depth is not None and (depth is None or depth > self.config.max_depth):
+            return [], {}, depth
+        
+        source_doc_type = result_data.get('document_metadata', {}).get('doc_type')
+        scores: Dict[str, float] = {}
+        for relation in extract_relations_from_result(result_data):
+            if (self.config.relation_allowlist and
+                    not relation_matches(relation['relation_type'], self.config.relation_allowlist)):
+                continue
+            target_id = relation['target_judgment_id']
+            score = score_relation(relation['relation_type'], depth, source_doc_type)
+            scores[target_id] = max(score, scores.get(target_id, 0.0))
+        return list(scores), scores, depth
+    
+    def queue_related_ids(self, related_ids: List[str], scores: Optional[Dict[str, float]] = None,
+                          depth: Optional[int] = None):
+        """Add related IDs (all `depth` hops from the start ID) to processing queue"""
+        if self.router:
+            related_ids = self.router.route(related_ids, depth, scores)
+        
+        # One batched lookup refreshes the index with documents saved by other crawler processes
+        unknown = [related_id for related_id in related_ids if related_id not in self.known_documents]
+        if unknown:
+            self.known_documents.update(self.db.existing_document_ids(unknown))
+        
+        new_ids = 0
+        for related_id in related_ids:
+            if related_id in self.in_flight_depths:
+                self.in_flight_depths[related_id] = shorter_depth(self.in_flight_depths[related_id], depth)
+            if (related_id not in self.processed and 
+                related_id not in self.failed and
+                self._enqueue(related_id, (scores or {}).get(related_id, 0.0), depth)):
+                new_ids += 1
+                print(f"📎 Queue: {related_id}")
+        
+        if new_ids > 0:
+            self.stats.unique_ids_discovered += new_ids
+    
+    def _enqueue(self, judgment_id: str, score: float, depth: Optional[int] = None) -> bool:
+        """FIFO frontier bỏ qua score; durable queue lưu score vào cột priority (INTEGER)"""
+        if not self.config.priority:
+            return self.queue.append(judgment_id, depth=depth)
+        if self.config.durable_queue:
+            return self.queue.append(judgment_id, int(round(score * 1000)), depth)
+        return self.queue.append(judgment_id, score, depth)
+    
+    def load_unprocessed_queue(self):
+        """Load unprocessed related documents vào queue"""
+        if self.config.max_depth is not None:
+            # vbpl_relations không lưu hop distance: target ngoài --max-depth cũng nằm ở đây.
+            # Durable queue đã giữ mọi ID trong phạm vi kèm depth của chúng.
+            source = "durable queue only" if self.config.durable_queue else "nothing (needs --durable-queue)"
+            print(f"📥 --max-depth set: IDs from vbpl_relations have no hop distance, resuming from {source}")
+            return 0
+        with self.db.conn as conn:
+            cursor = conn.cursor()
+            
+            # Get all target IDs chưa được processed
+            cursor.execute("""
+                SELECT DISTINCT target_judgment_id 
+                FROM vbpl_relations 
+                WHERE target_judgment_id NOT IN (
+                    SELECT judgment_id FROM documents
+                )
+                ORDER BY target_judgment_id
+            """)
+            
+            unprocessed_ids = [row[0] for row in cursor.fetchall()]
+            if self.router:
+                unprocessed_ids = self.router.route(unprocessed_ids)
+            
+            # Add to queue
+            for judgment_id in unprocessed_ids:
+                self.queue.append(judgment_id)
+            
+            print(f"📥 Loaded {len(unprocessed_ids)} unprocessed IDs from database")
+            return len(unprocessed_ids)
+
+    def get_database_summary(self):
+        """Get database summary for debugging"""
+        with self.db.conn as conn:
+            cursor = conn.cursor()
+            
+            # Total stats
+            cursor.execute("SELECT COUNT(*) FROM documents")
+            total_docs = cursor.fetchone()[0]
+            
+            cursor.execute("SELECT COUNT(DISTINCT target_judgment_id) FROM vbpl_relations")
+            total_targets = cursor.fetchone()[0]
+            
+            cursor.execute("""
+                SELECT COUNT(DISTINCT target_judgment_id) 
+                FROM vbpl_relations 
+                WHERE target_judgment_id NOT IN (SELECT judgment_id FROM documents)
+            """)
+            unprocessed = cursor.fetchone()[0]
+            
+            print(f"📊 Database Summary:")
+            print(f"   📄 Processed docs: {total_docs}")
+            print(f"   🎯 Total targets discovered: {total_targets}")
+            print(f"   ⏳ Unprocessed targets: {unprocessed}")
+            if total_targets > 0:
+                print(f"   📈 Coverage: {(total_docs/total_targets*100):.1f}%")
+            
+            return {
+                'processed': total_docs,
+                'total_targets': total_targets, 
+                'unprocessed': unprocessed
+            }
+    
+    def run(self):
+        """Main crawler loop với comprehensive discovery"""
+        print(f"\n🚀 Bắt đầu crawling từ ID: {self.config.start_id}")
+        print(f"📊 Giới hạn: {self.config.max_documents} documents")
+        print("-" * 60)
+        
+        # Complete discovery scan if requested
+        if hasattr(self.config, 'complete_scan') and self.config.complete_scan and os.path.exists(self.config.db_path):
+            new_discoveries = self.complete_discovery_scan()
+            if new_discoveries > 0:
+                print(f"🎯 Found {new_discoveries} additional documents to process")
+        
+        # Auto-resume logic
+        if self.config.start_id in self.known_documents and not self.config.incremental:
+            print(f"⚠️  Start ID {self.config.start_id} đã processed, loading unprocessed queue...")
+            loaded = self.load_unprocessed_queue()
+            if loaded == 0 and len(self.queue) == 0 and not self.router:
+                print("✅ Tất cả related documents đã được processed!")
+                print("🎯 Try với start ID khác để discover thêm documents")
+                self.generate_report()
+                self.print_final_stats()
+                return
+        
+        self.start_metrics()
+        try:
+            if self.config.pipeline or self.config.async_mode or self.config.max_workers > 1:
+                self.start_writer()
+                try:
+                    if self.config.pipeline:
+                        self.run_pipeline()
+                    elif self.config.async_mode:
+                        self.run_async()
+                    else:
+                        self.run_worker_pool()
+                finally:
+                    self.stop_writer()
+            else:
+                while self.stats.total_processed < self.config.max_documents:
+                    entry = self.next_queued(wait=True)
+                    if entry is None:
+                        break
+                    
+                    judgment_id, depth = entry
+                    if self.should_skip(judgment_id):
+                        continue
+                    self.in_flight_depths[judgment_id] = depth
+                    
+                    # Rate limiting
+                    if self.stats.total_processed > 0 and not self.config.adaptive:
+                        time.sleep(self.config.delay_between_requests)
+                    
+                    # Process document
+                    self.processed.add(judgment_id)
+                    self.update_metrics_gauges(1)
+                    self.process_document(judgment_id)
+                    self.stats.total_processed += 1
+                    self.update_metrics_gauges(0)
+                    
+                    # Progress update
+                    if self.stats.total_processed % 5 == 0:
+                        self.print_progress()
+        finally:
+            # Ctrl-C / crash: documents still leased by this process go back to pending
+            if self.config.durable_queue:
+                released = self.queue.release_owned()
+                if released:
+                    print(f"🔓 Returned {released} in-flight IDs to the queue")
+            if self.router:
+                self.router.close()
+            self.stop_metrics()
+        
+        # Final results
+        self.generate_report()
+        print(f"\n🎉 Crawler hoàn thành!")
+        self.print_final_stats()
+    
+    def _get_worker_processor(self):
+        """Mỗi worker thread có processor riêng (logger riêng), dùng chung rate limiter"""
+        processor = getattr(self._worker_local, 'processor', None)
+        if processor is None:
+            processor = get_processor_for_crawler(self.config.log_dir, self.rate_limiter, **self._processor_options())
+            self._worker_local.processor = processor
+        return processor
+    
+    def _worker_process(self, judgment_id: str,
+                        previous_hashes: Optional[Dict[str, str]] = None) -> Tuple[bool, Optional[Dict], str, float]:
+        """Runs on a worker thread: fetch + extract only, no DB access"""
+        started = time.monotonic()
+        success, result_data = self._get_worker_processor().process_document(judgment_id, previous_hashes)
+        return success, result_data, threading.current_thread().name, time.monotonic() - started
+    
+    def _pop_frontier(self) -> Optional[Tuple[str, Optional[int]]]:
+        """Next local frontier (judgment_id, depth) or None. The durable queue is claimed in one transaction:
+        a len() check followed by popleft() could lose the last ID to another crawler process in between."""
+        if self.config.durable_queue:
+            return self.queue.claim_entry()
+        return self.queue.popleft_entry() if self.queue else None
+    
+    def next_queued(self, wait: bool = False) -> Optional[Tuple[str, Optional[int]]]:
+        """Pop the next frontier (judgment_id, depth), None = no work; in shard mode refill the frontier
+        from the inbox first. `wait` (nothing in flight): poll the inbox up to shard_idle_timeout before giving up."""
+        while True:
+            entry = self._pop_frontier()
+            if entry is not None or not self.router:
+                return entry
+            forwarded = self.router.pull(wait=wait)
+            if not forwarded:
+                return None
+            # Drop IDs this shard already handled (e.g. its own start ID forwarded by the others);
+            # the rest keep the score the forwarding shard gave them
+            for judgment_id, depth, score in forwarded:
+                if judgment_id not in self.processed and judgment_id not in self.failed:
+                    self._enqueue(judgment_id, score or 0.0, depth)
+            # processing_queue rows are committed: only now may the inbox stop redelivering them
+            self.router.acknowledge([entry[0] for entry in forwarded])
+    
+    def _next_dispatch(self, in_flight: int, limit: int) -> Optional[str]:
+        """Pop the next ID to start, respecting concurrency and max_documents limits"""
+        self.update_metrics_gauges(in_flight)
+        while in_flight < limit and self.stats.total_processed + in_flight < self.config.max_documents:
+            entry = self.next_queued(wait=in_flight == 0)
+            if entry is None:
+                return None
+            judgment_id, depth = entry
+            if self.should_skip(judgment_id):
+                continue
+            self.in_flight_depths[judgment_id] = depth
+            
+            # Mark early so related IDs discovered meanwhile are not re-queued
+            self.processed.add(judgment_id)
+            print(f"🔄 Đang xử lý: {judgment_id}")
+            return judgment_id
+        return None
+    
+    def start_writer(self):
+        """Concurrent modes persist through one writer thread so crawler threads never wait on SQLite locks"""
+        self.writer = DatabaseWriter(self.config.db_path, self.config.writer_queue_size, self.config.writer_batch_size,
+                                     self.metrics, ack_queue=self.config.durable_queue)
+        self.writer.start()
+    
+    def stop_writer(self):
+        """Flush pending writes, then fall back to direct writes"""
+        if self.writer:
+            self.writer.close()
+            self._collect_writer_results()
+            self.stats.writer_stats = self.writer.get_stats()
+            self.writer = None
+    
+    def _collect_writer_results(self):
+        """Committed documents join known_documents (with their new content hashes);
+        documents the writer could not persist count as failed"""
+        for judgment_id, content_hashes in self.writer.drain_committed():
+            self.known_documents.add(judgment_id)
+            if content_hashes:
+                self.content_hashes[judgment_id] = content_hashes
+        for judgment_id, error in self.writer.drain_errors():
+            print(f"⚠️  Lỗi lưu DB cho {judgment_id}: {error}")
+            self.stats.total_success -= 1
+            self.record_failure(judgment_id, error)
+    
+    def _finish_document(self, judgment_id: str, success: bool, result_data: Optional[Dict]):
+        """Bookkeeping shared by the concurrent crawl modes"""
+        self.handle_result(judgment_id, success, result_data)
+        if self.writer:
+            self._collect_writer_results()
+        self.stats.total_processed += 1
+        if self.stats.total_processed % 5 == 0:
+            self.print_progress()
+    
+    def run_worker_pool(self):
+        """Keep max_workers documents in flight; politeness comes from per-host token buckets"""
+        workers = self.config.max_workers
+        print(f"⚙️  Worker pool: {workers} workers")
+        in_flight = {}
+        
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vbpl-worker") as executor:
+            while True:
+                judgment_id = self._next_dispatch(len(in_flight), workers)
+                while judgment_id:
+                    in_flight[executor.submit(self._worker_process, judgment_id,
+                                              self.content_hashes.get(judgment_id))] = judgment_id
+                    judgment_id = self._next_dispatch(len(in_flight), workers)
+                
+                if not in_flight:
+                    break
+                
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    judgment_id = in_flight.pop(future)
+                    try:
+                        success, result_data, worker_name, elapsed = future.result()
+                        self.stats.record_worker(worker_name, success, elapsed)
+                    except Exception as e:
+                        print(f"❌ Exception: {judgment_id} - {e}")
+                        success, result_data = False, None
+                    self._finish_document(judgment_id, success, result_data)
+    
+    def run_pipeline(self):
+        """Staged crawl: fetch threads -> extraction process pool -> DB writer thread.
+        
+        Mỗi stage có sức chứa giới hạn: fetch dừng nhận ID mới khi đã có 2 x cpu_workers
+        documents chờ/đang extract, và writer queue chặn khi DB ghi không kịp.
+        """
+        fetch_workers = max(self.config.max_workers, 2)
+        engine = get_staged_processor_for_crawler(self.config.log_dir, self.rate_limiter,
+                                                  self.config.cpu_workers or None, **self._processor_options())
+        extract_capacity = 2 * engine.cpu_workers
+        print(f"⚙️  Pipeline: {fetch_workers} fetch threads -> {engine.cpu_workers} extract processes "
+              f"(backlog {extract_capacity}) -> DB writer")
+        fetching, extracting = {}, {}
+        
+        try:
+            with ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix="vbpl-fetch") as fetch_pool:
+                while True:
+                    while len(fetching) < fetch_workers and len(extracting) < extract_capacity:
+                        judgment_id = self._next_dispatch(len(fetching) + len(extracting),
+                                                          fetch_workers + extract_capacity)
+                        if not judgment_id:
+                            break
+                        future = fetch_pool.submit(engine.fetch, judgment_id, self.content_hashes.get(judgment_id))
+                        fetching[future] = (judgment_id, time.monotonic())
+                    
+                    if not fetching and not extracting:
+                        break
+                    
+                    done, _ = wait(list(fetching) + list(extracting), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future in fetching:
+                            judgment_id, started = fetching.pop(future)
+                            try:
+                                fetched = future.result()
+                            except Exception as e:
+                                print(f"❌ Fetch: {judgment_id} - {e}")
+                                self.stats.record_worker("fetch", False, time.monotonic() - started)
+                                self._finish_document(judgment_id, False, None)
+                                continue
+                            self.stats.record_worker("fetch", True, time.monotonic() - started)
+                            if "result" in fetched:
+                                self._finish_document(judgment_id, True, fetched["result"])
+                            else:
+                                extracting[engine.submit_extract(judgment_id, fetched)] = (judgment_id, time.monotonic())
+                        else:
+                            judgment_id, started = extracting.pop(future)
+                            try:
+                                success, result_data = True, future.result()
+                            except Exception as e:
+                                print(f"❌ Extract: {judgment_id} - {e}")
+                                success, result_data = False, None
+                            self.stats.record_worker("extract", success, time.monotonic() - started)
+                            self._finish_document(judgment_id, success, result_data)
+        finally:
+            self.stats.shared_clean_text_cache = engine.clean_text_cache_stats() or {}
+            engine.close()
+    
+    def run_async(self):
+        """asyncio crawl: metadata của document N+1 được fetch trong khi HTML của N đang tải"""
+        asyncio.run(self._crawl_async())
+    
+    async def _crawl_async(self):
+        limit = max(self.config.max_workers, 2)
+        print(f"⚙️  Async engine: {limit} documents in flight")
+        engine = get_async_processor_for_crawler(self.config.log_dir, self.rate_limiter, limit,
+                                                 **self._processor_options())
+        in_flight = {}
+        
+        try:
+            while True:
+                judgment_id = self._next_dispatch(len(in_flight), limit)
+                while judgment_id:
+                    task = asyncio.create_task(engine.process_document(judgment_id, self.content_hashes.get(judgment_id)))
+                    in_flight[task] = (judgment_id, time.monotonic())
+                    judgment_id = self._next_dispatch(len(in_flight), limit)
+                
+                if not in_flight:
+                    break
+                
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    judgment_id, started = in_flight.pop(task)
+                    success, result_data = task.result()
+                    self.stats.record_worker("async", success, time.monotonic() - started)
+                    self._finish_document(judgment_id, success, result_data)
+        finally:
+            for task in in_flight:
+                task.cancel()
+            engine.close()
+    
+    def print_progress(self):
+        """Print progress summary"""
+        print(f"\n📊 Tiến độ:")
+        print(f"   ✅ Thành công: {self.stats.total_success}")
+        print(f"   ❌ Thất bại: {self.stats.total_failed}")
+        print(f"   ⚠️  Đã có: {self.stats.total_skipped}")
+        if self.config.incremental:
+            print(f"   ♻️  Không đổi: {self.stats.total_unchanged}")
+        print(f"   📎 Queue còn: {len(self.queue)}")
+        if self.config.durable_queue:
+            print(f"   🗂️  Durable queue: {self.queue.counts()}")
+        if self.router:
+            print(f"   🧩 Shard {self.router.label()}: {self.router.stats}")
+        print(f"   🔗 Relations: {self.stats.relations_found}")
+    
+    def print_final_stats(self):
+        """Print final statistics"""
+        db_stats = self.db.get_stats()
+        print(f"\n📊 Thống kê cuối:")
+        print(f"   📄 Documents: {db_stats['total_documents']}")
+        print(f"   🧱 Elements: {sum(db_stats['elements_by_type'].values())}")
+        print(f"   🔗 Relations: {db_stats['total_relations']}")
+        print(f"   ⏱️  Thời gian: {(datetime.now() - self.stats.start_time).total_seconds():.1f}s")
+        print(f"   💾 Database: {self.config.db_path}")
+        
+        worker_stats = self.stats.worker_throughput()
+        if worker_stats:
+            print(f"   ⚙️  Workers:")
+            for name, worker in worker_stats.items():
+                print(f"      {name}: {worker['documents']} docs "
+                      f"(✅ {worker['success']} / ❌ {worker['failed']}), "
+                      f"{worker['docs_per_minute']:.2f} docs/min")
+        
+        writer_stats = self.stats.writer_stats
+        if writer_stats:
+            print(f"   ✍️  Writer: {writer_stats['documents']} docs in {writer_stats['batches']} commits "
+                  f"(avg {writer_stats['avg_batch_size']:.1f}/commit), "
+                  f"backpressure {writer_stats['backpressure_seconds']:.1f}s")
+        
+        profile_report = self.stats.profile_report(top_n=3)
+        if profile_report:
+            print(f"   🔬 Profiled {profile_report['profiled_documents']} docs, slowest stages:")
+            for stage, stage_stats in list(profile_report['slowest_stages'].items())[:3]:
+                print(f"      {stage}: {stage_stats['total_seconds']:.2f}s total, "
+                      f"max {stage_stats['max_seconds']:.2f}s ({stage_stats['slowest_document']})")
+            for name, hotspot in list(profile_report['hotspots'].items())[:3]:
+                print(f"      {name}: {hotspot['cumtime']:.2f}s cumulative, {hotspot['calls']} calls")
+        
+        clean_cache = self.stats.clean_text_cache_report()
+        if clean_cache['hits'] + clean_cache['shared_hits'] + clean_cache['misses']:
+            print(f"   🧽 clean_text cache: {clean_cache['hits']} hits, {clean_cache['shared_hits']} shared hits, "
+                  f"{clean_cache['misses']} misses ({clean_cache['hit_rate']:.1%} hit rate)")
+        
+        http_stats = self.http_stats()
+        cache_stats = http_stats['cache']
+        if cache_stats:
+            print(f"   🗄️  HTTP cache: {cache_stats['hits']} hits, {cache_stats['revalidated']} revalidated (304), "
+                  f"{cache_stats['misses']} misses, {cache_stats['stored']} stored")
+        if http_stats['retries']:
+            print(f"   🔁 HTTP retries: {http_stats['retries']}")
+        for host, host_stats in (http_stats['hosts'] or {}).items():
+            print(f"   🎚️  {host}: limit {host_stats['limit']}, latency {host_stats['latency_ms']}ms, "
+                  f"429 {host_stats['throttled']}, 5xx {host_stats['server_errors']}, "
+                  f"network {host_stats['network_errors']}, slow {host_stats['slow']}")
+    
+    def failed_ids(self) -> Optional[List[str]]:
+        """Failed IDs for the report - a Bloom seen-set cannot list them, the durable queue keeps them as 'failed'"""
+        if isinstance(self.failed, SeenSet):
+            return self.queue.failed_ids() if self.config.durable_queue else None
+        return list(self.failed)
+    
+    def generate_report(self):
+        """Generate final JSON report"""
+        report = {
+            "crawler_stats": self.stats.to_dict(),
+            "database_stats": self.db.get_stats(),
+            "config": {
+                "start_id": self.config.start_id,
+                "max_documents": self.config.max_documents,
+                "db_path": self.config.db_path
+            },
+            "failed_ids": self.failed_ids(),
+            "durable_queue": self.queue.counts() if self.config.durable_queue else None,
+            "http": self.http_stats(),
+            "shard": {"shard": self.router.label(), **self.router.stats} if self.router else None,
+            "stage_timings": self.metrics.summary() if self.metrics else None,
+            "profile": self.stats.profile_report(),
+            "queue_remaining": list(self.queue) if self.queue else []
+        }
+        
+        try:
+            with open(self.config.report_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"📄 Report saved: {self.config.report_path}")
+        except Exception as e:
+            print(f"⚠️  Cannot save report: {e}")
+
+    def _read_vbpl_diagram(self, doc_id: str) -> Tuple[str, Optional[List]]:
+        """vbpl_diagram từ JSON output của lần xử lý trước (backfill cho DB cũ)"""
+        for prefix in ("optimized_complete", "optimized_nested"):
+            path = os.path.join(self.config.log_dir, f"{prefix}_{doc_id}.json")
+            if not os.path.exists(path):
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    metadata = json.load(f).get('document_metadata') or {}
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Error re-scanning {doc_id}: {e}")
+                continue
+            if 'vbpl_diagram' in metadata:
+                return doc_id, metadata['vbpl_diagram']
+        return doc_id, None
+    
+    def complete_discovery_scan(self):
+        """Comprehensive scan để ensure không miss relations.
+        
+        vbpl_diagram được lưu trong documents nên scan là vài câu SQL; chỉ documents từ DB cũ
+        (cột vbpl_diagram NULL) mới cần đọc file JSON - đọc song song, một lần, rồi lưu lại.
+        """
+        print("🔍 Starting complete discovery scan...")
+        scan_started = time.monotonic()
+        
+        # 1. Backfill vbpl_diagram from JSON outputs for documents saved before the column existed
+        missing = self.db.documents_without_diagram()
+        if missing:
+            phase_started = time.monotonic()
+            print(f"📂 Backfilling vbpl_diagram from JSON files for {len(missing)} documents...")
+            diagrams = {}
+            with ThreadPoolExecutor(max_workers=16, thread_name_prefix="vbpl-scan") as executor:
+                for done, (doc_id, diagram) in enumerate(executor.map(self._read_vbpl_diagram, missing), 1):
+                    if diagram is not None:
+                        diagrams[doc_id] = diagram
+                    if done % 500 == 0 or done == len(missing):
+                        print(f"   📂 {done}/{len(missing)} read, {len(diagrams)} with vbpl_diagram "
+                              f"({time.monotonic() - phase_started:.1f}s)")
+            self.db.store_vbpl_diagrams(diagrams)
+        
+        # 2. Re-verify relations from stored diagrams (INSERT OR IGNORE, one transaction)
+        phase_started = time.monotonic()
+        checked, added = self.db.rebuild_relations()
+        print(f"   🔗 {checked} relations re-verified, {added} added ({time.monotonic() - phase_started:.1f}s)")
+        
+        # 3. Targets not in documents yet
+        phase_started = time.monotonic()
+        targets = self.db.undiscovered_targets()
+        if self.router:
+            targets = self.router.route(targets)
+        new_discoveries = self.queue.extend(
+            target_id for target_id in targets
+            if target_id not in self.known_documents and target_id not in self.processed
+        )
+        print(f"   📎 {len(targets)} undiscovered targets, {new_discoveries} newly queued "
+              f"({time.monotonic() - phase_started:.1f}s)")
+        
+        print(f"🔍 Discovery scan complete in {time.monotonic() - scan_started:.1f}s:")
+        print(f"   📎 New documents found: {new_discoveries}")
+        print(f"   🔗 Relations re-verified: {checked}")
+        
+        return new_discoveries
+
+def main():
+    """CLI entry point"""
+    parser = argparse.ArgumentParser(description="VBPL Document Crawler")
+    parser.add_argument("start_id", help="Starting judgment ID")
+    parser.add_argument("--log-dir", default="./logs", help="Log directory")
+    parser.add_argument("--db-path", default="./vbpl.db", help="SQLite database path")  
+    parser.add_argument("--report-path", default="./vbpl_report.json", help="Report output path")
+    parser.add_argument("--max-docs", type=int, default=100, help="Maximum documents to process")
+    parser.add_argument("--delay", type=float, default=2.0, help="Delay between requests (seconds)")
+    parser.add_argument("--workers", type=int, default=1, help="Documents in flight (>1 enables worker pool)")
+    parser.add_argument("--api-rate", type=float, default=None, help="Max requests/sec to lexcentra API (default 1/delay)")
+    parser.add_argument("--api-base-url", default=LEXCENTRA_BASE_URL, help="lexcentra API base URL, e.g. http://127.0.0.1:8780 (vbpl_mock_server.py)")
+    parser.add_argument("--html-rate", type=float, default=None, help="Max requests/sec per S3 HTML host (default 1/delay)")
+    parser.add_argument("--retries", type=int, default=3, help="Attempts per request on timeout/429/5xx (jittered backoff, honors Retry-After)")
+    parser.add_argument("--retry-backoff", type=float, default=1.0, help="Base seconds for retry backoff")
+    parser.add_argument("--adaptive", action="store_true", help="AIMD per-host concurrency up to --workers; ignores --delay unless rates are set")
+    parser.add_argument("--connect-timeout", type=float, default=10.0, help="HTTP connect timeout (seconds)")
+    parser.add_argument("--read-timeout", type=float, default=30.0, help="HTTP read timeout (seconds)")
+    parser.add_argument("--db-batch", type=int, default=8, help="Documents per commit in concurrent modes")
+    parser.add_argument("--db-queue", type=int, default=32, help="Documents waiting for the DB writer before workers block")
+    parser.add_argument("--durable-queue", action="store_true", help="Keep the frontier in processing_queue (crash-safe, shareable)")
+    parser.add_argument("--lease-seconds", type=float, default=300.0, help="Durable queue lease before an ID can be reclaimed")
+    parser.add_argument("--reset-leases", action="store_true", help="Release all leases on start (single crawler only)")
+    parser.add_argument("--bloom-capacity", type=int, default=0, help="Use a Bloom filter sized for N IDs as the seen-set (bounded memory)")
+    parser.add_argument("--bloom-fp-rate", type=float, default=0.001, help="Bloom filter false-positive rate (a false positive skips that ID)")
+    parser.add_argument("--cache-dir", default=None, help="On-disk HTTP response cache directory")
+    parser.add_argument("--api-ttl-hours", type=float, default=24.0, help="Serve cached API responses without revalidation for N hours (<0: forever)")
+    parser.add_argument("--html-ttl-hours", type=float, default=720.0, help="Serve cached S3 HTML without revalidation for N hours (<0: forever)")
+    parser.add_argument("--offline", action="store_true", help="Replay from the cache only, no network (default cache dir ./http_cache)")
+    parser.add_argument("--async", dest="async_mode", action="store_true", help="Use asyncio engine with pipelined API/S3 fetches")
+    parser.add_argument("--incremental", action="store_true", help="Re-check stored documents, re-extract only those whose API/HTML hashes changed")
+    parser.add_argument("--pipeline", action="store_true", help="Fetch on --workers threads, extract on a process pool, write on the DB writer thread")
+    parser.add_argument("--cpu-workers", type=int, default=0, help="Extraction processes for --pipeline (default: CPU count)")
+    parser.add_argument("--shard", type=parse_shard, default=None, help="Crawl only shard k/N of the ID space (k = 0..N-1); use one --db-path per shard (implies --durable-queue)")
+    parser.add_argument("--coord-store", default="./vbpl_coord.db", help="Coordination store shared by shards: SQLite path or postgres:// DSN")
+    parser.add_argument("--shard-idle", type=float, default=30.0, help="Seconds an idle shard waits for forwarded IDs before finishing")
+    parser.add_argument("--priority", action="store_true", help="Best-first frontier: follow replacement/guidance/amendment chains and near documents first")
+    parser.add_argument("--max-depth", type=int, default=None, help="Do not follow relations more than N hops from the start ID (IDs of unknown hop distance, e.g. resumed without --durable-queue, are not expanded)")
+    parser.add_argument("--relations", default=None, help="Comma-separated relation type keywords to follow, e.g. 'thay thế,hướng dẫn,sửa đổi'")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve live Prometheus metrics on 127.0.0.1:PORT/metrics")
+    parser.add_argument("--metrics-file", default=None, help="Rewrite live metrics (Prometheus text) to this file")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, help="Seconds between --metrics-file rewrites")
+    parser.add_argument("--profile-docs", default=None, help="Comma-separated judgment IDs to extract under cProfile (profile_<id>.prof/.json in --log-dir)")
+    parser.add_argument("--profile-sample", type=float, default=0.0, help="Also profile this fraction (0-1) of documents")
+    parser.add_argument("--clean-cache-size", type=int, default=32768, help="clean_text LRU entries per process (0 disables)")
+    parser.add_argument("--clean-cache-shared", action="store_true", help="Pipeline mode: share long cleaned strings between extraction processes via a manager process")
+    parser.add_argument("--complete-scan", action="store_true", help="Do complete discovery scan before resume")
+    
+    args = parser.parse_args()
+    
+    # Create configuration
+    config = CrawlerConfig(
+        start_id=args.start_id,
+        log_dir=args.log_dir,
+        db_path=args.db_path,
+        report_path=args.report_path,
+        max_documents=args.max_docs,
+        delay_between_requests=args.delay,
+        retry_attempts=args.retries,
+        retry_backoff=args.retry_backoff,
+        adaptive=args.adaptive,
+        max_workers=args.workers,
+        api_rate=args.api_rate,
+        api_base_url=args.api_base_url,
+        html_rate=args.html_rate,
+        async_mode=args.async_mode,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        writer_batch_size=args.db_batch,
+        writer_queue_size=args.db_queue,
+        durable_queue=args.durable_queue,
+        lease_seconds=args.lease_seconds,
+        reset_leases=args.reset_leases,
+        bloom_capacity=args.bloom_capacity,
+        bloom_fp_rate=args.bloom_fp_rate,
+        cache_dir=args.cache_dir or ("./http_cache" if args.offline else None),
+        cache_api_ttl=args.api_ttl_hours * 3600,
+        cache_html_ttl=args.html_ttl_hours * 3600,
+        offline=args.offline,
+        incremental=args.incremental,
+        pipeline=args.pipeline,
+        cpu_workers=args.cpu_workers,
+        shard=args.shard,
+        coord_store=args.coord_store,
+        shard_idle_timeout=args.shard_idle,
+        priority=args.priority,
+        max_depth=args.max_depth,
+        metrics_port=args.metrics_port,
+        metrics_file=args.metrics_file,
+        metrics_interval=args.metrics_interval,
+        profile_docs=tuple(doc_id.strip() for doc_id in args.profile_docs.split(",") if doc_id.strip()) if args.profile_docs else (),
+        profile_sample_rate=args.profile_sample,
+        clean_cache_size=args.clean_cache_size,
+        clean_cache_shared=args.clean_cache_shared,
+        relation_allowlist=[keyword.strip() for keyword in args.relations.split(",") if keyword.strip()] if args.relations else None,
+        complete_scan=args.complete_scan
+    )
+    
+    # Run crawler
+    crawler = VBPLCrawler(config)
+    try:
+        crawler.run()
+    except KeyboardInterrupt:
+        print(f"\n⏹️  Crawler stopped by user")
+        crawler.generate_report()
+        crawler.print_final_stats()
+    except Exception as e:
+        print(f"\n❌ Crawler error: {e}")
+        crawler.generate_report()
+if __name__ == "__main__":
     main()
\ No newline at end of file
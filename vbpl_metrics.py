@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+VBPL Metrics - live crawler metrics ở Prometheus text format
+Usage:
+    python vbpl_crawler.py 12345 --workers 8 --metrics-port 9108     # scrape http://127.0.0.1:9108/metrics
+    python vbpl_crawler.py 12345 --metrics-file ./logs/vbpl.prom      # rewritten every --metrics-interval seconds
+"""
+
+import os
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Seconds - fetch stages sit around 0.05-5s, parse/extract 0.01-10s, db_write 1-100ms
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# (name, type, help, [(labels, value), ...]) - một metric family cho render()
+MetricFamily = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+# ====================== HISTOGRAM ======================
+
+class Histogram:
+    """Cumulative-bucket latency histogram (không thread-safe, CrawlerMetrics giữ lock)"""
+    
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+    
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+    
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(le, count) pairs, kết thúc bằng +Inf"""
+        pairs, running = [], 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            pairs.append((repr(float(bound)), running))
+        pairs.append(("+Inf", self.count))
+        return pairs
+
+# ====================== REGISTRY ======================
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+class CrawlerMetrics:
+    """Stage latency histograms + gauges do crawler đẩy vào + samples đọc từ collector lúc render.
+    
+    observe()/set_gauge() gọi được từ mọi thread. `collector` chạy trên thread của HTTP server
+    hoặc file writer nên chỉ được đọc counters trong memory, không chạm SQLite connection.
+    """
+    
+    def __init__(self, collector: Optional[Callable[[], Iterable[MetricFamily]]] = None,
+                 buckets: Iterable[float] = DEFAULT_BUCKETS, prefix: str = "vbpl"):
+        self.collector = collector
+        self.buckets = tuple(buckets)
+        self.prefix = prefix
+        self.stages: Dict[str, Histogram] = {}
+        self.gauges: Dict[str, float] = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram(self.buckets)
+            histogram.observe(seconds)
+    
+    def observe_stages(self, timings: Optional[Dict[str, float]]):
+        """Stage timings của một document (result_data['stage_timings'])"""
+        for stage, seconds in (timings or {}).items():
+            self.observe(stage, seconds)
+    
+    def set_gauge(self, name: str, value: float):
+        with self._lock:
+            self.gauges[name] = value
+    
+    def render(self) -> str:
+        """Prometheus text exposition format 0.0.4"""
+        lines = []
+        histogram_name = f"{self.prefix}_stage_seconds"
+        with self._lock:
+            stages = {stage: (histogram.cumulative(), histogram.sum, histogram.count)
+                      for stage, histogram in sorted(self.stages.items())}
+            gauges = dict(sorted(self.gauges.items()))
+        
+        lines.append(f"# HELP {histogram_name} Per-document latency of each crawl stage")
+        lines.append(f"# TYPE {histogram_name} histogram")
+        for stage, (cumulative, total, count) in stages.items():
+            for bound, bucket_count in cumulative:
+                lines.append(f'{histogram_name}_bucket{_format_labels({"stage": stage, "le": bound})} {bucket_count}')
+            lines.append(f"{histogram_name}_sum{_format_labels({'stage': stage})} {total!r}")
+            lines.append(f"{histogram_name}_count{_format_labels({'stage': stage})} {count}")
+        
+        for name, value in gauges.items():
+            lines.append(f"# TYPE {self.prefix}_{name} gauge")
+            lines.append(f"{self.prefix}_{name} {value!r}")
+        
+        for name, kind, help_text, samples in (self.collector() if self.collector else ()):
+            lines.append(f"# HELP {self.prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {self.prefix}_{name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{self.prefix}_{name}{_format_labels(labels)} {float(value)!r}")
+        return "\n".join(lines) + "\n"
+    
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """count / mean / sum per stage cho JSON report"""
+        with self._lock:
+            return {stage: {"count": histogram.count, "sum_seconds": round(histogram.sum, 6),
+                            "mean_seconds": round(histogram.sum / histogram.count, 6) if histogram.count else 0.0}
+                    for stage, histogram in sorted(self.stages.items())}
+
+# ====================== EXPORTERS ======================
+
+def start_metrics_server(metrics: CrawlerMetrics, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve GET /metrics trên daemon thread; trả về server để caller shutdown()"""
+    
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            pass  # scrapes would flood the crawler output
+    
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="vbpl-metrics-http", daemon=True).start()
+    return server
+
+class MetricsFileWriter(threading.Thread):
+    """Ghi lại metrics file mỗi `interval` giây (atomic replace), ví dụ cho node_exporter textfile collector"""
+    
+    def __init__(self, metrics: CrawlerMetrics, path: str, interval: float = 10.0):
+        super().__init__(name="vbpl-metrics-file", daemon=True)
+        self.metrics = metrics
+        self.path = path
+        self.interval = max(0.5, interval)
+        self._stop_event = threading.Event()
+    
+    def write(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.metrics.render())
+        os.replace(tmp_path, self.path)
+    
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                print(f"⚠️  Cannot write metrics file {self.path}: {e}")
+    
+    def stop(self):
+        """Dừng thread và ghi snapshot cuối cùng"""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+        self.write()
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+VBPL Mock Server - lexcentra search API + S3 HTML giả lập trên máy local để load-test crawler
+Usage:
+    python vbpl_mock_server.py --graph 2000 --fanout 3 --latency lognormal:80:0.6 --rate-429 0.02 --rate-5xx 0.01
+    python vbpl_mock_server.py --fixtures ./fixtures --slow-rate 0.05 --truncate-rate 0.02 --max-concurrency 8
+    python vbpl_crawler.py 1 --api-base-url http://127.0.0.1:8780 --workers 16 --adaptive --delay 0
+
+API: http://HOST:PORT/api/search/{id}?type_document=4&is_vbpl_diagram=1, S3: http://HOST:PORT+1/{id}.html
+Fixture dir: {id}.json (API payload, có hoặc không có "data" wrapper) và {id}.html. Stats: GET /__stats
+"""
+
+import os
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+RELATION_TYPES = ["Văn bản hướng dẫn", "Văn bản thay thế", "Văn bản sửa đổi bổ sung", "Văn bản liên quan",
+                  "Văn bản được hướng dẫn", "Văn bản căn cứ"]
+DOC_TYPES = ["Luật", "Nghị định", "Thông tư", "Quyết định"]
+
+# ====================== FAULT PROFILE ======================
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """'0' | 'fixed:MS' | 'uniform:LO:HI' | 'exp:MEAN' | 'lognormal:MEDIAN:SIGMA' -> sampler trả về giây"""
+    name, *params = spec.split(":")
+    try:
+        values = [float(param) / 1000 for param in params]
+        if name in ("0", "none"):
+            return lambda rng: 0.0
+        if name == "fixed" and len(values) == 1:
+            return lambda rng: values[0]
+        if name == "uniform" and len(values) == 2:
+            return lambda rng: rng.uniform(values[0], values[1])
+        if name == "exp" and len(values) == 1:
+            return lambda rng: rng.expovariate(1 / values[0]) if values[0] > 0 else 0.0
+        if name == "lognormal" and len(params) == 2:
+            median, sigma = values[0], float(params[1])
+            return lambda rng: rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+    except ValueError:
+        pass
+    raise argparse.ArgumentTypeError(f"bad latency spec {spec!r} (0, fixed:MS, uniform:LO:HI, exp:MEAN, lognormal:MEDIAN:SIGMA)")
+
+@dataclass
+class FaultProfile:
+    """Lỗi được tiêm vào mỗi response, xác suất độc lập cho từng request"""
+    latency: Callable[[random.Random], float] = lambda rng: 0.0
+    rate_429: float = 0.0
+    rate_5xx: float = 0.0
+    retry_after: Optional[float] = 1.0  # seconds in the Retry-After header of 429/503, None = omit
+    slow_rate: float = 0.0  # fraction of bodies dripped at slow_bytes_per_sec
+    slow_bytes_per_sec: float = 16384.0
+    truncate_rate: float = 0.0  # fraction of bodies cut in half (Content-Length says full size)
+    max_concurrency: int = 0  # >0: answer 429 above this many requests in flight on the listener
+
+# ====================== DOCUMENT SOURCES ======================
+
+class SyntheticGraph:
+    """Đồ thị quan hệ tất định: ID 1..size, mỗi document trỏ tới `fanout` ID khác"""
+    
+    def __init__(self, size: int, fanout: int = 3, sections: int = 30, seed: int = 0):
+        self.size = size
+        self.fanout = fanout
+        self.sections = sections
+        self.seed = seed
+    
+    def _rng(self, judgment_id: str) -> random.Random:
+        return random.Random(f"{self.seed}:{judgment_id}")
+    
+    def api_data(self, judgment_id: str) -> Optional[Dict]:
+        if not judgment_id.isdigit() or not 1 <= int(judgment_id) <= self.size:
+            return None
+        rng = self._rng(judgment_id)
+        related: Dict[str, List[str]] = {}
+        for _ in range(rng.randint(0, 2 * self.fanout)):
+            target = str(rng.randint(1, self.size))
+            if target != judgment_id:
+                related.setdefault(rng.choice(RELATION_TYPES), []).append(target)
+        doc_type = rng.choice(DOC_TYPES)
+        return {
+            "id_judgment": judgment_id, "judgment_number": f"{judgment_id}/{2000 + int(judgment_id) % 25}/MOCK",
+            "judgment_name": f"{doc_type} mock số {judgment_id}", "full_judgment_name": f"{doc_type} mock số {judgment_id}",
+            "doc_type": doc_type, "state": "Còn hiệu lực", "issuing_authority": "Mock",
+            "vbpl_diagram": [{"vbpl_diagram_name": relation_type, "id_judgments": ", ".join(ids), "count": len(ids)}
+                             for relation_type, ids in related.items()]
+        }
+    
+    def html(self, judgment_id: str) -> Optional[bytes]:
+        if self.api_data(judgment_id) is None:
+            return None
+        rng = self._rng(judgment_id)
+        parts = ["<html><body>", f'<p align="center">VĂN BẢN MOCK {judgment_id}</p>']
+        for section in range(1, rng.randint(max(1, self.sections // 2), max(1, self.sections * 3 // 2)) + 1):
+            if section % 10 == 1:
+                parts.append(f'<p align="center">Chương {section // 10 + 1}</p><p align="center">QUY ĐỊNH NHÓM {section // 10 + 1}</p>')
+            parts.append(f"<p>Điều {section}. Quy định số {section} của văn bản {judgment_id}</p>")
+            for clause in range(1, 4):
+                parts.append(f"<p>{clause}. Tổ chức, cá nhân thực hiện theo khoản {clause} Điều {section}.</p>")
+                parts.append("<p>a) Có hồ sơ hợp lệ;</p><p>b) Nộp phí theo quy định.</p>")
+        parts.append("</body></html>")
+        return "\n".join(parts).encode("utf-8")
+
+class FixtureSource:
+    """{id}.json + {id}.html trong một thư mục"""
+    
+    def __init__(self, fixture_dir: str):
+        self.fixture_dir = fixture_dir
+    
+    def api_data(self, judgment_id: str) -> Optional[Dict]:
+        path = os.path.join(self.fixture_dir, f"{os.path.basename(judgment_id)}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        return payload.get("data", payload)
+    
+    def html(self, judgment_id: str) -> Optional[bytes]:
+        path = os.path.join(self.fixture_dir, f"{os.path.basename(judgment_id)}.html")
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+# ====================== SERVER ======================
+
+class MockState:
+    """Shared giữa API và S3 listener: source, faults, RNG, counters"""
+    
+    def __init__(self, source, api_faults: FaultProfile, s3_faults: FaultProfile, s3_base_url: str, seed: int = 0):
+        self.source = source
+        self.faults = {"api": api_faults, "s3": s3_faults}
+        self.s3_base_url = s3_base_url
+        self.rng = random.Random(seed)
+        self.stats: Counter = Counter()
+        self.in_flight = {"api": 0, "s3": 0}
+        self.peak_in_flight = {"api": 0, "s3": 0}
+        self._lock = threading.Lock()
+    
+    def draw(self) -> float:
+        with self._lock:
+            return self.rng.random()
+    
+    def latency(self, listener: str) -> float:
+        with self._lock:
+            return self.faults[listener].latency(self.rng)
+    
+    def enter(self, listener: str) -> int:
+        with self._lock:
+            self.in_flight[listener] += 1
+            self.peak_in_flight[listener] = max(self.peak_in_flight[listener], self.in_flight[listener])
+            return self.in_flight[listener]
+    
+    def leave(self, listener: str):
+        with self._lock:
+            self.in_flight[listener] -= 1
+    
+    def count(self, listener: str, outcome: str):
+        with self._lock:
+            self.stats[f"{listener}.{outcome}"] += 1
+    
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {"responses": dict(sorted(self.stats.items())), "in_flight": dict(self.in_flight),
+                    "peak_in_flight": dict(self.peak_in_flight)}
+
+def make_handler(state: MockState, listener: str):
+    faults = state.faults[listener]
+    
+    class MockHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, như S3/lexcentra
+        
+        def log_message(self, format, *args):
+            pass
+        
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path == "/__stats":
+                self._send(200, json.dumps(state.snapshot(), indent=2).encode("utf-8"), "application/json")
+                return
+            
+            in_flight = state.enter(listener)
+            try:
+                delay = state.latency(listener)
+                if delay:
+                    time.sleep(delay)
+                if faults.max_concurrency and in_flight > faults.max_concurrency:
+                    self._fault(429)
+                    return
+                roll = state.draw()
+                if roll < faults.rate_429:
+                    self._fault(429)
+                    return
+                if roll < faults.rate_429 + faults.rate_5xx:
+                    self._fault((500, 502, 503, 504)[int(state.draw() * 4)])
+                    return
+                
+                body, content_type = self._resolve(path)
+                if body is None:
+                    state.count(listener, "404")
+                    self._send(404, b'{"error": "not found"}', "application/json")
+                    return
+                etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    state.count(listener, "304")
+                    self._send(304, b"", content_type, {"ETag": etag})
+                    return
+                
+                roll = state.draw()
+                if roll < faults.truncate_rate:
+                    state.count(listener, "truncated")
+                    self._send(200, body, content_type, {"ETag": etag}, truncate=True)
+                elif roll < faults.truncate_rate + faults.slow_rate:
+                    state.count(listener, "slow")
+                    self._send(200, body, content_type, {"ETag": etag}, bytes_per_sec=faults.slow_bytes_per_sec)
+                else:
+                    state.count(listener, "200")
+                    self._send(200, body, content_type, {"ETag": etag})
+            except (BrokenPipeError, ConnectionResetError):
+                state.count(listener, "client_gone")
+            finally:
+                state.leave(listener)
+        
+        def _resolve(self, path: str) -> Tuple[Optional[bytes], str]:
+            if listener == "api":
+                prefix = "/api/search/"
+                data = state.source.api_data(path[len(prefix):]) if path.startswith(prefix) else None
+                if data is None:
+                    return None, "application/json"
+                data = dict(data, s3_key=f"{state.s3_base_url}/{data.get('id_judgment', path[len(prefix):])}.html")
+                return json.dumps({"data": data}, ensure_ascii=False).encode("utf-8"), "application/json"
+            judgment_id = path.lstrip("/").rsplit(".", 1)[0]
+            return state.source.html(judgment_id), "text/html; charset=utf-8"
+        
+        def _fault(self, status: int):
+            state.count(listener, str(status))
+            headers = {}
+            if status in (429, 503) and faults.retry_after is not None:
+                headers["Retry-After"] = f"{faults.retry_after:g}"
+            self._send(status, b'{"error": "injected"}', "application/json", headers)
+        
+        def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None,
+                  truncate: bool = False, bytes_per_sec: float = 0.0):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            if status != 304:
+                self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if status == 304:
+                return
+            if truncate:
+                # Full Content-Length, half the bytes, then drop the connection
+                self.wfile.write(body[:len(body) // 2])
+                self.wfile.flush()
+                self.close_connection = True
+                return
+            if bytes_per_sec > 0:
+                chunk = max(1, int(bytes_per_sec / 10))
+                for offset in range(0, len(body), chunk):
+                    self.wfile.write(body[offset:offset + chunk])
+                    self.wfile.flush()
+                    time.sleep(0.1)
+                return
+            self.wfile.write(body)
+    
+    return MockHandler
+
+def start_mock_servers(source, api_faults: FaultProfile, s3_faults: FaultProfile, host: str = "127.0.0.1",
+                       port: int = 8780, s3_port: Optional[int] = None, seed: int = 0):
+    """API listener trên `port`, S3 listener trên `s3_port` (mặc định port + 1; 0 = tự chọn).
+    Hai host riêng để per-host rate limit/AIMD của crawler hoạt động như với lexcentra + S3."""
+    s3_server = ThreadingHTTPServer((host, port + 1 if s3_port is None and port else (s3_port or 0)), None)
+    state = MockState(source, api_faults, s3_faults, f"http://{host}:{s3_server.server_address[1]}", seed)
+    s3_server.RequestHandlerClass = make_handler(state, "s3")
+    api_server = ThreadingHTTPServer((host, port), make_handler(state, "api"))
+    for server, name in ((api_server, "api"), (s3_server, "s3")):
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name=f"vbpl-mock-{name}", daemon=True).start()
+    return api_server, s3_server, state
+
+def main():
+    parser = argparse.ArgumentParser(description="Local lexcentra API + S3 stand-in with latency and fault injection")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8780, help="API port (S3 listens on --s3-port)")
+    parser.add_argument("--s3-port", type=int, default=None, help="S3 HTML port (default --port + 1)")
+    source_group = parser.add_mutually_exclusive_group()
+    source_group.add_argument("--fixtures", default=None, help="Directory with {id}.json and {id}.html")
+    source_group.add_argument("--graph", type=int, default=1000, help="Synthetic relation graph with IDs 1..N")
+    parser.add_argument("--fanout", type=int, default=3, help="Synthetic graph: average relations per document")
+    parser.add_argument("--sections", type=int, default=30, help="Synthetic graph: average Điều per document")
+    parser.add_argument("--latency", type=parse_latency, default=parse_latency("0"),
+                        help="API latency: 0 | fixed:MS | uniform:LO:HI | exp:MEAN | lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--s3-latency", type=parse_latency, default=None, help="S3 latency (default --latency)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered 429")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="Fraction of requests answered 500/502/503/504")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds on 429/503 (<0: omit)")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Fraction of bodies dripped slowly")
+    parser.add_argument("--slow-bps", type=float, default=16384.0, help="Bytes/sec for slow bodies")
+    parser.add_argument("--truncate-rate", type=float, default=0.0, help="Fraction of bodies truncated mid-transfer")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="429 above N in-flight requests per listener")
+    parser.add_argument("--seed", type=int, default=0, help="RNG seed (graph shape and fault draws)")
+    args = parser.parse_args()
+    
+    source = FixtureSource(args.fixtures) if args.fixtures else SyntheticGraph(args.graph, args.fanout, args.sections, args.seed)
+    faults = dict(rate_429=args.rate_429, rate_5xx=args.rate_5xx,
+                  retry_after=args.retry_after if args.retry_after >= 0 else None,
+                  slow_rate=args.slow_rate, slow_bytes_per_sec=args.slow_bps,
+                  truncate_rate=args.truncate_rate, max_concurrency=args.max_concurrency)
+    api_server, s3_server, state = start_mock_servers(
+        source, FaultProfile(latency=args.latency, **faults), FaultProfile(latency=args.s3_latency or args.latency, **faults),
+        args.host, args.port, args.s3_port, args.seed)
+    
+    api_base = f"http://{args.host}:{api_server.server_address[1]}"
+    print(f"🧪 Mock lexcentra API: {api_base}/api/search/{{id}}")
+    print(f"🧪 Mock S3: {state.s3_base_url}/{{id}}.html")
+    print(f"📊 Stats: {api_base}/__stats")
+    print(f"👉 python vbpl_crawler.py 1 --api-base-url {api_base} --delay 0 --workers 8")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(f"\n⏹️  Mock server stopped")
+        print(json.dumps(state.snapshot(), ensure_ascii=False, indent=2))
+    finally:
+        api_server.shutdown()
+        s3_server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+VBPL Shards - chia không gian judgment ID cho nhiều crawler chạy song song
+Usage:
+    python vbpl_crawler.py 12345 --shard 0/4 --db-path vbpl_shard0.db --coord-store coord.db
+    python vbpl_shards.py status --coord-store coord.db
+    python vbpl_shards.py merge vbpl.db vbpl_shard0.db vbpl_shard1.db ...
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Dict, List, Tuple, Iterable, Optional
+
+try:
+    import psycopg  # Postgres coordination store (optional)
+except ImportError:
+    psycopg = None
+
+# ====================== SHARD ASSIGNMENT ======================
+
+def shard_of(judgment_id: str, num_shards: int) -> int:
+    """Stable shard index - md5 không phụ thuộc PYTHONHASHSEED hay máy chạy"""
+    digest = hashlib.md5(str(judgment_id).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % num_shards
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """'k/N' -> (k, N) với 0 <= k < N (argparse type)"""
+    try:
+        index, total = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"shard must look like k/N, got {spec!r}")
+    if total < 1 or not 0 <= index < total:
+        raise argparse.ArgumentTypeError(f"shard index must be in 0..N-1, got {spec!r}")
+    return index, total
+
+# ====================== COORDINATION STORE ======================
+
+class CoordinationStore(ABC):
+    """Inbox chung giữa các shard: shard phát hiện ID của shard khác thì forward vào đây.
+    
+    Mỗi judgment_id chỉ có một dòng (PRIMARY KEY), nên một ID được nhiều shard phát hiện
+    vẫn chỉ được giao một lần. Dòng đã giao được giữ lại (delivered_at) để dedup tiếp.
+    drain() không đánh dấu gì: shard gọi acknowledge() sau khi đã lưu các ID vào queue local,
+    nên shard crash giữa hai bước sẽ nhận lại chúng lần sau thay vì mất.
+    Mỗi dòng mang depth (số hop từ start ID, NULL = chưa biết) để shard nhận giữ được --max-depth,
+    và score best-first để --priority xếp ID được forward như ID tự phát hiện.
+    """
+    
+    placeholder = "?"
+    
+    CREATE_SQL = """
+        CREATE TABLE IF NOT EXISTS shard_inbox (
+            judgment_id TEXT PRIMARY KEY,
+            shard INTEGER NOT NULL,
+            source_shard INTEGER,
+            added_at DOUBLE PRECISION NOT NULL,
+            delivered_at DOUBLE PRECISION,
+            depth INTEGER,
+            score DOUBLE PRECISION
+        )
+    """
+    INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_inbox_pending ON shard_inbox(shard, delivered_at, added_at)"
+    FORWARD_SQL = """
+        INSERT INTO shard_inbox (judgment_id, shard, source_shard, added_at, depth, score)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (judgment_id) DO NOTHING
+    """
+    # An undelivered ID found again over a shorter path keeps the smaller depth
+    SHORTER_DEPTH_SQL = """
+        UPDATE shard_inbox SET depth = ?
+        WHERE judgment_id = ? AND delivered_at IS NULL AND (depth IS NULL OR depth > ?)
+    """
+    # ... and the higher score
+    HIGHER_SCORE_SQL = """
+        UPDATE shard_inbox SET score = ?
+        WHERE judgment_id = ? AND delivered_at IS NULL AND (score IS NULL OR score < ?)
+    """
+    STATUS_SQL = """
+        CREATE TABLE IF NOT EXISTS shard_status (
+            shard INTEGER PRIMARY KEY,
+            busy INTEGER NOT NULL,
+            updated_at DOUBLE PRECISION NOT NULL
+        )
+    """
+    HEARTBEAT_SQL = """
+        INSERT INTO shard_status (shard, busy, updated_at) VALUES (?, ?, ?)
+        ON CONFLICT (shard) DO UPDATE SET busy = excluded.busy, updated_at = excluded.updated_at
+    """
+    COUNTS_SQL = """
+        SELECT shard, SUM(CASE WHEN delivered_at IS NULL THEN 1 ELSE 0 END), COUNT(*)
+        FROM shard_inbox GROUP BY shard ORDER BY shard
+    """
+    
+    def __init__(self, conn):
+        self.conn = conn
+        self._lock = threading.Lock()
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute(self.CREATE_SQL)
+            self._ensure_columns(cursor)
+            cursor.execute(self.INDEX_SQL)
+            cursor.execute(self.STATUS_SQL)
+            self.conn.commit()
+    
+    def _sql(self, sql: str) -> str:
+        return sql.replace("?", self.placeholder)
+    
+    INBOX_COLUMNS = {"depth": "INTEGER", "score": "DOUBLE PRECISION"}
+    
+    def _ensure_columns(self, cursor):
+        """Stores created before depth/score were forwarded"""
+        for column, column_type in self.INBOX_COLUMNS.items():
+            cursor.execute(f"ALTER TABLE shard_inbox ADD COLUMN IF NOT EXISTS {column} {column_type}")
+    
+    def forward(self, ids_by_shard: Dict[int, List[str]], source_shard: int, depth: Optional[int] = None,
+                scores: Optional[Dict[str, float]] = None) -> int:
+        """Add IDs (all `depth` hops from the start ID, best-first `scores`) to the target shards' inboxes,
+        return số ID mới"""
+        now = time.time()
+        scores = scores or {}
+        rows = [(judgment_id, shard, source_shard, now, depth, scores.get(judgment_id))
+                for shard, judgment_ids in ids_by_shard.items() for judgment_id in judgment_ids]
+        if not rows:
+            return 0
+        with self._lock:
+            cursor = self.conn.cursor()
+            added = 0
+            for row in rows:
+                cursor.execute(self._sql(self.FORWARD_SQL), row)
+                if cursor.rowcount > 0:
+                    added += cursor.rowcount
+                    continue
+                if depth is not None:
+                    cursor.execute(self._sql(self.SHORTER_DEPTH_SQL), (depth, row[0], depth))
+                if row[5] is not None:
+                    cursor.execute(self._sql(self.HIGHER_SCORE_SQL), (row[5], row[0], row[5]))
+            self.conn.commit()
+        return added
+    
+    @abstractmethod
+    def drain(self, shard: int, limit: int = 500) -> List[Tuple[str, Optional[int], Optional[float]]]:
+        """Up to `limit` undelivered (judgment_id, depth, score) of `shard`, oldest first
+        (still undelivered until acknowledge())"""
+    
+    def acknowledge(self, judgment_ids: List[str]):
+        """Mark IDs delivered - call only once the receiving shard has persisted them"""
+        if not judgment_ids:
+            return
+        now = time.time()
+        with self._lock:
+            cursor = self.conn.cursor()
+            for judgment_id in judgment_ids:
+                cursor.execute(self._sql("UPDATE shard_inbox SET delivered_at = ? WHERE judgment_id = ?"),
+                               (now, judgment_id))
+            self.conn.commit()
+    
+    def heartbeat(self, shard: int, busy: bool):
+        """Shard đang xử lý (busy) hay đang chờ inbox - các shard rảnh chỉ kết thúc khi không còn shard nào bận"""
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute(self._sql(self.HEARTBEAT_SQL), (shard, 1 if busy else 0, time.time()))
+            self.conn.commit()
+    
+    def busy_shards(self, exclude: int, stale_after: float) -> List[int]:
+        """Shards khác còn bận; heartbeat cũ hơn `stale_after` giây coi như process đã chết"""
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute(self._sql("SELECT shard FROM shard_status WHERE busy = 1 AND shard != ? AND updated_at > ?"),
+                           (exclude, time.time() - stale_after))
+            rows = cursor.fetchall()
+            self.conn.commit()
+        return [row[0] for row in rows]
+    
+    def counts(self) -> Dict[int, Dict[str, int]]:
+        """Per shard: IDs chờ giao và tổng số đã forward"""
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute(self.COUNTS_SQL)
+            rows = cursor.fetchall()
+            self.conn.commit()
+        return {shard: {"pending": int(pending or 0), "forwarded": int(total)} for shard, pending, total in rows}
+    
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+class SQLiteCoordinationStore(CoordinationStore):
+    """Coordination store trên một file SQLite - đủ cho nhiều process trên một máy hoặc một volume chung"""
+    
+    def __init__(self, path: str):
+        conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        super().__init__(conn)
+    
+    def _ensure_columns(self, cursor):
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(shard_inbox)")}
+        for column, column_type in self.INBOX_COLUMNS.items():
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE shard_inbox ADD COLUMN {column} {column_type}")
+    
+    def drain(self, shard: int, limit: int = 500) -> List[Tuple[str, Optional[int], Optional[float]]]:
+        with self._lock:
+            return [(row[0], row[1], row[2]) for row in self.conn.execute("""
+                SELECT judgment_id, depth, score FROM shard_inbox
+                WHERE shard = ? AND delivered_at IS NULL
+                ORDER BY added_at, rowid
+                LIMIT ?
+            """, (shard, limit))]
+
+class PostgresCoordinationStore(CoordinationStore):
+    """Coordination store trên Postgres - cho các shard chạy trên nhiều máy (cần psycopg)"""
+    
+    placeholder = "%s"
+    
+    def __init__(self, dsn: str):
+        if psycopg is None:
+            raise ImportError("Postgres coordination store requires psycopg (pip install psycopg)")
+        super().__init__(psycopg.connect(dsn))
+    
+    def drain(self, shard: int, limit: int = 500) -> List[Tuple[str, Optional[int], Optional[float]]]:
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute("""
+                SELECT judgment_id, depth, score FROM shard_inbox
+                WHERE shard = %s AND delivered_at IS NULL
+                ORDER BY added_at
+                LIMIT %s
+            """, (shard, limit))
+            entries = [(row[0], row[1], row[2]) for row in cursor.fetchall()]
+            self.conn.commit()
+        return entries
+
+def open_coordination_store(location: str) -> CoordinationStore:
+    """postgres://... / postgresql://... -> Postgres, còn lại là đường dẫn file SQLite"""
+    if location.startswith(("postgres://", "postgresql://")):
+        return PostgresCoordinationStore(location)
+    return SQLiteCoordinationStore(location)
+
+# ====================== SHARD ROUTER ======================
+
+class ShardRouter:
+    """Shard k/N của crawler: giữ ID của mình, forward ID của shard khác, nhận ID được forward tới.
+    
+    Shard hết việc chờ inbox cho tới khi mọi shard khác cũng rảnh liên tục `idle_timeout` giây,
+    vì shard còn bận vẫn có thể forward ID mới.
+    """
+    
+    HEARTBEAT_INTERVAL = 5.0
+    
+    def __init__(self, shard_index: int, num_shards: int, store: CoordinationStore,
+                 idle_timeout: float = 30.0, poll_interval: float = 1.0, stale_after: float = 600.0):
+        self.shard_index = shard_index
+        self.num_shards = num_shards
+        self.store = store
+        self.idle_timeout = idle_timeout
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.stats = {"owned": 0, "forwarded": 0, "received": 0}
+        self._last_heartbeat = 0.0
+        self._set_busy(True)
+    
+    def _set_busy(self, busy: bool):
+        self.store.heartbeat(self.shard_index, busy)
+        self._last_heartbeat = time.monotonic()
+    
+    def owns(self, judgment_id: str) -> bool:
+        return shard_of(judgment_id, self.num_shards) == self.shard_index
+    
+    def route(self, judgment_ids: Iterable[str], depth: Optional[int] = None,
+              scores: Optional[Dict[str, float]] = None) -> List[str]:
+        """Return the IDs this shard owns, forward the rest (with their depth and score) to the coordination store"""
+        owned = []
+        foreign: Dict[int, List[str]] = defaultdict(list)
+        for judgment_id in judgment_ids:
+            shard = shard_of(judgment_id, self.num_shards)
+            if shard == self.shard_index:
+                owned.append(judgment_id)
+            else:
+                foreign[shard].append(judgment_id)
+        
+        if foreign:
+            self.stats["forwarded"] += self.store.forward(foreign, self.shard_index, depth, scores)
+        self.stats["owned"] += len(owned)
+        if time.monotonic() - self._last_heartbeat >= self.HEARTBEAT_INTERVAL:
+            self._set_busy(True)
+        return owned
+    
+    def pull(self, wait: bool = False) -> List[Tuple[str, Optional[int], Optional[float]]]:
+        """(judgment_id, depth, score) forwarded to this shard - gọi acknowledge() sau khi đã lưu chúng vào queue local.
+        wait=True (shard hết việc): poll inbox, trả về rỗng khi không shard nào bận trong idle_timeout giây liên tục"""
+        entries = self.store.drain(self.shard_index)
+        if entries or not wait:
+            self.stats["received"] += len(entries)
+            return entries
+        
+        self._set_busy(False)
+        idle_since = time.monotonic()
+        while True:
+            time.sleep(self.poll_interval)
+            entries = self.store.drain(self.shard_index)
+            if entries:
+                self._set_busy(True)
+                self.stats["received"] += len(entries)
+                return entries
+            if self.store.busy_shards(self.shard_index, self.stale_after):
+                idle_since = time.monotonic()
+            elif time.monotonic() - idle_since >= self.idle_timeout:
+                return []
+    
+    def acknowledge(self, judgment_ids: List[str]):
+        self.store.acknowledge(judgment_ids)
+    
+    def close(self):
+        """Crawler finished (hoặc dừng giữa chừng) - không để shard khác chờ heartbeat này"""
+        self._set_busy(False)
+        self.store.close()
+    
+    def label(self) -> str:
+        return f"{self.shard_index}/{self.num_shards}"
+
+# ====================== MERGE ======================
+
+MERGE_TABLES = ("documents", "elements", "vbpl_relations")
+
+def _table_columns(conn: sqlite3.Connection, schema: str, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+def merge_databases(output_path: str, shard_paths: List[str]) -> Dict[str, int]:
+    """Gộp các shard DB vào `output_path` (INSERT OR IGNORE - document đã có được giữ nguyên).
+    processing_queue là trạng thái riêng của từng shard nên không được gộp."""
+    from vbpl_crawler import SQLiteDatabase  # schema owner; lazy to avoid a circular import
+    
+    db = SQLiteDatabase(output_path)
+    totals = {table: 0 for table in MERGE_TABLES}
+    try:
+        for shard_path in shard_paths:
+            if os.path.abspath(shard_path) == os.path.abspath(output_path):
+                continue
+            started = time.time()
+            db.conn.execute("ATTACH DATABASE ? AS shard", (shard_path,))
+            try:
+                with db.conn:
+                    for table in MERGE_TABLES:
+                        # Column intersection: shards created by older versions may lack newer columns
+                        shard_columns = set(_table_columns(db.conn, "shard", table))
+                        columns = [column for column in _table_columns(db.conn, "main", table)
+                                   if column in shard_columns and column != "id"]
+                        column_list = ", ".join(columns)
+                        cursor = db.conn.execute(
+                            f"INSERT OR IGNORE INTO main.{table} ({column_list}) SELECT {column_list} FROM shard.{table}"
+                        )
+                        totals[table] += cursor.rowcount
+            finally:
+                db.conn.execute("DETACH DATABASE shard")
+            print(f"🔀 Merged {shard_path} ({time.time() - started:.1f}s)")
+    finally:
+        db.close()
+    return totals
+
+# ====================== CLI ======================
+
+def main():
+    parser = argparse.ArgumentParser(description="VBPL shard tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    merge_parser = subparsers.add_parser("merge", help="Merge per-shard databases into one")
+    merge_parser.add_argument("output", help="Merged database path (e.g. vbpl.db)")
+    merge_parser.add_argument("shards", nargs="+", help="Per-shard database paths")
+    
+    status_parser = subparsers.add_parser("status", help="Show coordination store inbox counts")
+    status_parser.add_argument("--coord-store", default="./vbpl_coord.db", help="SQLite path or postgres:// DSN")
+    
+    which_parser = subparsers.add_parser("which", help="Print the shard owning each judgment ID")
+    which_parser.add_argument("num_shards", type=int)
+    which_parser.add_argument("judgment_ids", nargs="+")
+    
+    args = parser.parse_args()
+    
+    if args.command == "merge":
+        missing = [path for path in args.shards if not os.path.exists(path)]
+        if missing:
+            print(f"❌ Missing shard databases: {', '.join(missing)}")
+            sys.exit(1)
+        totals = merge_databases(args.output, args.shards)
+        print(f"✅ {args.output}: +{totals['documents']} documents, +{totals['elements']} elements, "
+              f"+{totals['vbpl_relations']} relations")
+    elif args.command == "status":
+        store = open_coordination_store(args.coord_store)
+        try:
+            for shard, counts in store.counts().items():
+                print(f"   shard {shard}: {counts['pending']} pending / {counts['forwarded']} forwarded")
+        finally:
+            store.close()
+    else:
+        for judgment_id in args.judgment_ids:
+            print(f"{judgment_id}\t{shard_of(judgment_id, args.num_shards)}")
+
+if __name__ == "__main__":
+    main()